@@ -0,0 +1,74 @@
+# benchmarks/async_load.py
+#
+# Concurrent-session throughput of the sync graph versus the async graph, against stubbed backends.
+# Run from the repository root:
+#   python -m benchmarks.async_load --sessions 50 --latency 0.05
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.fakes import FakeAsyncOpenAIClient, FakeChatModel, FakeOpenAIClient
+from src.graph import salesCompAgent
+from src.vector_store import NumpyVectorStore
+
+QUESTIONS = [
+    "What is a windfall?",
+    "How much commission will I earn on a $500,000 deal?",
+    "How do I enter the Q3 sales contest?",
+    "Is there a minimum commission guarantee?",
+]
+
+
+def build_agent(latency: float) -> salesCompAgent:
+    client = FakeOpenAIClient(latency_seconds=latency)
+    index = NumpyVectorStore()
+    index.upsert([(f"chunk-{i}", client.embed(q), {"text": q, "docname": "policy.pdf", "index": i})
+                  for i, q in enumerate(QUESTIONS)])
+    return salesCompAgent("offline", model=FakeChatModel(latency_seconds=latency), client=client, index=index,
+                          async_client=FakeAsyncOpenAIClient(client))
+
+
+def turn_input(i: int) -> dict:
+    question = QUESTIONS[i % len(QUESTIONS)]
+    return {"initialMessage": question, "sessionHistory": [{"role": "user", "content": question}]}
+
+
+def run_sync(agent: salesCompAgent, sessions: int) -> float:
+    # One worker handling every session in turn, as a single Streamlit script thread does
+    start = time.perf_counter()
+    for i in range(sessions):
+        agent.graph.invoke(turn_input(i))
+    return time.perf_counter() - start
+
+
+async def run_async(agent: salesCompAgent, sessions: int, concurrency: int) -> float:
+    # One event loop serving up to `concurrency` sessions at once
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await agent.graph.ainvoke(turn_input(i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(sessions)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async graph throughput against stubbed backends")
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per model or embeddings call")
+    args = parser.parse_args()
+
+    agent = build_agent(args.latency)
+    sync_seconds = run_sync(agent, args.sessions)
+    async_seconds = asyncio.run(run_async(agent, args.sessions, args.concurrency))
+    print(f"sync  (1 worker):              {args.sessions / sync_seconds:7.1f} turns/sec ({sync_seconds:.2f}s)")
+    print(f"async (1 loop, {args.concurrency:3d} concurrent): {args.sessions / async_seconds:7.1f} turns/sec "
+          f"({async_seconds:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/clarify_benchmark.py
+#
+# Model calls and latency of the clarify path, against a stub model with a fixed latency per call.
+# The clarify node must make exactly one model call per turn (a single structured-output round trip)
+# that also returns its best-guess route, and a "yes" on the next turn must go to that route without
+# another classifier call; the script exits with status 1 otherwise, so it doubles as a regression check.
+# Run from the
+# repository root:
+#   python -m benchmarks.clarify_benchmark --turns 20 --latency 0.05
+
+import argparse
+import asyncio
+import statistics
+import sys
+import uuid
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks.fakes import FakeAsyncOpenAIClient, FakeChatModel, FakeOpenAIClient, structured_defaults
+from src.clarify_agent import ClarifyResponse
+from src.graph import salesCompAgent
+from src.vector_store import NumpyVectorStore
+
+QUESTIONS = ["Hmm, what about the thing from last week?", "Can you fix it?", "Numbers look off."]
+
+
+def clarify_router(schema, messages):
+    # The classifier always answers "clarify"; the clarify call suggests a ticket
+    if schema is ClarifyResponse:
+        return ClarifyResponse(category="commission",
+                               clarifying_question="Are you asking about a commission payout?",
+                               suggest_ticket=True,
+                               ticket_summary="User reports a payout that looks wrong.")
+    if "category" in schema.model_fields:
+        return schema(category="clarify")
+    return structured_defaults(schema)
+
+
+def build_agent(latency: float, structured=clarify_router, checkpointer=None) -> salesCompAgent:
+    client = FakeOpenAIClient(latency_seconds=latency)
+    return salesCompAgent("offline", model=FakeChatModel(latency_seconds=latency, structured=structured),
+                          client=client, index=NumpyVectorStore(), async_client=FakeAsyncOpenAIClient(client),
+                          fast_classifier_threshold=None, checkpointer=checkpointer)
+
+
+def turn_input(i: int) -> dict:
+    question = QUESTIONS[i % len(QUESTIONS)]
+    return {"initialMessage": question, "sessionHistory": [{"role": "user", "content": question}]}
+
+
+def measure(agent: salesCompAgent, turns: int, use_async: bool) -> dict:
+    calls, seconds = [], []
+    for i in range(turns):
+        run_id = uuid.uuid4()
+        if use_async:
+            result = asyncio.run(agent.graph.ainvoke(turn_input(i), {"run_id": run_id}))
+        else:
+            result = agent.graph.invoke(turn_input(i), {"run_id": run_id})
+        assert result["category"] == "clarify", result
+        assert result["clarifyGuess"] == "commission", result
+        turn = agent.metrics.pop_turn(run_id)
+        # Every turn also makes the classifier call
+        calls.append(turn.llm_calls - 1)
+        seconds.append(turn.node_seconds.get("clarify", 0.0))
+    return {"clarify_model_calls_per_turn": max(calls), "clarify_node_mean_seconds": round(statistics.fmean(seconds), 4)}
+
+
+def confirmation(latency: float) -> dict:
+    """
+    A clarify turn followed by "Yes" on a checkpointed thread: the reply should go to the guessed route.
+    """
+    classifier_calls = []
+
+    def counting_router(schema, messages):
+        if schema is not ClarifyResponse and "category" in schema.model_fields:
+            classifier_calls.append(schema)
+        return clarify_router(schema, messages)
+
+    agent = build_agent(latency, counting_router, InMemorySaver())
+    config = {"configurable": {"thread_id": "confirm"}}
+    agent.graph.invoke(agent.turn_input(QUESTIONS[0], []), config)
+    before = len(classifier_calls)
+    result = agent.graph.invoke(agent.turn_input("Yes", []), config)
+    return {"confirmed_route": result["category"], "classifier_calls": len(classifier_calls) - before}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model calls and latency of the clarify path")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per model call")
+    args = parser.parse_args()
+
+    agent = build_agent(args.latency)
+    results = {"sync": measure(agent, args.turns, use_async=False),
+               "async": measure(agent, args.turns, use_async=True)}
+    # The node also works when called without a session history
+    model = agent.clarify_agent_class.model
+    before = model.calls
+    agent.clarify_agent_class.clarify_agent({"initialMessage": QUESTIONS[0]})
+    results["without_history"] = {"clarify_model_calls_per_turn": model.calls - before}
+
+    confirmed = confirmation(args.latency)
+
+    print(f"simulated model latency: {args.latency}s per call")
+    for name, result in results.items():
+        print(f"{name:16} {result}")
+    print(f"{'confirmation':16} {confirmed}")
+    if any(r["clarify_model_calls_per_turn"] != 1 for r in results.values()):
+        print("REGRESSION: the clarify path must make exactly one model call per turn")
+        sys.exit(1)
+    if confirmed != {"confirmed_route": "commission", "classifier_calls": 0}:
+        print("REGRESSION: a yes to the clarifying question must go to its guessed route without classifying")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/classifier_calibration.py
+#
+# Calibration of the local fast classifier (src/fast_classifier.py) on hand-labeled questions written
+# like real traffic (none are copied from the classifier prompt's examples). For each margin it reports
+# how many questions would skip the LLM and how often the local route matches the label, and the margin
+# calibrate_threshold picks. Exits with status 1 if the default threshold routes below the target
+# agreement. Run from the repository root:
+#   python -m benchmarks.classifier_calibration --target 0.98
+
+import argparse
+import sys
+
+from src.fast_classifier import DEFAULT_THRESHOLD, FastClassifier, calibrate_threshold, comparison
+from src.graph import CLASSIFIER_PROMPT
+
+LABELED_QUESTIONS = [
+    ("What is a windfall?", "policy"),
+    ("Is there a minimum commission guarantee?", "policy"),
+    ("What happens to my commission if I go on leave?", "policy"),
+    ("What is the commission split policy for teaming deals?", "policy"),
+    ("Is there a cap on commission for large deals?", "policy"),
+    ("How is commission paid on a multi-year deal?", "policy"),
+    ("Can I get paid commission on a deal that closed after I left?", "policy"),
+    ("How are windfall deals reviewed?", "policy"),
+    ("Does the MCG apply during ramp?", "policy"),
+    ("What is a clawback?", "policy"),
+    ("What is the policy on split deals between two reps?", "policy"),
+    ("Do I keep my commission if the customer cancels in the first month?", "policy"),
+    ("How does parental leave affect my quota?", "policy"),
+    ("Are renewals eligible for bonus payments?", "policy"),
+    ("What are the rules for a teaming agreement with a partner?", "policy"),
+    ("Is there a guarantee for new hires?", "policy"),
+    ("What counts as a windfall deal?", "policy"),
+    ("When does the minimum commission guarantee end?", "policy"),
+    ("Who approves a commission split?", "policy"),
+    ("What is the bonus structure for overachievement?", "policy"),
+    ("How much commission will I earn on a $500,000 deal?", "commission"),
+    ("What commission rate applies to renewals?", "commission"),
+    ("If I close $200k in bookings what is my commission?", "commission"),
+    ("Calculate my commission for a $1.2M deal with a $100k OTI and $1M quota", "commission"),
+    ("What will I earn on a 300k deal?", "commission"),
+    ("How much do I make on this deal?", "commission"),
+    ("What is my base commission rate with OTI 120k and quota 1.5M?", "commission"),
+    ("Work out my earnings on a $750,000 opportunity", "commission"),
+    ("How much commission for a deal of 80,000 dollars?", "commission"),
+    ("What's my payout on a $2M deal?", "commission"),
+    ("How do I enter the Q3 sales contest?", "contest"),
+    ("What are the contest rules?", "contest"),
+    ("When do contest payouts happen?", "contest"),
+    ("Where is the sales contest form?", "contest"),
+    ("Can a rep with $100k OTI get a $6,000 contest payout?", "contest"),
+    ("What prizes does the spiff offer this quarter?", "contest"),
+    ("Is there a limit on contest rewards?", "contest"),
+    ("How do I sign up for the upcoming contest?", "contest"),
+    ("Who won last quarter's sales contest?", "contest"),
+    ("Can I participate in two contests at once?", "contest"),
+    ("My commission was calculated incorrectly.", "ticket"),
+    ("Please open a support ticket about my missing payout.", "ticket"),
+    ("I can't access my commission report.", "ticket"),
+    ("My payout is wrong for deal D-17", "ticket"),
+    ("The dashboard shows the wrong quota for me", "ticket"),
+    ("I was not paid for the Acme deal, please fix it", "ticket"),
+    ("The commission statement is missing my last two deals", "ticket"),
+    ("I get an error when I open the payout portal", "ticket"),
+    ("Please file a ticket, my split was applied to the wrong rep", "ticket"),
+    ("Report a problem with my March commission", "ticket"),
+    ("Hi", "clarify"),
+    ("Can you help me?", "clarify"),
+    ("What about the other thing?", "clarify"),
+    ("Numbers look off.", "clarify"),
+    ("Hmm, what about last week?", "clarify"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agreement and LLM calls saved per fast-classifier margin")
+    parser.add_argument("--target", type=float, default=0.98, help="required agreement of fast-routed questions")
+    parser.add_argument("--min-samples", type=int, default=10, help="fewest fast-routed questions to trust a margin")
+    args = parser.parse_args()
+
+    classifier = FastClassifier.from_prompt(CLASSIFIER_PROMPT)
+    records = [comparison(classifier.predict(question), label) for question, label in LABELED_QUESTIONS]
+    records = [r for r in records if r is not None]
+    for margin in sorted({0.1, 0.2, 0.25, 0.3, 0.35, 0.4, 0.5, DEFAULT_THRESHOLD}):
+        routed = [r for r in records if r["confidence"] >= margin]
+        agreement = sum(r["agreed"] for r in routed) / len(routed) if routed else 1.0
+        print({"margin": margin, "fast_routed": len(routed), "llm_calls_saved_rate": round(len(routed) / len(LABELED_QUESTIONS), 3),
+               "agreement": round(agreement, 3),
+               "disagreements": [(r["local"], r["llm"], round(r["confidence"], 3)) for r in routed if not r["agreed"]]})
+    calibrated = calibrate_threshold(records, target_agreement=args.target, min_samples=args.min_samples)
+    print({"calibrated_threshold": calibrated, "default_threshold": DEFAULT_THRESHOLD, "target": args.target})
+    routed = [r for r in records if r["confidence"] >= DEFAULT_THRESHOLD]
+    if routed and sum(r["agreed"] for r in routed) / len(routed) < args.target:
+        print(f"REGRESSION: the default threshold {DEFAULT_THRESHOLD} routes below {args.target} agreement")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
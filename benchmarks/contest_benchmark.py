@@ -0,0 +1,129 @@
+# benchmarks/contest_benchmark.py
+#
+# Contest turns answered from the parsed rules (src/contest_rules.py): model calls per contest turn,
+# batch payout checking throughput, and picking up an edited rules file without a restart.
+# Run from the repository root:
+#   python -m benchmarks.contest_benchmark --rows 100000
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fakes import FakeAsyncOpenAIClient, FakeChatModel, FakeOpenAIClient, structured_defaults
+from src.contest_rules import DEFAULT_RULES_PATH, ContestRuleBook, check_payout, check_payouts, resolve_rules_path
+from src.graph import salesCompAgent
+from src.vector_store import NumpyVectorStore
+
+QUESTIONS = [
+    "How do I enter the Q3 sales contest?",
+    "Where is the sales contest form?",
+    "Can a rep with $100k OTI get a $6,000 contest payout on deal D-17?",
+    "Can I pay $4,000 to a rep whose OTI is $100,000?",
+    "Can I pay 6% of OTI as a contest payout?",
+    "Why are contest payouts capped at a percent of OTI?",
+]
+
+
+def contest_router(schema, messages):
+    if "category" in schema.model_fields:
+        return structured_defaults(schema).model_copy(update={"category": "contest"})
+    return structured_defaults(schema)
+
+
+def turn_benchmark(rule_book, latency):
+    model = FakeChatModel(latency_seconds=latency, structured=contest_router)
+    client = FakeOpenAIClient(latency_seconds=latency)
+    agent = salesCompAgent("offline", model=model, client=client, index=NumpyVectorStore(),
+                           async_client=FakeAsyncOpenAIClient(client), fast_classifier_threshold=None,
+                           contest_rules=rule_book)
+    turns = []
+    for question in QUESTIONS:
+        run_id = uuid.uuid4()
+        start = time.perf_counter()
+        result = agent.graph.invoke({"initialMessage": question, "sessionHistory": []},
+                                    {"run_id": run_id, "configurable": {"thread_id": "contest"}})
+        seconds = time.perf_counter() - start
+        assert result["category"] == "contest", result
+        # Every turn also makes the classifier call; before, every contest turn made one more
+        calls = agent.metrics.pop_turn(run_id).llm_calls - 1
+        turns.append({"question": question, "contest_calls": calls, "seconds": round(seconds, 4),
+                      "answer": result["responseToUser"].splitlines()[0][:90]})
+    return turns
+
+
+def batch_benchmark(rules, rows):
+    rng = np.random.default_rng(0)
+    payouts = pd.DataFrame({
+        "payout": rng.uniform(500, 8000, rows).round(2),
+        "oti": rng.uniform(50_000, 200_000, rows).round(-3),
+        "deal_id": [f"D-{i}" for i in rng.integers(0, rows, rows)],
+        "period": rng.choice(["2024-Q3", "2024-Q4", "2024-07"], rows),
+    })
+    start = time.perf_counter()
+    result = check_payouts(rules, payouts)
+    batch_seconds = time.perf_counter() - start
+
+    sample = payouts.head(min(rows, 10_000))
+    start = time.perf_counter()
+    paid = set()
+    for row in sample.itertuples(index=False):
+        check_payout(rules, row.payout, row.oti, row.deal_id, row.period, paid)
+        paid.add(row.deal_id)
+    per_row_seconds = (time.perf_counter() - start) / len(sample)
+    return {"rows": rows, "batch_seconds": round(batch_seconds, 4),
+            "batch_rows_per_second": int(rows / batch_seconds),
+            "one_by_one_rows_per_second": int(1 / per_row_seconds),
+            "not_allowed": int((~result["allowed"]).sum())}
+
+
+def reload_benchmark(path, lookups):
+    with tempfile.TemporaryDirectory() as directory:
+        rules_path = os.path.join(directory, "contestrules.txt")
+        shutil.copy(path, rules_path)
+        rule_book = ContestRuleBook(rules_path)
+        before = rule_book.rules().max_payout_fraction_of_oti
+        start = time.perf_counter()
+        for _ in range(lookups):
+            rule_book.rules()
+        lookup_us = (time.perf_counter() - start) / lookups * 1e6
+        loads_before_edit = rule_book.loads
+
+        with open(rules_path, "r") as file:
+            text = file.read()
+        with open(rules_path, "w") as file:
+            file.write(text.replace("5%", "7%") + "\n")
+        after = rule_book.rules().max_payout_fraction_of_oti
+        return {"cap_before_edit": before, "cap_after_edit": after, "loads_before_edit": loads_before_edit,
+                "loads_after_edit": rule_book.loads, "cached_lookup_microseconds": round(lookup_us, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Contest turns, batch payout checks and rules reloading")
+    parser.add_argument("--rules", help="contest rules file (default: the app's)")
+    parser.add_argument("--rows", type=int, default=100_000, help="payouts in the batch check")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per model call")
+    args = parser.parse_args()
+
+    rules_path = os.path.abspath(args.rules) if args.rules else resolve_rules_path(DEFAULT_RULES_PATH)
+    rule_book = ContestRuleBook(rules_path)
+    turns = turn_benchmark(rule_book, args.latency)
+    print(f"simulated model latency {args.latency}s")
+    for turn in turns:
+        print(turn)
+    print({"contest_turns": len(turns),
+           "contest_calls_per_turn": round(statistics.fmean(t["contest_calls"] for t in turns), 3),
+           "contest_calls_per_turn_before": 1.0,
+           "rules_file_loads": rule_book.loads})
+    print(batch_benchmark(rule_book.rules(), args.rows))
+    print(reload_benchmark(rules_path, 10_000))
+
+
+if __name__ == "__main__":
+    main()
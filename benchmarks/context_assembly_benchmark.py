@@ -0,0 +1,101 @@
+# benchmarks/context_assembly_benchmark.py
+#
+# Prompt tokens per policy answer with the retrieved chunks sent as retrieved versus assembled by
+# src/context_assembly.py, on a synthetic policy document split with ingestion's 200-character overlap
+# and hybrid retrieval.
+# Reports prompt tokens, context tokens before and after assembly, and whether the clause that answers
+# the question is still in the prompt. Run from the repository root:
+#   python -m benchmarks.context_assembly_benchmark --sections 40 --budget 1000
+
+import argparse
+import random
+import statistics
+
+from benchmarks.fakes import FakeOpenAIClient
+from src.context_assembly import DEFAULT_CONTEXT_TOKEN_BUDGET
+from src.history import count_tokens
+from src.ingestion import IngestionPipeline
+from src.lexical_index import BM25Index
+from src.policy_agent import PolicyAgent
+from src.vector_store import NumpyVectorStore
+
+TOPICS = ["quota relief", "territory transfer", "deal split", "clawback window", "draw recovery",
+          "accelerator tier", "SPIFF eligibility", "windfall review", "renewal credit", "leave of absence"]
+SENTENCES = [
+    "The {topic} rule for plan year {year} applies to every quota-carrying rep in the region.",
+    "Requests for {topic} in plan year {year} are submitted by the manager through the compensation portal.",
+    "Sales operations reviews each {topic} request within ten business days and records the decision.",
+    "Finance adjusts the payout in the next commission cycle once the {topic} decision is approved.",
+    "Exceptions to the {topic} rule for plan year {year} need written approval from the regional VP.",
+    "A rep may appeal a {topic} decision once, in writing, within thirty days of being notified.",
+    "Credit already paid is not recalculated unless the {topic} decision changes attainment by more than 5%.",
+]
+
+
+def build_document(sections: int, seed: int = 11) -> tuple:
+    """
+    Sections several chunks long, one topic and plan year each, like the sections of a policy PDF.
+
+    :return: The document text and {question: clause that answers it}.
+    """
+    rng = random.Random(seed)
+    parts, targets = [], {}
+    for i in range(sections):
+        topic, year = TOPICS[i % len(TOPICS)], 2020 + i
+        sentences = [rng.choice(SENTENCES).format(topic=topic, year=year) for _ in range(20)]
+        clause = (f"Under the {topic} rule for plan year {year}, approval takes {rng.randint(2, 12)} weeks "
+                  f"and is given by the regional {topic} committee.")
+        sentences.insert(rng.randrange(len(sentences)), clause)
+        parts.append(f"Section {i + 1}. {topic.title()} ({year}). " + " ".join(sentences))
+        targets[f"Who approves {topic} for plan year {year}, and how long does it take?"] = clause
+    return "\n".join(parts), targets
+
+
+def prompt_tokens(messages: list) -> int:
+    return sum(count_tokens(m["content"]) for m in messages)
+
+
+def run(agent: PolicyAgent, targets: dict) -> dict:
+    tokens, context_before, context_after, found = [], [], [], []
+    for question, clause in targets.items():
+        matches = agent.retrieve_matches(question)
+        if agent.context_assembler is not None:
+            context = agent.context_assembler.assemble(matches)
+            text = context.text
+            context_before.append(context.tokens_before)
+            context_after.append(context.tokens_after)
+        else:
+            text = agent.build_context(matches)
+            context_before.append(count_tokens(text))
+            context_after.append(count_tokens(text))
+        tokens.append(prompt_tokens(agent.build_messages(text, question)))
+        found.append(clause in text)
+    return {"prompt_tokens_per_answer": round(statistics.fmean(tokens), 1),
+            "context_tokens_before": round(statistics.fmean(context_before), 1),
+            "context_tokens_after": round(statistics.fmean(context_after), 1),
+            "answer_clause_in_prompt": round(sum(found) / len(found), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Policy prompt tokens with and without context assembly")
+    parser.add_argument("--sections", type=int, default=40)
+    parser.add_argument("--budget", type=int, default=DEFAULT_CONTEXT_TOKEN_BUDGET, help="context token budget")
+    args = parser.parse_args()
+
+    client = FakeOpenAIClient()
+    index = NumpyVectorStore()
+    document, targets = build_document(args.sections)
+    lexical = BM25Index(":memory:")
+    result = IngestionPipeline(client, index, lexical_index=lexical).ingest_text(document, "policy.pdf")
+    print(f"{result.chunks} chunks of up to 1000 characters, 200 overlapping")
+
+    results = {}
+    for name, budget in (("as_retrieved", None), ("assembled", args.budget)):
+        results[name] = run(PolicyAgent(client, index, lexical_index=lexical, context_token_budget=budget), targets)
+        print(f"{name:13} {results[name]}")
+    before, after = (results[n]["prompt_tokens_per_answer"] for n in ("as_retrieved", "assembled"))
+    print(f"prompt tokens per answer: {before} -> {after} ({(before - after) / before:.0%} fewer)")
+
+
+if __name__ == "__main__":
+    main()
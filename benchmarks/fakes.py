@@ -0,0 +1,218 @@
+# benchmarks/fakes.py
+#
+# Deterministic stand-ins for ChatOpenAI and the OpenAI client, with configurable latency.
+# Together with src/local_backends.py they let the whole graph run offline.
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from src.local_backends import LocalEmbeddingClient
+from src.metrics import record_llm_call
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _message_text(message) -> str:
+    return message.get("content", "") if isinstance(message, dict) else str(getattr(message, "content", message))
+
+
+def _record_fake_call(messages, response: str):
+    # Report the call like a real model would, so the metrics have token counts to aggregate
+    record_llm_call("fake-chat", sum(_approx_tokens(_message_text(m)) for m in messages), _approx_tokens(response))
+
+
+def structured_defaults(schema):
+    """
+    Fill a pydantic output schema with plausible values for each field: "policy" for a category, False
+    for flags, the declared default for optional fields and "fake <name>" for the rest.
+    """
+    values = {}
+    for name, field in schema.model_fields.items():
+        if name == "category":
+            values[name] = "policy"
+        elif field.annotation in (bool,):
+            values[name] = False
+        elif not field.is_required():
+            values[name] = field.default
+        else:
+            values[name] = f"fake {name}"
+    return schema(**values)
+
+
+# Keywords the fake classifier uses to pick a route, checked in order; anything else is "policy"
+KEYWORD_ROUTES = [("commission", ("commission", "earn", "deal")), ("contest", ("contest", "spiff")),
+                  ("ticket", ("ticket", "support", "help desk"))]
+
+
+def keyword_router(schema, messages):
+    """
+    Structured-output stand-in that routes on keywords in the latest human message, so every agent node
+    can be exercised. Other schemas get the defaults from structured_defaults.
+    """
+    if "category" not in schema.model_fields:
+        return structured_defaults(schema)
+    humans = [m for m in messages if getattr(m, "type", "") == "human"]
+    text = humans[-1].content.lower() if humans else ""
+    category = next((c for c, keywords in KEYWORD_ROUTES if any(k in text for k in keywords)), "policy")
+    # Schemas with more fields than the category keep the defaults for the rest
+    return structured_defaults(schema).model_copy(update={"category": category})
+
+
+class FakeChatModel:
+    """
+    Stand-in for ChatOpenAI supporting invoke/ainvoke, stream/astream and with_structured_output.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0, response: str = "This is a fake answer from the model.",
+                 structured=None):
+        """
+        :param latency_seconds: Simulated time per call.
+        :param response: Text returned by invoke and streamed word by word.
+        :param structured: Optional callable (schema, messages) -> instance for structured output.
+        """
+        self.latency_seconds = latency_seconds
+        self.response = response
+        self.structured = structured
+        self.calls = 0
+
+    def _result(self, schema, messages):
+        if self.structured:
+            return self.structured(schema, messages)
+        return structured_defaults(schema)
+
+    def _count(self, messages, response: str):
+        self.calls += 1
+        _record_fake_call(messages, response)
+
+    def invoke(self, messages, *args, **kwargs):
+        self._count(messages, self.response)
+        time.sleep(self.latency_seconds)
+        return AIMessage(content=self.response)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        self._count(messages, self.response)
+        await asyncio.sleep(self.latency_seconds)
+        return AIMessage(content=self.response)
+
+    def stream(self, messages, *args, **kwargs):
+        self._count(messages, self.response)
+        time.sleep(self.latency_seconds)
+        for word in self.response.split(" "):
+            yield AIMessageChunk(content=word + " ")
+
+    async def astream(self, messages, *args, **kwargs):
+        self._count(messages, self.response)
+        await asyncio.sleep(self.latency_seconds)
+        for word in self.response.split(" "):
+            yield AIMessageChunk(content=word + " ")
+
+    def with_structured_output(self, schema, **kwargs):
+        outer = self
+
+        class _Structured:
+            def invoke(self, messages, *args, **kwargs):
+                outer._count(messages, schema.__name__)
+                time.sleep(outer.latency_seconds)
+                return outer._result(schema, messages)
+
+            async def ainvoke(self, messages, *args, **kwargs):
+                outer._count(messages, schema.__name__)
+                await asyncio.sleep(outer.latency_seconds)
+                return outer._result(schema, messages)
+
+        return _Structured()
+
+
+def _completion_chunks(text: str, messages=(), include_usage: bool = False):
+    chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))], usage=None)
+              for word in text.split(" ")]
+    if include_usage:
+        # Like the real API, usage arrives in a final chunk with no choices
+        prompt = sum(_approx_tokens(_message_text(m)) for m in messages)
+        chunks.append(SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=prompt,
+                                                                        completion_tokens=_approx_tokens(text))))
+    return chunks
+
+
+class FakeOpenAIClient(LocalEmbeddingClient):
+    """
+    Stand-in for the OpenAI client: local embeddings plus chat.completions.create (streaming or not).
+    """
+
+    def __init__(self, latency_seconds: float = 0.0, dimension: int = 256,
+                 response: str = "This is a fake policy answer based on the retrieved documents."):
+        super().__init__(dimension=dimension, latency_seconds=latency_seconds)
+        self.response = response
+        self.chat_calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+
+    def _create_completion(self, model, messages, stream=False, **kwargs):
+        self.chat_calls += 1
+        time.sleep(self.latency_seconds)
+        if stream:
+            include_usage = (kwargs.get("stream_options") or {}).get("include_usage", False)
+            return iter(_completion_chunks(self.response, messages, include_usage))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.response))])
+
+
+class FakeAsyncOpenAIClient:
+    """
+    Async counterpart of FakeOpenAIClient, mirroring AsyncOpenAI.
+    """
+
+    def __init__(self, sync_client: FakeOpenAIClient):
+        self.sync_client = sync_client
+        self.embeddings = SimpleNamespace(create=self._create_embedding)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+
+    async def _create_embedding(self, model, input):
+        await asyncio.sleep(self.sync_client.latency_seconds)
+        texts = [input] if isinstance(input, str) else list(input)
+        data = [SimpleNamespace(index=i, embedding=self.sync_client.embed(t)) for i, t in enumerate(texts)]
+        return SimpleNamespace(data=data, model=model)
+
+    async def _create_completion(self, model, messages, stream=False, **kwargs):
+        self.sync_client.chat_calls += 1
+        await asyncio.sleep(self.sync_client.latency_seconds)
+        if stream:
+            async def chunks():
+                include_usage = (kwargs.get("stream_options") or {}).get("include_usage", False)
+                for chunk in _completion_chunks(self.sync_client.response, messages, include_usage):
+                    yield chunk
+            return chunks()
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.sync_client.response))])
+
+
+def build_pdf(page_texts) -> bytes:
+    """
+    Write a minimal PDF with one page per text, each line drawn in Helvetica, for extraction benchmarks.
+    """
+    def escape(line):
+        return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        lines = text.split("\n")
+        ops = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({escape(l)}) Tj T*" for l in lines) + " ET"
+        objects.append(f"<< /Length {len(ops)} >>\nstream\n{ops}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
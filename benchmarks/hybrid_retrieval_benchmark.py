@@ -0,0 +1,92 @@
+# benchmarks/hybrid_retrieval_benchmark.py
+#
+# Policy retrieval with the vector index alone versus hybrid BM25 + vector retrieval, on a synthetic
+# policy corpus full of exact terms. Reports recall of the defining clause, embedding calls, context
+# chunks and retrieval latency per question. Run from the repository root:
+#   python -m benchmarks.hybrid_retrieval_benchmark --chunks 400 --latency 0.03
+
+import argparse
+import random
+import statistics
+import time
+
+from src.ingestion import IngestionPipeline
+from src.lexical_index import BM25Index
+from src.local_backends import LocalEmbeddingClient
+from src.policy_agent import PolicyAgent
+from src.vector_store import NumpyVectorStore
+
+TERMS = {
+    "MCG": "The MCG (minimum commission guarantee) pays new reps a fixed floor for their first two quarters.",
+    "windfall": "A windfall deal is any single booking above 300% of quota; commission on it is capped and reviewed.",
+    "teaming agreement": "Under a teaming agreement two territories share an opportunity and its credit by prior approval.",
+    "split": "A split divides credit for one deal between reps; splits must be recorded before the deal closes.",
+    "clawback": "A clawback recovers commission paid on a deal that is cancelled or refunded within 90 days.",
+    "accelerator": "The accelerator raises the commission rate to 1.5x for attainment above 100% of quota.",
+    "SPIFF": "A SPIFF is a short incentive paid on top of commission for selling a promoted product.",
+    "draw": "A recoverable draw is an advance against future commission, repaid from later earnings.",
+}
+FILLER = ("commission plan quota attainment territory deal booking credit rep manager quarter payout rate "
+          "approval review finance policy sales compensation revenue customer contract renewal target").split()
+QUESTIONS = ["What is the {term}?", "How does a {term} work?", "Explain the {term} rules for my deals."]
+GENERIC = ["How is my commission calculated?", "Who approves my payout each quarter?"]
+
+
+def build_corpus(chunks: int, seed: int = 7) -> list:
+    """
+    :return: Chunk texts; the first len(TERMS) are the defining clauses, in TERMS order.
+    """
+    rng = random.Random(seed)
+    texts = [definition + " " + " ".join(rng.choices(FILLER, k=60)) for definition in TERMS.values()]
+    terms = list(TERMS)
+    while len(texts) < chunks:
+        words = rng.choices(FILLER, k=80)
+        # Some clauses mention a term in passing without defining it
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)), rng.choice(terms))
+        texts.append(" ".join(words) + ".")
+    return texts
+
+
+def run(agent: PolicyAgent, client: LocalEmbeddingClient, targets: dict, questions: list) -> dict:
+    found = []
+    chunks = []
+    seconds = []
+    embeddings_before = client.requests
+    for question in questions:
+        start = time.perf_counter()
+        _, matches = agent.speculative_retrieve(question)
+        seconds.append(time.perf_counter() - start)
+        chunks.append(len(matches))
+        if question in targets:
+            found.append(targets[question] in [m["metadata"]["text"] for m in matches])
+    return {"recall_at_3": round(sum(found) / len(found), 3),
+            "embedding_calls_per_question": round((client.requests - embeddings_before) / len(questions), 3),
+            "context_chunks_per_question": round(statistics.fmean(chunks), 2),
+            "retrieval_mean_seconds": round(statistics.fmean(seconds), 5),
+            "retrieval_counts": dict(agent.retrieval_counts)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector-only versus hybrid BM25 + vector policy retrieval")
+    parser.add_argument("--chunks", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.03, help="simulated seconds per embedding call")
+    args = parser.parse_args()
+
+    client = LocalEmbeddingClient(dimension=256)
+    index = NumpyVectorStore()
+    lexical = BM25Index(":memory:")
+    corpus = build_corpus(args.chunks)
+    # Ingestion keeps both indexes in step
+    IngestionPipeline(client, index, lexical_index=lexical).ingest_chunks(corpus, "policy.pdf")
+    client.latency_seconds = args.latency
+
+    targets = {q.format(term=term): corpus[i] for i, term in enumerate(TERMS) for q in QUESTIONS}
+    questions = list(targets) + GENERIC
+    for name, lexical_index in (("vector_only", None), ("hybrid", lexical)):
+        agent = PolicyAgent(client, index, lexical_index=lexical_index)
+        print(f"{name:12} {run(agent, client, targets, questions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/ingestion_benchmark.py
+#
+# Offline ingestion throughput benchmark. Run from the repository root:
+#   python -m benchmarks.ingestion_benchmark --chunks 400 --latency 0.05
+
+import argparse
+import random
+
+from src.ingestion import IngestionPipeline
+from src.local_backends import LocalEmbeddingClient
+from src.vector_store import NumpyVectorStore
+
+WORDS = ("commission quota windfall split teaming agreement leave policy bonus accelerator "
+         "territory deal booking payout plan rep manager guarantee credit clawback").split()
+
+
+def make_chunks(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [f"chunk {i} " + " ".join(rng.choice(WORDS) for _ in range(150)) for i in range(count)]
+
+
+def run(chunks: list, latency: float, **pipeline_kwargs) -> dict:
+    client = LocalEmbeddingClient(latency_seconds=latency)
+    pipeline = IngestionPipeline(client, NumpyVectorStore(), **pipeline_kwargs)
+    result = pipeline.ingest_chunks(chunks, "benchmark.pdf")
+    return {
+        "chunks": result.chunks,
+        "seconds": round(result.elapsed_seconds, 3),
+        "chunks_per_second": round(result.chunks_per_second, 1),
+        "embedding_requests": client.requests,
+        "upsert_requests": result.upsert_requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark upload_pdf ingestion against local stand-ins")
+    parser.add_argument("--chunks", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per embeddings request")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    serial = run(chunks, args.latency, embed_batch_size=1, upsert_batch_size=1, max_workers=1)
+    batched = run(chunks, args.latency, embed_batch_size=args.batch_size, max_workers=args.workers)
+    print(f"one chunk per request: {serial}")
+    print(f"batched + concurrent:  {batched}")
+
+
+if __name__ == "__main__":
+    main()
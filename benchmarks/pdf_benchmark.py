@@ -0,0 +1,67 @@
+# benchmarks/pdf_benchmark.py
+#
+# PDF upload benchmark: the old extract-everything-then-split path versus streaming, parallel extraction.
+# Run from the repository root:
+#   python -m benchmarks.pdf_benchmark --pages 300 --workers 4
+
+import argparse
+import io
+import random
+import time
+
+import PyPDF2
+
+from benchmarks.fakes import build_pdf
+from benchmarks.ingestion_benchmark import WORDS
+from src.ingestion import IngestionPipeline
+from src.local_backends import LocalEmbeddingClient
+from src.vector_store import NumpyVectorStore
+
+
+def make_pdf(pages: int, seed: int = 7) -> bytes:
+    rng = random.Random(seed)
+    return build_pdf(["\n".join(f"{p}.{line} " + " ".join(rng.choice(WORDS) for _ in range(12)) for line in range(50))
+                      for p in range(1, pages + 1)])
+
+
+def pipeline(latency: float, on_progress) -> IngestionPipeline:
+    return IngestionPipeline(LocalEmbeddingClient(latency_seconds=latency), NumpyVectorStore(),
+                             progress_callback=on_progress)
+
+
+def legacy(data: bytes, latency: float, on_progress):
+    # What upload_pdf.pdf_to_text did: one core, the whole document concatenated before chunking
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    text = ""
+    for i in range(len(reader.pages)):
+        text = text + reader.pages[i].extract_text()
+    return pipeline(latency, on_progress).ingest_text(text, "benchmark.pdf")
+
+
+def streaming(data: bytes, latency: float, on_progress, workers: int):
+    return pipeline(latency, on_progress).ingest_pdf(data, "benchmark.pdf", max_workers=workers)
+
+
+def measure(fn, data: bytes, latency: float, *args) -> dict:
+    # Total time, and time until the first batch of chunks reached the index
+    first = []
+    start = time.perf_counter()
+    result = fn(data, latency, lambda p: first or first.append(time.perf_counter() - start), *args)
+    return {"chunks": result.chunks, "seconds": round(time.perf_counter() - start, 3),
+            "first_upsert_seconds": round(first[0], 3) if first else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction and ingestion against local stand-ins (use a multi-core machine)")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=4, help="extraction processes")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated seconds per embeddings request")
+    args = parser.parse_args()
+
+    data = make_pdf(args.pages)
+    print(f"legacy (concatenate, then split): {measure(legacy, data, args.latency)}")
+    print(f"streaming ({args.workers} processes):        {measure(streaming, data, args.latency, args.workers)}")
+
+
+if __name__ == "__main__":
+    main()
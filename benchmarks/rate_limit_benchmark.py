@@ -0,0 +1,93 @@
+# benchmarks/rate_limit_benchmark.py
+#
+# Many threads calling an API that enforces a requests-per-second limit (simulated in-process), with
+# plain per-agent OpenAI clients versus the shared client layer (src/api_clients.py). Run from the
+# repository root:
+#   python -m benchmarks.rate_limit_benchmark --requests 150 --threads 20 --limit 40
+
+import argparse
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from openai import OpenAI
+
+from src.api_clients import ApiClients
+
+EMBEDDING = {"object": "list", "model": "text-embedding-3-small", "usage": {"prompt_tokens": 2, "total_tokens": 2},
+             "data": [{"object": "embedding", "index": 0, "embedding": [0.1, 0.2, 0.3]}]}
+
+
+class RateLimitedApi:
+    """
+    Mock transport handler answering embeddings requests, with at most `per_second` requests in any
+    one-second window and `latency_seconds` per request. Excess requests get a 429 with retry-after-ms.
+    """
+
+    def __init__(self, per_second: int, latency_seconds: float):
+        self.per_second = per_second
+        self.latency_seconds = latency_seconds
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self.accepted = 0
+        self.throttled = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            if len(self._recent) >= self.per_second:
+                self.throttled += 1
+                wait_ms = int((1.0 - (now - self._recent[0])) * 1000) + 1
+                return httpx.Response(429, headers={"retry-after-ms": str(wait_ms)},
+                                      json={"error": {"message": "Rate limit reached", "type": "requests"}})
+            self._recent.append(now)
+            self.accepted += 1
+        time.sleep(self.latency_seconds)
+        return httpx.Response(200, json=EMBEDDING)
+
+
+def run(client: OpenAI, requests: int, threads: int) -> dict:
+    failures = []
+
+    def call(i):
+        try:
+            client.embeddings.create(model="text-embedding-3-small", input=[f"question {i}"])
+        except Exception as e:
+            failures.append(type(e).__name__)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(call, range(requests)))
+    seconds = time.perf_counter() - start
+    return {"succeeded": requests - len(failures), "failed": len(failures), "seconds": round(seconds, 2),
+            "per_second": round((requests - len(failures)) / seconds, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate-limited API: per-agent clients vs the shared client layer")
+    parser.add_argument("--requests", type=int, default=150)
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=40, help="requests per second the simulated API accepts")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per request")
+    args = parser.parse_args()
+
+    # Each agent with its own client and the SDK's default retries, as before
+    api = RateLimitedApi(args.limit, args.latency)
+    plain = OpenAI(api_key="sk-offline", http_client=httpx.Client(transport=httpx.MockTransport(api)))
+    result = run(plain, args.requests, args.threads)
+    print(f"per-agent clients:   {result}, 429s from the API: {api.throttled}")
+
+    # One shared layer, told the account's limit
+    api = RateLimitedApi(args.limit, args.latency)
+    clients = ApiClients(requests_per_minute=args.limit * 60)
+    clients.http_client._transport.transport = httpx.MockTransport(api)
+    result = run(clients.openai("sk-offline"), args.requests, args.threads)
+    print(f"shared client layer: {result}, 429s from the API: {api.throttled}, guard: {clients.stats()}")
+
+
+if __name__ == "__main__":
+    main()
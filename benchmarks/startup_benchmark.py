@@ -0,0 +1,204 @@
+# benchmarks/startup_benchmark.py
+#
+# Cold start per entry point (streamlit_app.py, rag.py, pages/upload_pdf.py), each measured in a fresh
+# interpreter: the time to import everything the entry point imports, the time until the page has rendered
+# once, and for the chat pages the time until the first answer. The pages run under Streamlit's AppTest
+# with offline secrets, and the agent is built with the deterministic fakes, so no network is used (the
+# OpenAI SDK import that a real first model call adds is not included). Times are from interpreter start;
+# the same times for a bare chat page are printed first, as AppTest's own share. Run from the repository root:
+#   python -m benchmarks.startup_benchmark --repeat 3
+#   python -m benchmarks.startup_benchmark --max-import-seconds 1.0   # exits with status 1 when exceeded
+# It also exits with status 1 if the upload page loads any of the heavy packages just to render.
+
+import time
+
+PROCESS_START = time.perf_counter()
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# The Streamlit main script; pages under pages/ are opened from it, as a page switch in the running app
+MAIN_SCRIPT = "streamlit_app.py"
+# Entry point -> question asked for the time to first response (None for pages without a chat)
+ENTRY_POINTS = {
+    "streamlit_app.py": "How do I enter the Q3 sales contest?",
+    "rag.py": "How do I enter the Q3 sales contest?",
+    "pages/upload_pdf.py": None,
+}
+# A chat page that does nothing, to measure AppTest's own overhead
+BARE = "bare"
+BARE_PAGE = """
+import streamlit as st
+if prompt := st.chat_input("What is up?"):
+    with st.chat_message("user"):
+        st.markdown(prompt)
+    with st.chat_message("assistant"):
+        st.write_stream(iter([prompt]))
+"""
+# Packages that are slow to import and that a page should only load when it needs them
+HEAVY_PACKAGES = ("openai", "langchain_openai", "pinecone", "langgraph", "pandas", "numpy", "PyPDF2", "tiktoken")
+# Entry point -> heavy packages it must not load before its first action (the upload page needs none of
+# them until something is uploaded)
+FORBIDDEN_PACKAGES = {
+    "pages/upload_pdf.py": HEAVY_PACKAGES,
+}
+
+
+def offline_secrets(directory: str) -> dict:
+    return {"OPENAI_API_KEY": "offline", "LANGCHAIN_API_KEY": "offline", "PINECONE_API_KEY": "offline",
+            "PINECONE_API_ENV": "offline", "PINECONE_INDEX_NAME": "offline", "VECTOR_BACKEND": "local",
+            "LOCAL_INDEX_PATH": os.path.join(directory, "vector_index"), "CHECKPOINT_DB_PATH": "off",
+            "TICKET_DB_PATH": "off", "LEXICAL_INDEX_PATH": "off"}
+
+
+def offline_agent(api_key, **kwargs):
+    # AgentRuntime factory building the agent on the fakes; imported here so they are not counted at import
+    from benchmarks.fakes import FakeAsyncOpenAIClient, FakeChatModel, FakeOpenAIClient, keyword_router
+    from src.graph import salesCompAgent
+    from src.vector_store import NumpyVectorStore
+    client = FakeOpenAIClient(latency_seconds=0)
+    kwargs.update(model=FakeChatModel(latency_seconds=0, structured=keyword_router), client=client,
+                  index=NumpyVectorStore(), async_client=FakeAsyncOpenAIClient(client))
+    return salesCompAgent(api_key, **kwargs)
+
+
+def heavy_packages() -> list:
+    return [name for name in HEAVY_PACKAGES if name in sys.modules]
+
+
+def measure_imports(path: str) -> dict:
+    """
+    Run only the module-level import statements of an entry point, one at a time.
+    """
+    with open(path, "r") as file:
+        tree = ast.parse(file.read(), path)
+    namespace = {"__name__": "__startup__"}
+    statements, errors = [], []
+    start = time.perf_counter()
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            statement_start = time.perf_counter()
+            try:
+                exec(compile(ast.Module([node], type_ignores=[]), path, "exec"), namespace)
+            except Exception as error:
+                errors.append(f"{ast.unparse(node)}: {error!r}")
+            statements.append((round(time.perf_counter() - statement_start, 4), ast.unparse(node)))
+    result = {"import_seconds": round(time.perf_counter() - start, 4), "modules": len(sys.modules),
+              "heavy_packages": heavy_packages(), "slowest_imports": sorted(statements, reverse=True)[:3]}
+    if errors:
+        result["error"] = errors[0]
+    return result
+
+
+def measure_run(path: str, question: str) -> dict:
+    """
+    Render the page once and, for the chat pages, ask one question. Times are from process start.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    with tempfile.TemporaryDirectory() as directory:
+        if path == BARE:
+            app = AppTest.from_string(BARE_PAGE, default_timeout=120)
+        elif os.path.dirname(path) == "pages":
+            app = AppTest.from_file(os.path.abspath(MAIN_SCRIPT), default_timeout=120)
+            app.switch_page(path)
+        else:
+            app = AppTest.from_file(os.path.abspath(path), default_timeout=120)
+            # The chat pages get their agent from the runtime, which builds it on the fakes here
+            from src.runtime import get_runtime
+            get_runtime().factory = offline_agent
+        for key, value in offline_secrets(directory).items():
+            app.secrets[key] = value
+        app.run()
+        result = {"first_render_seconds": round(time.perf_counter() - PROCESS_START, 4),
+                  "heavy_packages_after_render": heavy_packages()}
+        if question is not None:
+            app.chat_input[0].set_value(question).run()
+            result["first_response_seconds"] = round(time.perf_counter() - PROCESS_START, 4)
+            result["answered"] = len(app.chat_message) >= 2
+        if len(app.exception):
+            result["error"] = app.exception[0].value
+        return result
+
+
+def run_child(mode: str, path: str) -> dict:
+    command = [sys.executable, "-m", "benchmarks.startup_benchmark", "--child", mode, path]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(f"{' '.join(command)} failed:\n{completed.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def median(runs: list, key: str) -> float:
+    return statistics.median(r[key] for r in runs)
+
+
+def measure_entry_point(path: str, repeat: int) -> dict:
+    imports = [run_child("imports", path) for _ in range(repeat)]
+    runs = [run_child("run", path) for _ in range(repeat)]
+    result = {"entry_point": path,
+              "import_seconds": round(median(imports, "import_seconds"), 4),
+              "first_render_seconds": round(median(runs, "first_render_seconds"), 4)}
+    if ENTRY_POINTS[path] is not None:
+        result["first_response_seconds"] = round(median(runs, "first_response_seconds"), 4)
+        result["answered"] = all(r["answered"] for r in runs)
+    result.update(modules=imports[0]["modules"], heavy_packages_at_import=imports[0]["heavy_packages"],
+                  heavy_packages_after_render=runs[0]["heavy_packages_after_render"],
+                  slowest_imports=imports[0]["slowest_imports"])
+    errors = [r["error"] for r in imports + runs if "error" in r]
+    if errors:
+        result["error"] = errors[0]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and time to first response per entry point")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per measurement (median is shown)")
+    parser.add_argument("--entry-point", action="append", choices=list(ENTRY_POINTS),
+                        help="measure only this entry point (repeatable)")
+    parser.add_argument("--max-import-seconds", type=float, help="exit with status 1 if an entry point imports slower")
+    parser.add_argument("--max-first-response-seconds", type=float,
+                        help="exit with status 1 if a chat page answers its first question slower")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, path = args.child
+        question = ENTRY_POINTS.get(path, "What is up?")
+        result = measure_imports(path) if mode == "imports" else measure_run(path, question)
+        print(json.dumps(result))
+        return
+
+    bare = [run_child("run", BARE) for _ in range(args.repeat)]
+    print({"bare_page": {key: round(median(bare, key), 4)
+                         for key in ("first_render_seconds", "first_response_seconds")}})
+    failures = []
+    for path in args.entry_point or ENTRY_POINTS:
+        result = measure_entry_point(path, args.repeat)
+        print(result)
+        if "error" in result or result.get("answered") is False:
+            failures.append(f"{path} did not run cleanly: {result.get('error', 'no answer')}")
+        loaded = sorted(set(FORBIDDEN_PACKAGES.get(path, ())) & set(result["heavy_packages_after_render"]))
+        if loaded:
+            failures.append(f"{path} loads {', '.join(loaded)} before anything is uploaded")
+        if args.max_import_seconds is not None and result["import_seconds"] > args.max_import_seconds:
+            failures.append(f"{path} imports in {result['import_seconds']}s (max {args.max_import_seconds}s)")
+        if (args.max_first_response_seconds is not None
+                and result.get("first_response_seconds", 0) > args.max_first_response_seconds):
+            failures.append(f"{path} answers after {result['first_response_seconds']}s "
+                            f"(max {args.max_first_response_seconds}s)")
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
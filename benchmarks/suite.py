@@ -0,0 +1,185 @@
+# benchmarks/suite.py
+#
+# Offline benchmark suite: per-node latency, turns/sec at several concurrency levels, classifier routing
+# overhead and ingestion throughput, all against the deterministic fakes. Run from the repository root:
+#   python -m benchmarks.suite --output results.json
+#   python -m benchmarks.suite --compare results.json   # exits with status 1 on a regression
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks.async_load import QUESTIONS, run_async, run_sync
+from benchmarks.fakes import FakeAsyncOpenAIClient, FakeChatModel, FakeOpenAIClient, keyword_router
+from benchmarks.ingestion_benchmark import make_chunks, run as run_ingestion
+from benchmarks.pdf_benchmark import make_pdf, measure as measure_pdf, streaming as stream_pdf
+from src.fast_classifier import DEFAULT_THRESHOLD
+from src.graph import salesCompAgent
+from src.vector_store import NumpyVectorStore
+
+# One question per route the fakes can reach (the clarify node needs a real model to be meaningful)
+ROUTE_QUESTIONS = QUESTIONS + ["Please open a support ticket about my missing payout."]
+
+
+def build_agent(latency: float, fast_classifier_threshold=DEFAULT_THRESHOLD) -> salesCompAgent:
+    client = FakeOpenAIClient(latency_seconds=latency)
+    index = NumpyVectorStore()
+    index.upsert([(f"chunk-{i}", client.embed(q), {"text": q, "docname": "policy.pdf", "index": i})
+                  for i, q in enumerate(ROUTE_QUESTIONS)])
+    return salesCompAgent("offline", model=FakeChatModel(latency_seconds=latency, structured=keyword_router),
+                          client=client, index=index, async_client=FakeAsyncOpenAIClient(client),
+                          fast_classifier_threshold=fast_classifier_threshold)
+
+
+def summarize(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {"count": len(samples), "mean_seconds": round(statistics.fmean(samples), 5),
+            "p50_seconds": round(statistics.median(samples), 5),
+            "p95_seconds": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 5)}
+
+
+def node_latency(agent: salesCompAgent, turns: int) -> dict:
+    """
+    Time every node by streaming graph updates: the nodes run one after another, so each node's
+    latency is the time between its update and the previous one.
+    """
+    samples = defaultdict(list)
+    turn_seconds = []
+    for i in range(turns):
+        question = ROUTE_QUESTIONS[i % len(ROUTE_QUESTIONS)]
+        start = last = time.perf_counter()
+        for update in agent.graph.stream({"initialMessage": question,
+                                          "sessionHistory": [{"role": "user", "content": question}]},
+                                         stream_mode="updates"):
+            now = time.perf_counter()
+            for node in update:
+                samples[node].append(now - last)
+            last = now
+        turn_seconds.append(last - start)
+    result = {node: summarize(s) for node, s in sorted(samples.items())}
+    result["turn"] = summarize(turn_seconds)
+    return result
+
+
+def throughput(latency: float, sessions: int, concurrency_levels: list) -> dict:
+    agent = build_agent(latency)
+    sync_seconds = run_sync(agent, sessions)
+    result = {"sync": {"sessions": sessions, "turns_per_second": round(sessions / sync_seconds, 2)}}
+    for level in concurrency_levels:
+        seconds = asyncio.run(run_async(agent, sessions, level))
+        result[f"async_{level}"] = {"sessions": sessions, "turns_per_second": round(sessions / seconds, 2)}
+    return result
+
+
+def classifier_overhead(latency: float, turns: int) -> dict:
+    """
+    Classifier latency and its share of each turn, with the local fast path on and with every
+    message sent to the LLM.
+    """
+    result = {}
+    for name, threshold in (("fast_path", DEFAULT_THRESHOLD), ("llm_only", None)):
+        agent = build_agent(latency, fast_classifier_threshold=threshold)
+        nodes = node_latency(agent, turns)
+        classifier = nodes["classifier"]["mean_seconds"]
+        llm_calls = agent.fast_classifier.stats()["llm_fallbacks"] if agent.fast_classifier else turns
+        result[name] = {"classifier_mean_seconds": classifier,
+                        "share_of_turn": round(classifier / nodes["turn"]["mean_seconds"], 3),
+                        "llm_classifier_calls_per_turn": round(llm_calls / turns, 3)}
+    return result
+
+
+def ingestion(latency: float, chunks: int, pages: int) -> dict:
+    text = run_ingestion(make_chunks(chunks), latency)
+    pdf = measure_pdf(stream_pdf, make_pdf(pages), latency, None)
+    pdf["chunks_per_second"] = round(pdf["chunks"] / pdf["seconds"], 1) if pdf["seconds"] else 0.0
+    return {"text": {"chunks": text["chunks"], "chunks_per_second": text["chunks_per_second"]}, "pdf": pdf}
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"python": platform.python_version(), "platform": platform.platform(), "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def _flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path + "."))
+        elif isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+
+def regressions(baseline: dict, current: dict, tolerance: float) -> list:
+    """
+    Metrics that got worse by more than `tolerance` (a fraction): latencies ("_seconds") that rose,
+    and throughputs ("per_second") that fell.
+    """
+    before, after = _flatten(baseline), _flatten(current)
+    found = []
+    for key, old in before.items():
+        new = after.get(key)
+        if new is None or not old or key.startswith("environment."):
+            continue
+        if key.endswith("per_second") and new < old * (1 - tolerance):
+            found.append(f"{key}: {old} -> {new}")
+        elif key.endswith("_seconds") and not key.endswith("per_second") and new > old * (1 + tolerance):
+            found.append(f"{key}: {old} -> {new}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite; writes results as JSON")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated seconds per model or embeddings call")
+    parser.add_argument("--turns", type=int, default=40, help="turns for per-node latency")
+    parser.add_argument("--sessions", type=int, default=40, help="turns per throughput measurement")
+    parser.add_argument("--concurrency", default="1,5,20", help="comma-separated async concurrency levels")
+    parser.add_argument("--chunks", type=int, default=400, help="chunks for text ingestion")
+    parser.add_argument("--pages", type=int, default=60, help="pages for PDF ingestion")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before failing")
+    args = parser.parse_args()
+
+    # The agents print routing decisions; keep them out of the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = {
+            "environment": environment(),
+            "parameters": {"latency_seconds": args.latency, "turns": args.turns, "sessions": args.sessions},
+            "node_latency": node_latency(build_agent(args.latency), args.turns),
+            "throughput": throughput(args.latency, args.sessions,
+                                     [int(c) for c in args.concurrency.split(",") if c]),
+            "classifier_overhead": classifier_overhead(args.latency, args.turns),
+            "ingestion": ingestion(args.latency, args.chunks, args.pages),
+        }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            found = regressions(json.load(f), results, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
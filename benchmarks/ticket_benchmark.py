@@ -0,0 +1,87 @@
+# benchmarks/ticket_benchmark.py
+#
+# Ticket turns against the local ticketing stand-in (src/ticket_queue.py LocalTicketServer) with a slow
+# endpoint: turn latency, model calls per ticket turn, near-duplicate merging and batched submission by
+# the background worker. Run from the repository root:
+#   python -m benchmarks.ticket_benchmark --reps 5 --endpoint-latency 0.5
+
+import argparse
+import statistics
+import time
+import uuid
+
+from benchmarks.fakes import FakeAsyncOpenAIClient, FakeChatModel, FakeOpenAIClient, structured_defaults
+from src.graph import salesCompAgent
+from src.ticket_queue import HttpTicketEndpoint, LocalTicketServer, TicketFields, TicketQueue, TicketWorker
+from src.vector_store import NumpyVectorStore
+
+# Each rep reports these; the third is a rewording of the first and should merge into its ticket
+REPORTS = [
+    "Please open a ticket: my Q3 commission payout for deal {deal} is missing $4,200.",
+    "Open a support ticket, I cannot log in to the commission portal since Monday.",
+    "Ticket please: the Q3 commission payout for deal {deal} is still missing $4,200.",
+]
+
+
+def ticket_router(schema, messages):
+    # Classify every message as a ticket and extract the fields from the latest human message
+    humans = [m for m in messages if getattr(m, "type", "") == "human"]
+    text = humans[-1].content if humans else ""
+    if schema is TicketFields:
+        deal = next((w for w in text.replace(",", " ").split() if w.startswith("D-")), None)
+        return TicketFields(summary=text[:80], description=text, deal_id=deal)
+    if "category" in schema.model_fields:
+        return schema(category="ticket")
+    return structured_defaults(schema)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ticket turns with a background ticketing worker")
+    parser.add_argument("--reps", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per model call")
+    parser.add_argument("--endpoint-latency", type=float, default=0.5, help="simulated seconds per ticketing request")
+    args = parser.parse_args()
+
+    server = LocalTicketServer(latency_seconds=args.endpoint_latency).start()
+    queue = TicketQueue(":memory:")
+    worker = TicketWorker(queue, HttpTicketEndpoint(server.url), linger_seconds=0.2).start()
+    model = FakeChatModel(latency_seconds=args.latency, structured=ticket_router)
+    client = FakeOpenAIClient(latency_seconds=args.latency)
+    agent = salesCompAgent("offline", model=model, client=client, index=NumpyVectorStore(),
+                           async_client=FakeAsyncOpenAIClient(client), fast_classifier_threshold=None,
+                           ticket_queue=queue, ticket_worker=worker)
+
+    turn_seconds, calls = [], []
+    start = time.perf_counter()
+    for report in REPORTS:
+        for rep in range(args.reps):
+            message = report.format(deal=f"D-{1000 + rep}")
+            run_id = uuid.uuid4()
+            turn_start = time.perf_counter()
+            result = agent.graph.invoke({"initialMessage": message, "sessionHistory": [{"role": "user", "content": message}]},
+                                        {"run_id": run_id, "configurable": {"thread_id": f"rep-{rep}"}})
+            turn_seconds.append(time.perf_counter() - turn_start)
+            assert result["category"] == "ticket", result
+            # Every turn also makes the classifier call
+            calls.append(agent.metrics.pop_turn(run_id).llm_calls - 1)
+    queued = time.perf_counter() - start
+
+    while queue.stats().get("submitted", 0) < queue.stats()["tickets"] and time.perf_counter() - start < 60:
+        time.sleep(0.05)
+    submitted = time.perf_counter() - start
+    worker.stop()
+    server.shutdown()
+
+    print(f"simulated model latency {args.latency}s, ticketing endpoint latency {args.endpoint_latency}s")
+    print({"ticket_turns": len(turn_seconds),
+           "turn_mean_seconds": round(statistics.fmean(turn_seconds), 4),
+           "turn_max_seconds": round(max(turn_seconds), 4),
+           "model_calls_per_ticket_turn": max(calls),
+           "all_queued_after_seconds": round(queued, 3),
+           "all_submitted_after_seconds": round(submitted, 3)})
+    print({"queue": queue.stats(), "worker": worker.stats(), "endpoint_requests": server.requests,
+           "endpoint_tickets": len(server.tickets)})
+
+
+if __name__ == "__main__":
+    main()
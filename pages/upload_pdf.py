@@ -1,48 +1,59 @@
 import os
-import PyPDF2
-import hashlib
-import numpy as np
 
 import streamlit as st
 from streamlit.logger import get_logger
 
-from pinecone import Pinecone
-from openai import OpenAI
-
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.document_loaders import PyPDFLoader
-
+from src.api_clients import get_default_clients
+from src.config import AgentConfig
+from src.embedding_cache import get_default_cache
+from src.lexical_index import get_default_lexical_index
 from src.utils import show_navigation
 show_navigation()
 
 LOGGER = get_logger(__name__)
 
-PINECONE_API_KEY=st.secrets['PINECONE_API_KEY']
-PINECONE_API_ENV=st.secrets['PINECONE_API_ENV']
-PINECONE_INDEX_NAME=st.secrets['PINECONE_INDEX_NAME']
+# The same settings the agents are built from, so uploads go to the index the chat pages query
+config=AgentConfig.from_streamlit()
 
-client=OpenAI(api_key=st.secrets['OPENAI_API_KEY'])
+def ingestion_pipeline():
+    # The PDF and splitting backends are loaded on the first upload rather than on every page view
+    from src.answer_cache import get_default_generations
+    from src.chunk_manifest import get_default_chunk_manifest
+    from src.ingestion import IngestionPipeline
+    from src.vector_store import open_vector_store
+    # Same client layer as the agents (src/api_clients.py), so uploads and chat share the rate limits.
+    # The OpenAI client is only built once something is uploaded, not every time the page is shown.
+    clients = get_default_clients(config.openai_requests_per_minute, config.openai_tokens_per_minute)
+    client = clients.openai(config.openai_api_key)
+    # Pinecone by default; VECTOR_BACKEND="local" writes to the in-process NumpyVectorStore instead
+    index = open_vector_store(config.vector_backend, pinecone_api_key=config.pinecone_api_key,
+                              index_name=config.pinecone_index_name, local_path=config.local_index_path)
+    progress_bar = st.progress(0.0, text="Embedding chunks...")
+    def show_progress(p):
+        progress_bar.progress(p.fraction, text=f"Embedded {p.chunks_done} chunks ({p.chunks_per_second:.1f} chunks/sec)")
+    # Chunks are embedded in batches and upserted in bulk by a small pool of workers.
+    # Chunks already in the embedding cache (unchanged since the last upload) reuse their embedding,
+    # but every chunk is upserted again. All chunks are also added to the lexical index used for hybrid retrieval.
+    lexical_index = get_default_lexical_index(config.lexical_index_path) if config.lexical_index_path else None
+    # Re-uploads bump the shared document generations, so every worker drops the answers they made stale,
+    # and the chunk manifest lets a re-upload delete the chunks its previous version had and it does not
+    return IngestionPipeline(client, index, progress_callback=show_progress, embedding_cache=get_default_cache(),
+                             lexical_index=lexical_index, answer_generations=get_default_generations(),
+                             chunk_manifest=get_default_chunk_manifest())
 
-def pdf_to_text(uploaded_file):
-    pdfReader = PyPDF2.PdfReader(uploaded_file)
-    count = len(pdfReader.pages)
-    text=""
-    for i in range(count):
-        page = pdfReader.pages[i]
-        text=text+page.extract_text()
-    return text
+def report(result, filename):
+    LOGGER.info(f"Ingested {result.chunks} chunks from {filename} in {result.elapsed_seconds:.2f}s ({result.chunks_per_second:.1f} chunks/sec, {result.retries} retries)")
+    st.success(f"Uploaded {result.chunks} chunks in {result.elapsed_seconds:.1f}s ({result.cached_chunks} embeddings reused, "
+               f"{result.superseded_chunks} outdated chunks removed)")
+    return
 
 def embed(text,filename):
-    pc = Pinecone(api_key=st.secrets['PINECONE_API_KEY'])
-    index = pc.Index(PINECONE_INDEX_NAME)
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size = 1000,chunk_overlap  = 200,length_function = len,is_separator_regex = False)
-    docs=text_splitter.create_documents([text])
-    for idx,d in enumerate(docs):
-        hash=hashlib.md5(d.page_content.encode('utf-8')).hexdigest()
-        embedding=client.embeddings.create(model="text-embedding-ada-002", input=d.page_content).data[0].embedding
-        metadata={"hash":hash,"text":d.page_content,"index":idx,"model":"text-embedding-ada-003","docname":filename}
-        index.upsert([(hash,embedding,metadata)])
-    return
+    report(ingestion_pipeline().ingest_text(text, filename), filename)
+
+def embed_pdf(uploaded_file):
+    # Pages are extracted in parallel and streamed into the splitter and embedding stage,
+    # so the whole document is never held as one string. Each chunk records its page number.
+    report(ingestion_pipeline().ingest_pdf(uploaded_file, uploaded_file.name), uploaded_file.name)
 
 #
 # Direcly access Text Input    
@@ -59,5 +70,4 @@ st.markdown("# Upload file: PDF")
 uploaded_file=st.file_uploader("Upload PDF file",type="pdf")
 if uploaded_file is not None:
     if st.button('Process and Upload File'):
-        pdf_text = pdf_to_text(uploaded_file)
-        embedding = embed(pdf_text,uploaded_file.name)
\ No newline at end of file
+        embedding = embed_pdf(uploaded_file)
\ No newline at end of file
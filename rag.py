@@ -1,8 +1,9 @@
 import streamlit as st
 import os
-import random
-from src.graph import salesCompAgent
-from src.utils import show_navigation
+import uuid
+from src.runtime import get_agent, get_runtime
+from src.streaming import get_ttft_recorder
+from src.utils import run_config, show_navigation
 
 # Set environment variables
 os.environ["LANGCHAIN_TRACING_V2"]="true"
@@ -17,15 +18,19 @@ def start_chat():
     show_navigation()
     avatars={"system":"💻🧠","user":"🧑‍💼","assistant":"🎓"}
     
+    # Ensuring a unique thread-id is maintained for every conversation. It is kept in the URL so
+    # a reload (or a restarted server) resumes the conversation stored by the checkpointer.
+    if "thread_id" not in st.session_state:
+        st.session_state.thread_id = st.query_params.get("thread") or uuid.uuid4().hex
+        st.query_params["thread"] = st.session_state.thread_id
+    thread_id = st.session_state.thread_id
+    # The signed-in user's id goes along too, so repeated reports merge into one ticket across chats
+    thread=run_config(thread_id)
+
     # Keeping context of conversations, checks if there is anything in messages array
-    # If not, it creates an empty list where all messages will be saved
+    # If not, it loads the stored conversation for this thread (empty for a new one)
     if "messages" not in st.session_state:
-        st.session_state.messages = []
-
-    # Ensuring a unique thread-id is maintained for every conversation
-    if "thread-id" not in st.session_state:
-        st.session_state.thread_id = random.randint(1000, 9999)
-    thread_id = st.session_state.thread_id
+        st.session_state.messages = get_agent().conversation(thread)
 
     # Display previous messages
     for message in st.session_state.messages:
@@ -41,23 +46,29 @@ def start_chat():
         with st.chat_message("user", avatar=avatars["user"]):
             st.markdown(prompt)
         
-        # Initialize salesCompAgent
-        abot=salesCompAgent(st.secrets['OPENAI_API_KEY'])
-        thread={"configurable":{"thread_id":thread_id}}
-        
-        # Stream responses from the agent
-        for s in abot.graph.stream({'initialMessage': prompt}, thread):
-            #st.sidebar.write(abot.graph.get_state(thread))
-            if DEBUGGING:
-                print(f"GRAPH RUN: {s}")
-                st.write(s)
-            for k,v in s.items():
-                if DEBUGGING:
-                    print(f"Key: {k}, Value: {v}")
-            if resp := v.get("responseToUser"):
-                with st.chat_message("assistant", avatar=avatars["assistant"]):
-                    st.write(resp)
-                st.session_state.messages.append({"role": "assistant", "content": resp})
+        # Reuse the process-wide salesCompAgent instead of rebuilding it every turn
+        abot=get_agent()
+        if DEBUGGING:
+            print(f"RUNTIME: {get_runtime().stats()}")
+        # Stream tokens from the agent into the chat as they are generated
+        final = {}
+        def tokens():
+            for kind, payload in abot.stream_tokens(abot.turn_input(prompt, st.session_state.messages), thread):
+                if kind == "token":
+                    yield payload
+                else:
+                    final.update(payload)
+
+        with st.chat_message("assistant", avatar=avatars["assistant"]):
+            streamed = st.write_stream(tokens())
+            resp = final.get("responseToUser") or streamed
+            if resp and not streamed:
+                st.write(resp)
+        if DEBUGGING:
+            print(f"GRAPH RUN: {final}")
+            print(f"TTFT: {get_ttft_recorder().stats()}")
+        if resp:
+            st.session_state.messages.append({"role": "assistant", "content": resp})
 
 if __name__ == '__main__':
     start_chat()
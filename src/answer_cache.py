@@ -0,0 +1,311 @@
+# src/answer_cache.py
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+import numpy as np
+
+DEFAULT_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+DEFAULT_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "512"))
+# Document generations shared by every process answering from the same index; "off" keeps invalidation in-process
+DEFAULT_GENERATIONS_PATH = os.environ.get("ANSWER_CACHE_GENERATIONS_PATH", ".cache/answer_generations.sqlite")
+
+# Every live cache, so ingestion can invalidate answers without holding a reference to the agents
+_caches = weakref.WeakSet()
+
+
+def normalize_question(question: str) -> str:
+    """
+    Key for exact-text lookups: lower case, single spaces, no trailing punctuation.
+    """
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?!. ")
+
+
+class DocumentGenerations:
+    """
+    Persistent per-document generation numbers, so answers cached in one process are invalidated when
+    another process (the upload page, a folder sync) re-ingests a document they drew on.
+
+    Every invalidation takes the next number of one sequence shared by all documents. An answer records
+    the sequence number current when its retrieval started and is stale once any of its documents has a
+    higher generation.
+    """
+
+    def __init__(self, path: str = DEFAULT_GENERATIONS_PATH):
+        """
+        :param path: SQLite database file, or ":memory:" for a throwaway store.
+        """
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS generations (docname TEXT PRIMARY KEY, generation INTEGER NOT NULL)")
+
+    def current(self) -> int:
+        """
+        The latest generation of any document.
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(generation), 0) FROM generations").fetchone()[0]
+
+    def latest(self, docnames: Iterable[str]) -> int:
+        """
+        The highest generation among the given documents (0 if none was ever invalidated).
+        """
+        docnames = list(docnames)
+        if not docnames:
+            return 0
+        placeholders = ",".join("?" * len(docnames))
+        with self._lock:
+            return self._conn.execute(f"SELECT COALESCE(MAX(generation), 0) FROM generations "
+                                      f"WHERE docname IN ({placeholders})", docnames).fetchone()[0]
+
+    def bump(self, docnames: Iterable[str]) -> int:
+        """
+        Give the documents a new generation, invalidating answers cached from their previous content.
+
+        :return: The new generation.
+        """
+        docnames = list(docnames)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                generation = self._conn.execute("SELECT COALESCE(MAX(generation), 0) + 1 FROM generations").fetchone()[0]
+                self._conn.executemany("INSERT OR REPLACE INTO generations (docname, generation) VALUES (?, ?)",
+                                       [(docname, generation) for docname in docnames])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return generation
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    # None for answers stored without an embedding (lexical-only retrieval); those match on text only
+    embedding: Optional[np.ndarray]
+    answer: str
+    docnames: frozenset
+    generation_seconds: float
+    created_at: float = field(default_factory=time.time)
+    # DocumentGenerations sequence number when the answer's retrieval started
+    documents_generation: int = 0
+
+
+class SemanticAnswerCache:
+    """
+    Cache of policy answers looked up by question similarity rather than exact text.
+
+    A question whose embedding has cosine similarity >= threshold with a stored question gets the
+    stored answer, as does a question whose normalized text equals a stored one (so questions answered
+    without an embedding are cached too). Entries expire after ttl_seconds, the least recently used entry is evicted when
+    the cache is full, and entries are dropped when a document they drew on is re-ingested, in this
+    process or, with a DocumentGenerations store, in any other.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, generations: Optional[DocumentGenerations] = None):
+        """
+        :param threshold: Minimum cosine similarity for a cache hit.
+        :param ttl_seconds: How long an answer stays valid.
+        :param max_entries: Maximum number of cached answers.
+        :param generations: Persistent document generations, checked on every hit.
+        """
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.generations = generations
+        self._entries = OrderedDict()
+        # Normalized question text -> key of its latest entry
+        self._by_text = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.latency_saved_seconds = 0.0
+        _caches.add(self)
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.array(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        text = normalize_question(entry.question)
+        if self._by_text.get(text) == key:
+            del self._by_text[text]
+
+    def _expire(self, now: float):
+        expired = [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl_seconds]
+        for key in expired:
+            self._remove(key)
+        self.evictions += len(expired)
+
+    def _match(self, embedding, question: Optional[str]):
+        # Key of the entry for this question: same normalized text first, then the most similar embedding
+        if question is not None:
+            key = self._by_text.get(normalize_question(question))
+            if key is not None:
+                return key
+        if embedding is None:
+            return None
+        keys = [k for k, entry in self._entries.items() if entry.embedding is not None]
+        if not keys:
+            return None
+        scores = np.stack([self._entries[k].embedding for k in keys]) @ self._normalize(embedding)
+        best = int(np.argmax(scores))
+        return keys[best] if scores[best] >= self.threshold else None
+
+    def _outdated(self, entry: CachedAnswer) -> bool:
+        if self.generations is None or not entry.docnames:
+            return False
+        return self.generations.latest(entry.docnames) > entry.documents_generation
+
+    def generation(self) -> int:
+        """
+        The current document generation, to pass to store() for an answer whose retrieval starts now.
+        """
+        return self.generations.current() if self.generations is not None else 0
+
+    def lookup(self, embedding=None, question: str = None) -> Optional[CachedAnswer]:
+        """
+        Find a cached answer for a question.
+
+        :param embedding: Embedding of the incoming question, if there is one.
+        :param question: Text of the incoming question, matched exactly after normalization.
+        :return: The matching CachedAnswer, or None.
+        """
+        with self._lock:
+            self._expire(time.time())
+            key = self._match(embedding, question)
+            # A hit whose documents were re-ingested elsewhere is dropped and the next best match tried
+            while key is not None and self._outdated(self._entries[key]):
+                self._remove(key)
+                self.invalidations += 1
+                key = self._match(embedding, question)
+            if key is not None:
+                self._entries.move_to_end(key)
+                entry = self._entries[key]
+                self.hits += 1
+                self.latency_saved_seconds += entry.generation_seconds
+                return entry
+            self.misses += 1
+            return None
+
+    def store(self, question: str, embedding, answer: str, docnames: Iterable[str], generation_seconds: float,
+              documents_generation: Optional[int] = None):
+        """
+        Cache an answer.
+
+        :param question: The question that was answered.
+        :param embedding: Embedding of the question, or None to match it on its text only.
+        :param answer: The generated answer.
+        :param docnames: Names of the documents the answer drew on.
+        :param generation_seconds: Time it took to produce the answer, credited to later hits.
+        :param documents_generation: generation() from before the documents were retrieved. Defaults to now.
+        """
+        if documents_generation is None:
+            documents_generation = self.generation()
+        entry = CachedAnswer(question, None if embedding is None else self._normalize(embedding), answer,
+                             frozenset(d for d in docnames if d), generation_seconds,
+                             documents_generation=documents_generation)
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._by_text[normalize_question(question)] = self._next_id
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_documents(self, docnames: Iterable[str]) -> int:
+        """
+        Drop every answer that drew on any of the given documents.
+
+        :return: The number of entries removed.
+        """
+        docnames = set(docnames)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry.docnames & docnames]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_text.clear()
+
+    def stats(self) -> dict:
+        """
+        Report hit rate, size and the generation time saved by cache hits.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "latency_saved_seconds": round(self.latency_saved_seconds, 3),
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_default_generations = None
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_generations() -> Optional[DocumentGenerations]:
+    """
+    Return the process-wide DocumentGenerations store, or None if ANSWER_CACHE_GENERATIONS_PATH is "off".
+    """
+    global _default_generations
+    if DEFAULT_GENERATIONS_PATH.lower() == "off":
+        return None
+    with _default_cache_lock:
+        if _default_generations is None:
+            _default_generations = DocumentGenerations(DEFAULT_GENERATIONS_PATH)
+        return _default_generations
+
+
+def invalidate_documents(docnames: Iterable[str], generations: Optional[DocumentGenerations] = None) -> int:
+    """
+    Invalidate cached answers drawing on the given documents: dropped now in every answer cache in this
+    process, and, when `generations` is given, in other processes on their next hit.
+
+    :param generations: The document generations shared with the answering processes (the app entry points
+                        pass get_default_generations()); None only invalidates this process's caches.
+    """
+    docnames = list(docnames)
+    if generations is not None and docnames:
+        generations.bump(docnames)
+    return sum(cache.invalidate_documents(docnames) for cache in list(_caches))
+
+
+def get_default_answer_cache() -> SemanticAnswerCache:
+    """
+    Return the process-wide answer cache used by the PolicyAgent.
+    """
+    global _default_cache
+    generations = get_default_generations()
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SemanticAnswerCache(generations=generations)
+        return _default_cache
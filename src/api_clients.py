@@ -0,0 +1,371 @@
+# src/api_clients.py
+
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Optional
+
+import httpx
+
+from src.rate_limit import RateLimiter
+
+# Statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+# Tokens reserved for the completion of a chat request whose size is not known up front
+COMPLETION_RESERVE_TOKENS = 256
+
+
+class CircuitOpenError(httpx.TransportError):
+    """
+    Raised instead of sending a request while the circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to an API that keeps failing, so callers fail fast instead of piling up
+    timeouts and retries against an outage.
+
+    After `failure_threshold` consecutive failures the circuit opens and every request is rejected for
+    `reset_seconds`. Then a single probe request is let through: success closes the circuit, failure
+    opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        """
+        :param failure_threshold: Consecutive failures that open the circuit.
+        :param reset_seconds: How long the circuit stays open before a probe request is allowed.
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def abandon(self):
+        """
+        Free the probe slot of a request that ended without a response or a transport error (cancelled,
+        or failed in our own code), so the next request can probe instead of the circuit staying open.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self.opened += 1
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class RequestGuard:
+    """
+    The policy applied to every API request: circuit breaker, rate limits, and retries with jittered
+    exponential backoff (honouring Retry-After). Shared by the sync and async transports.
+    """
+
+    def __init__(self, limiter: Optional[RateLimiter] = None, breaker: Optional[CircuitBreaker] = None,
+                 max_retries: int = 4, backoff_seconds: float = 0.5, max_backoff_seconds: float = 20.0):
+        """
+        :param limiter: Requests- and tokens-per-minute limits, or None for no limit.
+        :param breaker: Circuit breaker, or None to never stop sending.
+        :param max_retries: Extra attempts for a request that failed with a retryable status or a network error.
+        :param backoff_seconds: Base delay of the exponential backoff.
+        :param max_backoff_seconds: Upper bound of a single backoff delay.
+        """
+        self.limiter = limiter
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max(0, max_retries)
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "retries": 0, "throttled": 0, "rejected": 0, "failed": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    @staticmethod
+    def estimate_tokens(request: httpx.Request) -> int:
+        # About four bytes of JSON per token, plus room for the answer of chat requests
+        try:
+            size = len(request.content)
+        except httpx.RequestNotRead:
+            return 0
+        reserve = COMPLETION_RESERVE_TOKENS if request.url.path.endswith("/chat/completions") else 0
+        return size // 4 + reserve
+
+    def delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """
+        Seconds to wait before retry number `attempt` (0-based): the server's Retry-After if it sent one,
+        otherwise full-jitter exponential backoff.
+        """
+        if response is not None:
+            for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+                try:
+                    return min(self.max_backoff_seconds, float(response.headers[header]) * scale) + random.uniform(0, 0.1)
+                except (KeyError, ValueError):
+                    pass
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+
+    def _backoff(self, attempt: int, response: httpx.Response) -> float:
+        # A 429 means the whole process is over the limit, so everyone sharing the limiter waits too;
+        # the retry then queues for the limiter like any other request
+        wait = self.delay(attempt, response)
+        if response.status_code == 429 and self.limiter is not None:
+            self.limiter.pause(wait)
+            return 0.0
+        return wait
+
+    def _admit(self):
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError("circuit open: the API has been failing, not sending the request")
+        self._count("requests")
+
+    def _outcome(self, response: httpx.Response, attempt: int) -> bool:
+        """
+        Record a response and decide whether it should be retried.
+        """
+        status = response.status_code
+        if status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        if status == 429:
+            self._count("throttled")
+        if status in RETRY_STATUSES and attempt < self.max_retries:
+            self._count("retries")
+            return True
+        if status in RETRY_STATUSES:
+            self._count("failed")
+        return False
+
+    def _transport_error(self, attempt: int) -> bool:
+        self.breaker.record_failure()
+        if attempt < self.max_retries:
+            self._count("retries")
+            return True
+        self._count("failed")
+        return False
+
+    def _settle(self, response: httpx.Response, body: bytes, estimate: int) -> httpx.Response:
+        # Correct the token reservation with the usage the API reported, and hand the already decoded
+        # body back to the client in a fresh response
+        headers = [(k, v) for k, v in response.headers.multi_items()
+                   if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")]
+        try:
+            usage = json.loads(body).get("usage") or {}
+            self.limiter.settle(0, usage.get("total_tokens", estimate) - estimate)
+        except (ValueError, AttributeError):
+            pass
+        return httpx.Response(response.status_code, headers=headers, content=body,
+                              extensions=response.extensions)
+
+    def _should_settle(self, response: httpx.Response) -> bool:
+        return (self.limiter is not None and response.status_code == 200
+                and response.headers.get("content-type", "").startswith("application/json"))
+
+    def send(self, request: httpx.Request, handle) -> httpx.Response:
+        """
+        Send a request through `handle` (the wrapped transport), applying the policy.
+        """
+        tokens = self.estimate_tokens(request)
+        attempt = 0
+        while True:
+            self._admit()
+            try:
+                if self.limiter is not None:
+                    self.limiter.acquire(1, tokens)
+                response = handle(request)
+            except httpx.TransportError:
+                if not self._transport_error(attempt):
+                    raise
+                time.sleep(self.delay(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled (the client went away) or failed outside the API: no outcome to record
+                self.breaker.abandon()
+                raise
+            if self._outcome(response, attempt):
+                wait = self._backoff(attempt, response)
+                response.close()
+                time.sleep(wait)
+                attempt += 1
+                continue
+            if self._should_settle(response):
+                body = response.read()
+                response.close()
+                return self._settle(response, body, tokens)
+            return response
+
+    async def asend(self, request: httpx.Request, handle) -> httpx.Response:
+        """
+        Async version of send.
+        """
+        tokens = self.estimate_tokens(request)
+        attempt = 0
+        while True:
+            self._admit()
+            try:
+                if self.limiter is not None:
+                    await self.limiter.aacquire(1, tokens)
+                response = await handle(request)
+            except httpx.TransportError:
+                if not self._transport_error(attempt):
+                    raise
+                await asyncio.sleep(self.delay(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            if self._outcome(response, attempt):
+                wait = self._backoff(attempt, response)
+                await response.aclose()
+                await asyncio.sleep(wait)
+                attempt += 1
+                continue
+            if self._should_settle(response):
+                body = await response.aread()
+                await response.aclose()
+                return self._settle(response, body, tokens)
+            return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        counts["circuit"] = self.breaker.state
+        counts["circuit_opened"] = self.breaker.opened
+        if self.limiter is not None:
+            counts["rate_limit"] = self.limiter.stats()
+        return counts
+
+
+class GuardedTransport(httpx.BaseTransport):
+    """
+    httpx transport that sends every request through a RequestGuard over a pooled HTTPTransport.
+    """
+
+    def __init__(self, guard: RequestGuard, transport: httpx.BaseTransport):
+        self.guard = guard
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self.guard.send(request, self.transport.handle_request)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncGuardedTransport(httpx.AsyncBaseTransport):
+    """
+    Async version of GuardedTransport.
+    """
+
+    def __init__(self, guard: RequestGuard, transport: httpx.AsyncBaseTransport):
+        self.guard = guard
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.guard.asend(request, self.transport.handle_async_request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class ApiClients:
+    """
+    The one client layer every agent and the ingestion code use to reach OpenAI.
+
+    All clients built here share a connection pool per sync/async side and one RequestGuard: a
+    requests- and tokens-per-minute limiter, retries with jittered backoff and a circuit breaker. Under
+    load, requests therefore queue for the rate limit instead of each node hitting 429s and failing on
+    its own. The OpenAI SDK's own retries are turned off so the guard is the only retry layer.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_connections: int = 20, max_retries: int = 4, failure_threshold: int = 5,
+                 reset_seconds: float = 30.0):
+        """
+        :param requests_per_minute: Request limit for the API key, or None.
+        :param tokens_per_minute: Token limit for the API key, or None.
+        :param max_connections: Size of each HTTP connection pool.
+        :param max_retries: Retries per request on 429, 5xx and network errors.
+        :param failure_threshold: Consecutive failures that open the circuit breaker.
+        :param reset_seconds: Time the circuit stays open before a probe request.
+        """
+        limiter = RateLimiter(requests_per_minute, tokens_per_minute) if requests_per_minute or tokens_per_minute else None
+        self.guard = RequestGuard(limiter, CircuitBreaker(failure_threshold, reset_seconds), max_retries=max_retries)
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        timeout = httpx.Timeout(60.0, connect=10.0)
+        self.http_client = httpx.Client(
+            transport=GuardedTransport(self.guard, httpx.HTTPTransport(limits=limits)), timeout=timeout)
+        self.async_http_client = httpx.AsyncClient(
+            transport=AsyncGuardedTransport(self.guard, httpx.AsyncHTTPTransport(limits=limits)), timeout=timeout)
+
+    def openai(self, api_key: str):
+        from openai import OpenAI
+        return OpenAI(api_key=api_key, http_client=self.http_client, max_retries=0)
+
+    def async_openai(self, api_key: str):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=api_key, http_client=self.async_http_client, max_retries=0)
+
+    def chat_model(self, api_key: str, **kwargs):
+        """
+        A LangChain ChatOpenAI using the shared clients for both its sync and async calls.
+        """
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(api_key=api_key, http_client=self.http_client, http_async_client=self.async_http_client,
+                          max_retries=0, **kwargs)
+
+    def stats(self) -> dict:
+        return self.guard.stats()
+
+    def close(self):
+        self.http_client.close()
+
+
+_default_clients = {}
+_default_lock = threading.Lock()
+
+
+def get_default_clients(requests_per_minute: Optional[float] = None,
+                        tokens_per_minute: Optional[float] = None) -> ApiClients:
+    """
+    Process-wide client layer for a pair of rate limits, shared by every agent and page using them.
+    """
+    key = (requests_per_minute, tokens_per_minute)
+    with _default_lock:
+        if key not in _default_clients:
+            _default_clients[key] = ApiClients(requests_per_minute, tokens_per_minute)
+        return _default_clients[key]
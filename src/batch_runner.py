@@ -0,0 +1,213 @@
+# src/batch_runner.py
+#
+# Run a JSONL file of questions through the agent graph, for regression checks after prompt changes
+# and for pre-warming the caches. Run from the repository root:
+#   python -m src.batch_runner questions.jsonl -o answers.jsonl --concurrency 8 --rpm 500 --tpm 200000
+#
+# Each input line is {"id": ..., "question": ...} ("id" defaults to the line number). Each output line is
+# {"id", "question", "category", "response", "latency_seconds", "llm_calls", "prompt_tokens",
+# "completion_tokens", "cost_usd"}, or {"id", "question", "error"} for a question that kept failing.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from dataclasses import replace
+from typing import Callable, Optional
+
+from src.config import load_config
+from src.rate_limit import RateLimiter
+
+
+def read_questions(path: str) -> list:
+    questions = []
+    with open(path, "r") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            question = item.get("question") or item.get("message")
+            if not question:
+                print(f"batch_runner: skipping line {line_no}, no question")
+                continue
+            questions.append({"id": str(item.get("id", line_no)), "question": question})
+    return questions
+
+
+def completed_ids(output_path: str) -> set:
+    """
+    Ids already answered in an earlier run's output. Questions that ended with an error are not
+    included, so they are retried.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r") as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash
+                continue
+            if "error" not in item:
+                done.add(str(item["id"]))
+    return done
+
+
+class BatchRunner:
+    """
+    Runs many questions through salesCompAgent.graph concurrently, within API rate limits.
+
+    Each question reserves its expected requests and tokens from the RateLimiter before it starts, and
+    the estimate is settled against the real usage recorded by the agent's MetricsRecorder afterwards.
+    The estimate follows a running average of recent questions. Failed questions are retried with
+    jittered exponential backoff.
+    """
+
+    def __init__(self, agent, limiter: Optional[RateLimiter] = None, concurrency: int = 8, retries: int = 2,
+                 backoff_seconds: float = 1.0):
+        """
+        :param agent: The salesCompAgent to run, ideally built without a checkpointer (see main).
+        :param limiter: Requests- and tokens-per-minute limits shared by all questions. None for no limit.
+        :param concurrency: Questions in flight at once.
+        :param retries: Extra attempts for a question whose run raised.
+        :param backoff_seconds: Delay before the first retry; doubled for each further one.
+        """
+        self.agent = agent
+        self.limiter = limiter
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        # Running estimates of one question's cost, starting from a classifier call plus an answer
+        self.requests_estimate = 3.0
+        self.tokens_estimate = 1500.0
+
+    def _learn(self, requests: int, tokens: int):
+        self.requests_estimate = 0.8 * self.requests_estimate + 0.2 * requests
+        self.tokens_estimate = 0.8 * self.tokens_estimate + 0.2 * tokens
+
+    async def run_one(self, item: dict) -> dict:
+        """
+        Answer one question, retrying failures.
+
+        :return: The output record for the question.
+        """
+        question = item["question"]
+        error = None
+        for attempt in range(self.retries + 1):
+            requests, tokens = self.requests_estimate, self.tokens_estimate
+            if self.limiter is not None:
+                await self.limiter.aacquire(requests, tokens)
+            run_id = uuid.uuid4()
+            config = {"run_id": run_id, "configurable": {"thread_id": f"batch-{run_id.hex}"}}
+            start = time.perf_counter()
+            try:
+                result = await self.agent.graph.ainvoke(
+                    self.agent.turn_input(question, [{"role": "user", "content": question}]), config)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                turn = self.agent.metrics.pop_turn(run_id)
+                if self.limiter is not None and turn is not None:
+                    self.limiter.settle(turn.llm_calls + turn.embedding_calls - requests,
+                                        turn.prompt_tokens + turn.completion_tokens + turn.embedding_tokens - tokens)
+                if attempt < self.retries:
+                    await asyncio.sleep(self.backoff_seconds * 2 ** attempt * random.uniform(0.5, 1.5))
+                continue
+            latency = time.perf_counter() - start
+            turn = self.agent.metrics.pop_turn(run_id)
+            record = {"id": item["id"], "question": question, "category": result.get("category"),
+                      "response": result.get("responseToUser"), "latency_seconds": round(latency, 4)}
+            if turn is not None:
+                used_requests = turn.llm_calls + turn.embedding_calls
+                used_tokens = turn.prompt_tokens + turn.completion_tokens + turn.embedding_tokens
+                if self.limiter is not None:
+                    self.limiter.settle(used_requests - requests, used_tokens - tokens)
+                self._learn(used_requests, used_tokens)
+                record.update(llm_calls=turn.llm_calls, prompt_tokens=turn.prompt_tokens,
+                              completion_tokens=turn.completion_tokens, cost_usd=round(turn.cost_usd, 6))
+            return record
+        return {"id": item["id"], "question": question, "error": error}
+
+    async def run(self, questions: list, output_path: str, resume: bool = True,
+                  on_result: Optional[Callable[[dict], None]] = None) -> dict:
+        """
+        Answer every question, appending one output line as each finishes, so an interrupted run can be
+        resumed with the same output file.
+
+        :param questions: Items from read_questions.
+        :param output_path: JSONL output file.
+        :param resume: Skip questions already answered in output_path; otherwise start a new file.
+        :param on_result: Called with each output record.
+        :return: Summary counts and totals.
+        """
+        done = completed_ids(output_path) if resume else set()
+        pending = [q for q in questions if q["id"] not in done]
+        summary = {"questions": len(questions), "skipped": len(questions) - len(pending), "answered": 0,
+                   "failed": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        start = time.perf_counter()
+
+        with open(output_path, "a" if resume else "w") as out:
+            async def worker(item):
+                async with semaphore:
+                    record = await self.run_one(item)
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                if "error" in record:
+                    summary["failed"] += 1
+                else:
+                    summary["answered"] += 1
+                    summary["prompt_tokens"] += record.get("prompt_tokens", 0)
+                    summary["completion_tokens"] += record.get("completion_tokens", 0)
+                    summary["cost_usd"] += record.get("cost_usd", 0.0)
+                if on_result is not None:
+                    on_result(record)
+
+            await asyncio.gather(*(worker(item) for item in pending))
+
+        seconds = time.perf_counter() - start
+        summary["cost_usd"] = round(summary["cost_usd"], 6)
+        summary["seconds"] = round(seconds, 2)
+        summary["questions_per_second"] = round(len(pending) / seconds, 2) if seconds else 0.0
+        if self.limiter is not None:
+            summary["rate_limit"] = self.limiter.stats()
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of questions through the agent graph")
+    parser.add_argument("input", help="JSONL file with one {\"id\", \"question\"} per line")
+    parser.add_argument("-o", "--output", help="JSONL output file (default: <input>.answers.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=8, help="questions in flight at once")
+    parser.add_argument("--rpm", type=float, help="API requests per minute allowed")
+    parser.add_argument("--tpm", type=float, help="API tokens per minute allowed")
+    parser.add_argument("--retries", type=int, default=2, help="extra attempts for a failing question")
+    parser.add_argument("--restart", action="store_true", help="ignore earlier output instead of resuming")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.input)[0] + ".answers.jsonl"
+    questions = read_questions(args.input)
+
+    from src.runtime import get_agent
+    # Batch questions are independent turns, so they are not stored as conversations, and the tickets
+    # they ask for are kept in memory rather than filed
+    agent = get_agent(replace(load_config(), checkpoint_db_path=None, ticket_db_path=None, ticket_endpoint_url=None))
+    limiter = RateLimiter(args.rpm, args.tpm) if args.rpm or args.tpm else None
+    runner = BatchRunner(agent, limiter=limiter, concurrency=args.concurrency, retries=args.retries)
+
+    progress = {"n": 0}
+
+    def report(record):
+        progress["n"] += 1
+        if progress["n"] % 50 == 0:
+            print(f"batch_runner: {progress['n']} questions finished")
+
+    summary = asyncio.run(runner.run(questions, output, resume=not args.restart, on_result=report))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# src/checkpoint.py
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from src.defaults import DEFAULT_CHECKPOINT_PATH, DEFAULT_CHECKPOINT_RETENTION_DAYS as DEFAULT_RETENTION_DAYS
+
+
+class DurableSqliteSaver(SqliteSaver):
+    """
+    LangGraph checkpointer backed by a SQLite file in WAL mode, keyed on the conversation's thread_id.
+
+    Conversation state survives process restarts and can be shared by several worker processes pointing
+    at the same file, so clients only send the new message each turn. It also serves the async graph
+    (the stock SqliteSaver is sync-only) by running the same queries in a worker thread.
+
+    To keep the file small, every `maintenance_every` checkpoints it:
+    - compacts each thread down to its latest `keep_last` checkpoints (the graph's state channels are
+      stored whole in every checkpoint, so older ones are only needed for time travel), and
+    - deletes threads that have been idle for longer than the retention period.
+    """
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_PATH, keep_last: int = 1,
+                 retention_days: Optional[float] = DEFAULT_RETENTION_DAYS, maintenance_every: int = 200):
+        """
+        :param path: SQLite database file (":memory:" for a throwaway store).
+        :param keep_last: Checkpoints kept per thread by compaction.
+        :param retention_days: Threads idle for longer than this are deleted. None keeps them forever.
+        :param maintenance_every: Run compaction and retention after this many checkpoints are written.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # Set before the tables exist, so freed pages can be returned to the OS without a full VACUUM
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        super().__init__(conn)
+        self.path = path
+        self.keep_last = max(1, keep_last)
+        self.retention_seconds = retention_days * 86400 if retention_days is not None else None
+        self.maintenance_every = max(1, maintenance_every)
+        self._puts = 0
+        self._puts_lock = threading.Lock()
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.execute("CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, updated_at REAL)")
+        self.conn.commit()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        with self.cursor() as cur:
+            cur.execute("INSERT OR REPLACE INTO thread_activity (thread_id, updated_at) VALUES (?, ?)",
+                        (str(config["configurable"]["thread_id"]), time.time()))
+        with self._puts_lock:
+            self._puts += 1
+            due = self._puts % self.maintenance_every == 0
+        if due:
+            self.maintain()
+        return result
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+    # Async versions, run in a worker thread
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit))):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # Maintenance
+
+    def compact(self, keep_last: Optional[int] = None) -> int:
+        """
+        Delete all but the latest `keep_last` checkpoints of every thread, and their pending writes.
+
+        :return: Number of checkpoints deleted.
+        """
+        keep_last = keep_last or self.keep_last
+        with self.cursor() as cur:
+            cur.execute("""
+                DELETE FROM checkpoints WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, ROW_NUMBER() OVER (PARTITION BY thread_id, checkpoint_ns
+                                                         ORDER BY checkpoint_id DESC) AS position
+                        FROM checkpoints)
+                    WHERE position > ?)""", (keep_last,))
+            deleted = cur.rowcount
+            cur.execute("""
+                DELETE FROM writes WHERE NOT EXISTS (
+                    SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id
+                    AND c.checkpoint_ns = writes.checkpoint_ns AND c.checkpoint_id = writes.checkpoint_id)""")
+        return deleted
+
+    def expire(self, retention_seconds: Optional[float] = None) -> int:
+        """
+        Delete every thread idle for longer than the retention period.
+
+        :return: Number of threads deleted.
+        """
+        retention_seconds = retention_seconds if retention_seconds is not None else self.retention_seconds
+        if retention_seconds is None:
+            return 0
+        with self.cursor() as cur:
+            cur.execute("SELECT thread_id FROM thread_activity WHERE updated_at < ?", (time.time() - retention_seconds,))
+            expired = [row[0] for row in cur.fetchall()]
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+        return len(expired)
+
+    def maintain(self) -> dict:
+        """
+        Compact, expire old threads and give freed space back to the file system.
+        """
+        start = time.perf_counter()
+        compacted = self.compact()
+        expired = self.expire()
+        with self.cursor() as cur:
+            cur.execute("PRAGMA incremental_vacuum")
+            cur.fetchall()
+        with self.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        result = {"checkpoints_compacted": compacted, "threads_expired": expired,
+                  "seconds": round(time.perf_counter() - start, 4)}
+        print(f"checkpoint maintenance: {result}")
+        return result
+
+    def stats(self) -> dict:
+        with self.cursor(transaction=False) as cur:
+            threads = cur.execute("SELECT COUNT(*) FROM thread_activity").fetchone()[0]
+            checkpoints = cur.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+            writes = cur.execute("SELECT COUNT(*) FROM writes").fetchone()[0]
+            page_count = cur.execute("PRAGMA page_count").fetchone()[0]
+            page_size = cur.execute("PRAGMA page_size").fetchone()[0]
+        return {"threads": threads, "checkpoints": checkpoints, "writes": writes, "bytes": page_count * page_size}
+
+
+_default_savers = {}
+_default_lock = threading.Lock()
+
+
+def get_default_checkpointer(path: str = DEFAULT_CHECKPOINT_PATH, **kwargs) -> DurableSqliteSaver:
+    """
+    Process-wide checkpointer for a database file, shared by every agent using that file.
+    """
+    with _default_lock:
+        if path not in _default_savers:
+            _default_savers[path] = DurableSqliteSaver(path, **kwargs)
+        return _default_savers[path]
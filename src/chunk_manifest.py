@@ -0,0 +1,87 @@
+# src/chunk_manifest.py
+
+import os
+import sqlite3
+import threading
+from typing import Iterable, List
+
+# Chunk hashes of every ingested document; "off" keeps the manifest in memory for the process only
+DEFAULT_CHUNK_MANIFEST_PATH = os.environ.get("CHUNK_MANIFEST_PATH", ".cache/document_chunks.sqlite")
+
+
+class ChunkManifest:
+    """
+    The chunk hashes (vector IDs) each ingested document was stored under.
+
+    When a document is ingested again, the chunks its previous version had and the new one does not are
+    superseded. Vector IDs are chunk hashes, so a chunk shared with another document keeps its vector
+    until no document uses it.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        """
+        :param path: SQLite database file, or ":memory:" for a manifest that lives as long as the process.
+        """
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunks (docname TEXT NOT NULL, hash TEXT NOT NULL, "
+                           "PRIMARY KEY (docname, hash))")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_hash ON chunks (hash)")
+
+    def chunks(self, docname: str) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT hash FROM chunks WHERE docname = ? ORDER BY hash",
+                                                         (docname,))]
+
+    def _unused(self, hashes: Iterable[str]) -> List[str]:
+        return sorted(h for h in hashes
+                      if self._conn.execute("SELECT 1 FROM chunks WHERE hash = ? LIMIT 1", (h,)).fetchone() is None)
+
+    def replace(self, docname: str, hashes: Iterable[str]) -> List[str]:
+        """
+        Record a document's new chunks.
+
+        :return: The hashes of its previous chunks that no document uses any more, to delete from the indexes.
+        """
+        hashes = set(hashes)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = {row[0] for row in self._conn.execute("SELECT hash FROM chunks WHERE docname = ?", (docname,))}
+                self._conn.execute("DELETE FROM chunks WHERE docname = ?", (docname,))
+                self._conn.executemany("INSERT INTO chunks (docname, hash) VALUES (?, ?)",
+                                       ((docname, h) for h in hashes))
+                superseded = self._unused(old - hashes)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return superseded
+
+    def forget(self, docname: str) -> List[str]:
+        """
+        Drop a removed document.
+
+        :return: The hashes of its chunks that no other document uses.
+        """
+        return self.replace(docname, ())
+
+
+_default_manifest = None
+_default_manifest_lock = threading.Lock()
+
+
+def get_default_chunk_manifest() -> ChunkManifest:
+    """
+    Return the process-wide ChunkManifest at CHUNK_MANIFEST_PATH, kept in memory if it is "off".
+    """
+    global _default_manifest
+    with _default_manifest_lock:
+        if _default_manifest is None:
+            path = DEFAULT_CHUNK_MANIFEST_PATH
+            _default_manifest = ChunkManifest(":memory:" if path.lower() == "off" else path)
+        return _default_manifest
@@ -1,76 +1,134 @@
 # src/clarify_agent.py
 
-from langchain_core.messages import SystemMessage, HumanMessage  # Import necessary message classes
+import asyncio
+import re
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+from src.create_llm_message import create_llm_message
+from src.streaming import emit_text
+
+CLARIFY_PROMPT = """
+You are a sales compensation assistant. The user's latest request is unclear, ambiguous, or does not
+obviously fit one of the topics you can help with:
+- policy: sales compensation policies and plan rules
+- commission: calculating a commission for a deal
+- contest: sales contests and their rules
+- ticket: opening a support ticket with sales operations
+
+Using the whole conversation, answer in one go:
+- category: your best guess of the topic (policy, commission, contest or ticket).
+- clarifying_question: one short, friendly yes/no question that names that guess (for example "Are you
+  asking how the commission on this deal is calculated?"). If the user answers yes, their request is
+  handled as that topic.
+- suggest_ticket: true if the request looks like something sales operations must handle by hand
+  (an error in a payout, a data correction, access problems) rather than a question you can answer.
+- ticket_summary: when suggest_ticket is true, a one-sentence summary of the issue for the ticket.
+"""
+
+# Replies that confirm the clarifying question's guess, so the next turn goes straight to that route
+AFFIRMATIVE_WORDS = {"yes", "yeah", "yep", "yup", "y", "correct", "right", "exactly", "sure", "ok", "okay"}
+MAX_CONFIRMATION_WORDS = 4
+
+
+class ClarifyResponse(BaseModel):
+    """
+    Everything the clarify path needs, produced by a single structured-output call.
+    """
+    category: Literal["policy", "commission", "contest", "ticket"] = Field(
+        description="Best guess of the route the request belongs to")
+    clarifying_question: str = Field(description="One short question asking the user to clarify their request")
+    suggest_ticket: bool = Field(False, description="Whether to offer opening a support ticket")
+    ticket_summary: str = Field("", description="One-sentence summary of the issue, for the ticket")
+
 
 class ClarifyAgent:
-    
-    def __init__(self, model, sales_comp_agent):
+
+    def __init__(self, model, history_manager=None):
         """
-        Initialize the ClarifyAgent with a ChatOpenAI model and a reference to the main salesCompAgent.
-        
+        Initialize the ClarifyAgent with a ChatOpenAI model.
+
         :param model: An instance of the ChatOpenAI model used for generating responses.
-        :param sales_comp_agent: A reference to the main salesCompAgent for reclassification and ticket creation.
+        :param history_manager: Optional HistoryManager that keeps the conversation within a token budget.
         """
         self.model = model
-        self.sales_comp_agent = sales_comp_agent
+        self.history_manager = history_manager
 
-    def clarify_and_classify(self, user_query: str) -> dict:
+    def clarify_messages(self, session_history) -> list:
         """
-        Ask the user to clarify their query and attempt to classify it again.
-        
-        :param user_query: The original query from the user.
-        :return: A dictionary representing the next state based on the user's input.
+        Build the messages asking the model for a clarifying question and a ticket suggestion.
         """
-        # Ask the user to clarify their query
-        clarification_prompt = f"""
-        I'm not sure I fully understood your request. Could you please clarify what you need help with?
+        return create_llm_message(CLARIFY_PROMPT, session_history, self.history_manager)
+
+    def clarify(self, session_history) -> ClarifyResponse:
         """
+        Ask the model for the clarifying question and ticket suggestion in one round trip.
 
-        # Generate a clarification response using the ChatOpenAI model
-        llm_response = self.model.invoke([
-            SystemMessage(content=clarification_prompt),
-            HumanMessage(content=user_query)
-        ])
-
-        # Extract the clarified response from the user
-        clarified_query = llm_response.content
-
-        # Attempt to classify the clarified query using the main salesCompAgent's classifier
-        classified_state = self.sales_comp_agent.initial_classifier({"initialMessage": clarified_query})
-
-        # If classification is successful, return the new state
-        if classified_state["category"] != "clarify":
-            return classified_state
-        
-        # If classification still fails, ask the user if they'd like to create a ticket
-        ticket_prompt = f"""
-        I'm still having trouble understanding your request. Would you like to create a support ticket instead?
-        Please respond with 'yes' or 'no'.
+        :param session_history: The conversation so far, ending with the unclear request.
         """
+        return self.model.with_structured_output(ClarifyResponse).invoke(self.clarify_messages(session_history))
+
+    async def aclarify(self, session_history) -> ClarifyResponse:
+        # Async version of clarify. Building the messages may summarize history, so it runs in a thread.
+        abc = await asyncio.to_thread(self.clarify_messages, session_history)
+        return await self.model.with_structured_output(ClarifyResponse).ainvoke(abc)
 
-        # Generate the ticket response using the ChatOpenAI model
-        llm_ticket_response = self.model.invoke([
-            SystemMessage(content=ticket_prompt),
-            HumanMessage(content=clarified_query)
-        ])
-
-        # If the user agrees, route to the ticket agent
-        if "yes" in llm_ticket_response.content.lower():
-            return self.sales_comp_agent.ticket_agent({"initialMessage": clarified_query})
-        
-        # If the user does not agree, end the conversation
+    def format_response(self, clarification: ClarifyResponse, request: str = "") -> dict:
+        """
+        Turn the model's structured answer into the clarify node's state update.
+
+        The guessed category and the unclear request are kept in the state, so a "yes" on the next turn
+        is routed to that category with the original request (see confirmed_route).
+        """
+        print(f"clarify: best guess {clarification.category}, suggest ticket {clarification.suggest_ticket}")
+        response = clarification.clarifying_question.strip()
+        if clarification.suggest_ticket:
+            summary = clarification.ticket_summary.strip().rstrip(".")
+            response += ("\n\nIf you'd rather have sales operations look into it, reply \"open a ticket\""
+                         + (f" and I'll file: {summary}" if summary else "") + ".")
         return {
-            "lnode": "clarify_agent", 
-            "responseToUser": "Okay, feel free to reach out if you need further assistance.",
-            "category": "clarify"
+            "lnode": "clarify_agent",
+            "responseToUser": response,
+            "category": "clarify",
+            "clarifyGuess": clarification.category,
+            "clarifyRequest": request
         }
 
+    @staticmethod
+    def confirmed_route(state: dict):
+        """
+        The category guessed by the previous clarify turn if the new message confirms it, else None.
+        Only conversations whose state is kept between turns (a checkpointer) have a guess.
+        """
+        guess = state.get("clarifyGuess")
+        if not guess:
+            return None
+        words = re.findall(r"[a-z']+", state["initialMessage"].lower())
+        if words and words[0] in AFFIRMATIVE_WORDS and len(words) <= MAX_CONFIRMATION_WORDS:
+            return guess
+        return None
+
     def clarify_agent(self, state: dict) -> dict:
         """
-        Handle queries that require clarification and attempt to classify them again.
-        
-        :param state: A dictionary containing the state of the current conversation, including the user's initial message.
-        :return: A dictionary with the updated state based on the user's clarified response.
+        Handle queries that require clarification with a single structured-output call.
+
+        :param state: A dictionary containing the state of the current conversation, including the session history.
+        :return: A dictionary with the updated state, including the clarifying question.
+        """
+        result = self.format_response(self.clarify(self.session_history(state)), state['initialMessage'])
+        emit_text("clarify", result["responseToUser"])
+        return result
+
+    async def aclarify_agent(self, state: dict) -> dict:
         """
-        # Handle clarification and reclassification
-        return self.clarify_and_classify(state['initialMessage'])
+        Async version of clarify_agent.
+        """
+        result = self.format_response(await self.aclarify(self.session_history(state)), state['initialMessage'])
+        emit_text("clarify", result["responseToUser"])
+        return result
+
+    @staticmethod
+    def session_history(state: dict) -> list:
+        # The conversation, or just the request when the node is called without one
+        return state.get('sessionHistory') or [{"role": "user", "content": state['initialMessage']}]
@@ -0,0 +1,63 @@
+# src/client.py
+
+import json
+import urllib.parse
+import urllib.request
+
+
+class RemoteAgent:
+    """
+    Client for the headless API server (src/server.py) with the same turn interface as salesCompAgent
+    (turn_input, stream_tokens, conversation), so a front end can talk to a shared agent process
+    instead of building the graph itself.
+    """
+
+    def __init__(self, base_url: str, timeout_seconds: float = 120.0, api_token: str = None):
+        """
+        :param base_url: Server address, e.g. http://127.0.0.1:8080
+        :param timeout_seconds: Socket timeout for each request.
+        :param api_token: The server's AGENT_SERVER_TOKEN, sent as a bearer token.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout_seconds = timeout_seconds
+        self.api_token = api_token
+
+    def _open(self, path: str, body: dict = None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"}
+        if self.api_token:
+            headers["Authorization"] = f"Bearer {self.api_token}"
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers)
+        return urllib.request.urlopen(request, timeout=self.timeout_seconds)
+
+    def turn_input(self, message: str, history: list) -> dict:
+        # The server keeps the conversation, so only the new message is sent
+        return {'initialMessage': message}
+
+    def stream_tokens(self, inputs: dict, config: dict = None):
+        """
+        Run one turn on the server, yielding ("token", text) as text arrives and finally
+        ("final", {"responseToUser", "category"}) like salesCompAgent.stream_tokens. Raises RuntimeError
+        if the turn failed on the server.
+        """
+        body = {"message": inputs['initialMessage'], "stream": True}
+        if config:
+            body["thread_id"] = config["configurable"]["thread_id"]
+            if config["configurable"].get("user_id"):
+                body["user_id"] = config["configurable"]["user_id"]
+        with self._open("/chat", body) as response:
+            for line in response:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if "error" in item:
+                    raise RuntimeError(f"agent server: {item['error']} (thread {item.get('thread_id')})")
+                if "token" in item:
+                    yield "token", item["token"]
+                else:
+                    yield "final", {"responseToUser": item.get("response"), "category": item.get("category")}
+
+    def conversation(self, config: dict) -> list:
+        thread_id = urllib.parse.quote(config['configurable']['thread_id'], safe="")
+        with self._open(f"/threads/{thread_id}") as response:
+            return json.loads(response.read())["messages"]
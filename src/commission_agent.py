@@ -1,81 +1,167 @@
 # src/commission_agent.py
 
-import streamlit as st
+import asyncio
 
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from src.commission_calc import (CommissionInputs, calculate_commission, format_commission_response,
+                                 format_missing_inputs_response)
 from src.create_llm_message import create_llm_message
+from src.streaming import astream_chat_model, emit_text, stream_chat_model
 
 class CommissionAgent:
-    
-    def __init__(self, model, index):
+
+    def __init__(self, model, index, use_llm_phrasing: bool = False, history_manager=None):
         """
         Initialize the CommissionAgent with a ChatOpenAI model and a Pinecone index.
-        
+
         :param model: An instance of the ChatOpenAI model used for generating responses.
         :param index: An instance of the Pinecone index, if needed for retrieval (though not used in the basic commission agent).
+        :param use_llm_phrasing: If True, the LLM phrases the computed answer; otherwise a template is used.
+        :param history_manager: Optional HistoryManager that keeps the conversation within a token budget.
         """
         self.model = model
         self.index = index
+        self.use_llm_phrasing = use_llm_phrasing
+        self.history_manager = history_manager
 
-    def generate_commission_response(self, user_query: str, session_history) -> str:
+    def extraction_messages(self, session_history) -> list:
         """
-        Generate a response for commission-related queries using the ChatOpenAI model.
-        
-        :param user_query: The original query from the user.
-        :return: A string response generated by the language model.
+        Build the messages asking the model to extract deal value, OTI and quota from the conversation.
+        """
+        extraction_prompt = f"""
+        You are a Sales Commissions expert. Extract the following figures from the conversation, in dollars,
+        as plain numbers (for example "$1.2M" is 1200000):
+        - deal_value: the value of the deal the user is asking about
+        - oti: the user's annual on-target incentive (OTI)
+        - quota: the user's annual quota
+
+        Leave a figure empty if the user has not provided it. Do not guess.
+        Set general_question if the user asks about commissions in general (for example how rates or
+        accelerators work) rather than for the commission on a deal of their own.
         """
-        commission_prompt = f"""
-        You are a Sales Commissions expert. Users will ask you about what their commission
-        will be for a particular deal. You will use the following method to calculate commission:
-        
-        Step 1: Check if the user has provided you the Deal value in dollars, on-target incentive (OTI),
-        and annual quota in dollars.
+        return create_llm_message(extraction_prompt, session_history, self.history_manager)
 
-        Step 2: If the user did not provide complete information ask them to provide it.
+    def extract_commission_inputs(self, session_history) -> CommissionInputs:
+        """
+        Extract deal value, OTI and quota from the conversation with a single structured-output call.
 
-        Step 3: Calculate Base Commission Rate (BCR). BCR is equal to on-target
-        incentive divided by annual quota. 
-        
-        Step 4: Compute the commission by multiplying BCR by deal value. 
+        :param session_history: The conversation so far.
+        :return: A CommissionInputs with any values the user has not provided left as None.
+        """
+        return self.model.with_structured_output(CommissionInputs).invoke(self.extraction_messages(session_history))
 
-        Step 5: Please provide the user with their expected commission in a properly formatted sentence 
-        and explain how it was calculated.
-        
-        Please provide the response without using any LaTeX. 
-        Format any calculations or equations in simple plain text or markdown. 
-        Do not use LaTeX for formatting.
+    async def aextract_commission_inputs(self, session_history) -> CommissionInputs:
+        # Async version of extract_commission_inputs. Building the messages may summarize history, so it runs in a thread.
+        abc = await asyncio.to_thread(self.extraction_messages, session_history)
+        return await self.model.with_structured_output(CommissionInputs).ainvoke(abc)
+
+    def computed_response(self, inputs: CommissionInputs):
+        """
+        Compute the commission in Python.
 
+        :return: (text, needs_phrasing). When needs_phrasing is False the text is the final answer and has
+                 already been emitted; otherwise it is the calculation the LLM should phrase.
+        """
+        missing = inputs.missing()
+        if missing:
+            response = format_missing_inputs_response(missing)
+        elif inputs.quota <= 0:
+            response = "Your annual quota must be greater than zero to calculate a commission."
+        else:
+            result = calculate_commission(inputs.deal_value, inputs.oti, inputs.quota)
+            response = format_commission_response(result)
+            if self.use_llm_phrasing:
+                return response, True
+        emit_text("commission", response)
+        return response, False
+
+    def question_messages(self, session_history) -> list:
+        """
+        Build the messages for a commission question that is not a calculation, answered by the model.
+        """
+        question_prompt = f"""
+        You are a Sales Commissions expert. Answer the user's question about sales commissions.
+        A commission is the base commission rate (BCR), which is on-target incentive (OTI) divided by annual
+        quota, multiplied by the deal value. If the answer depends on the user's own figures, ask them for
+        their deal value, OTI and annual quota.
+        Please provide the response without using any LaTeX.
         If the output includes the dollar sign, please escape it to prevent markdown rendering issues.
         """
+        return create_llm_message(question_prompt, session_history, self.history_manager)
+
+    def phrasing_messages(self, calculation: str, user_query: str) -> list:
+        phrasing_prompt = f"""
+        You are a Sales Commissions expert. The user's commission has already been calculated as follows:
+        {calculation}
 
-        abc = create_llm_message(commission_prompt,session_history)
-        msgs=st.session_state.messages
-        print(f"COMMISION_AGENT  msgs is {msgs}")
-        llm_response = self.model.invoke(abc)
-        
-        # Generate a response using the ChatOpenAI model
-        #llm_response = self.model.invoke([  # Use `invoke` for structured output if needed
-        ##    SystemMessage(content="You are an expert in sales compensation and commissions."),
-        #    HumanMessage(content=commission_prompt)
-        #])
-        
-        # Extract and return the full response from the language model's output
-        full_response = llm_response.content
+        Answer the user's question using exactly these numbers. Do not recalculate anything.
+        Please provide the response without using any LaTeX.
+        If the output includes the dollar sign, please escape it to prevent markdown rendering issues.
+        """
+        return [
+            SystemMessage(content=phrasing_prompt),
+            HumanMessage(content=user_query)
+        ]
+
+    def generate_commission_response(self, user_query: str, session_history) -> str:
+        """
+        Generate a response for commission-related queries.
+
+        The figures are extracted by the model once, the commission is computed in Python, and the
+        answer is phrased with a template (or by the model if use_llm_phrasing is set). A general question
+        without the figures, such as "How do accelerators work?", is answered by the model instead.
+
+        :param user_query: The original query from the user.
+        :return: A string response.
+        """
+        inputs = self.extract_commission_inputs(session_history)
+        if inputs.general_question and inputs.missing():
+            return stream_chat_model(self.model, self.question_messages(session_history), "commission")
+
+        response, needs_phrasing = self.computed_response(inputs)
+        if not needs_phrasing:
+            return response
+
+        # Stream the phrased answer to the chat UI as it is generated
+        full_response = stream_chat_model(self.model, self.phrasing_messages(response, user_query), "commission")
         return full_response
 
+    async def agenerate_commission_response(self, user_query: str, session_history) -> str:
+        # Async version of generate_commission_response
+        inputs = await self.aextract_commission_inputs(session_history)
+        if inputs.general_question and inputs.missing():
+            abc = await asyncio.to_thread(self.question_messages, session_history)
+            return await astream_chat_model(self.model, abc, "commission")
+
+        response, needs_phrasing = self.computed_response(inputs)
+        if not needs_phrasing:
+            return response
+        return await astream_chat_model(self.model, self.phrasing_messages(response, user_query), "commission")
+
     def commission_agent(self, state: dict) -> dict:
         """
         Handle commission-related queries by generating a response using the ChatOpenAI model.
-        
+
         :param state: A dictionary containing the state of the current conversation, including the user's initial message.
         :return: A dictionary with the updated state, including the response and the node category.
         """
         # Generate a response based on the user's initial message
         full_response = self.generate_commission_response(state['initialMessage'],state['sessionHistory'])
-        
+
         # Return the updated state with the generated response and the category set to 'commission'
         return {
-            "lnode": "commission_agent", 
+            "lnode": "commission_agent",
+            "responseToUser": full_response,
+            "category": "commission"
+        }
+
+    async def acommission_agent(self, state: dict) -> dict:
+        """
+        Async version of commission_agent.
+        """
+        full_response = await self.agenerate_commission_response(state['initialMessage'], state['sessionHistory'])
+        return {
+            "lnode": "commission_agent",
             "responseToUser": full_response,
             "category": "commission"
         }
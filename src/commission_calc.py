@@ -0,0 +1,116 @@
+# src/commission_calc.py
+
+import argparse
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional
+
+from pydantic import BaseModel, Field
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class CommissionInputs(BaseModel):
+    """
+    The figures needed to compute a commission, as extracted from the conversation.
+    """
+    deal_value: Optional[float] = Field(None, description="Deal value in dollars")
+    oti: Optional[float] = Field(None, description="Annual on-target incentive (OTI) in dollars")
+    quota: Optional[float] = Field(None, description="Annual quota in dollars")
+    general_question: bool = Field(False, description="True if the user asks a general question about "
+                                                      "commissions rather than for their commission on a deal")
+
+    def missing(self) -> List[str]:
+        labels = {"deal_value": "deal value", "oti": "on-target incentive (OTI)", "quota": "annual quota"}
+        return [label for name, label in labels.items() if getattr(self, name) is None]
+
+
+@dataclass
+class CommissionResult:
+    deal_value: float
+    oti: float
+    quota: float
+    bcr: float
+    commission: float
+
+
+def calculate_commission(deal_value: float, oti: float, quota: float) -> CommissionResult:
+    """
+    Compute a single commission. BCR (base commission rate) = OTI / quota; commission = BCR * deal value.
+
+    :raises ValueError: If quota is not positive.
+    """
+    if quota <= 0:
+        raise ValueError("Annual quota must be greater than zero")
+    bcr = oti / quota
+    return CommissionResult(deal_value=deal_value, oti=oti, quota=quota, bcr=bcr, commission=bcr * deal_value)
+
+
+def calculate_commissions(deals: "pd.DataFrame", deal_value_column: str = "deal_value", oti_column: str = "oti",
+                          quota_column: str = "quota") -> "pd.DataFrame":
+    """
+    Compute commissions for many deals at once.
+
+    :param deals: A DataFrame with one row per deal.
+    :return: A copy of the DataFrame with "bcr" and "commission" columns added. Rows with a
+             missing or non-positive quota get NaN.
+    """
+    # pandas is only needed for batches, so answering a question does not load it
+    import numpy as np
+    import pandas as pd
+
+    result = deals.copy()
+    deal_value = pd.to_numeric(result[deal_value_column], errors="coerce").to_numpy(dtype=np.float64)
+    oti = pd.to_numeric(result[oti_column], errors="coerce").to_numpy(dtype=np.float64)
+    quota = pd.to_numeric(result[quota_column], errors="coerce").to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bcr = np.where(quota > 0, oti / quota, np.nan)
+    result["bcr"] = bcr
+    result["commission"] = bcr * deal_value
+    return result
+
+
+def calculate_commissions_csv(path: str, output_path: Optional[str] = None, **columns) -> "pd.DataFrame":
+    """
+    Read deals from a CSV file, compute their commissions and optionally write the result to another CSV.
+    """
+    import pandas as pd
+    result = calculate_commissions(pd.read_csv(path), **columns)
+    if output_path:
+        result.to_csv(output_path, index=False)
+    return result
+
+
+def format_commission_response(result: CommissionResult) -> str:
+    # Dollar signs are escaped so Streamlit's markdown does not render them as LaTeX
+    return (f"Your expected commission is \\${result.commission:,.2f}.\n\n"
+            f"Here is how it was calculated:\n"
+            f"- Base Commission Rate (BCR) = OTI / annual quota = \\${result.oti:,.2f} / \\${result.quota:,.2f} "
+            f"= {result.bcr:.4f} ({result.bcr:.2%})\n"
+            f"- Commission = BCR x deal value = {result.bcr:.4f} x \\${result.deal_value:,.2f} "
+            f"= \\${result.commission:,.2f}")
+
+
+def format_missing_inputs_response(missing: List[str]) -> str:
+    return ("To calculate your commission I need your deal value, on-target incentive (OTI) and annual quota. "
+            f"Please provide your {', '.join(missing)}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute commissions for a CSV of deals")
+    parser.add_argument("csv", help="input CSV with deal_value, oti and quota columns")
+    parser.add_argument("-o", "--output", help="write the result to this CSV")
+    parser.add_argument("--deal-value-column", default="deal_value")
+    parser.add_argument("--oti-column", default="oti")
+    parser.add_argument("--quota-column", default="quota")
+    args = parser.parse_args()
+
+    result = calculate_commissions_csv(args.csv, args.output, deal_value_column=args.deal_value_column,
+                                       oti_column=args.oti_column, quota_column=args.quota_column)
+    if not args.output:
+        print(result.to_csv(index=False))
+    print(f"{len(result)} deals, total commission {result['commission'].sum():,.2f}")
+
+
+if __name__ == "__main__":
+    main()
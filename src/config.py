@@ -0,0 +1,117 @@
+# src/config.py
+
+import os
+import tomllib
+from dataclasses import asdict, dataclass, fields
+from typing import Mapping, Optional
+
+# Only the dependency-free defaults, so reading the config does not import the agents' libraries
+from src.defaults import (DEFAULT_CHECKPOINT_PATH, DEFAULT_CHECKPOINT_RETENTION_DAYS, DEFAULT_CONTEST_RULES_PATH,
+                          DEFAULT_CONTEXT_TOKEN_BUDGET, DEFAULT_FAST_LOG_PATH, DEFAULT_FAST_SHADOW_RATE,
+                          DEFAULT_FAST_THRESHOLD, DEFAULT_HISTORY_TOKEN_BUDGET, DEFAULT_LEXICAL_CONFIDENCE,
+                          DEFAULT_LEXICAL_PATH, DEFAULT_TICKET_DB_PATH)
+
+DEFAULT_SECRETS_PATH = ".streamlit/secrets.toml"
+
+
+@dataclass(frozen=True)
+class AgentConfig:
+    """
+    Everything the agents need from the environment, passed in explicitly instead of read from st.secrets.
+
+    Field names match the secret names in lower case (OPENAI_API_KEY -> openai_api_key), so the same
+    values work from .streamlit/secrets.toml, st.secrets or environment variables.
+    """
+    openai_api_key: Optional[str] = None
+    pinecone_api_key: Optional[str] = None
+    pinecone_api_env: Optional[str] = None
+    pinecone_index_name: Optional[str] = None
+    vector_backend: str = "pinecone"
+    local_index_path: Optional[str] = None
+    # None always uses the LLM classifier ("off" in the secrets)
+    fast_classifier_threshold: Optional[float] = DEFAULT_FAST_THRESHOLD
+    # Share of fast-routed messages also sent to the LLM, to measure agreement above the threshold
+    fast_classifier_shadow_rate: float = DEFAULT_FAST_SHADOW_RATE
+    # Log of local-vs-LLM comparisons for `python -m src.fast_classifier`; None keeps none ("off" in the secrets)
+    fast_classifier_log_path: Optional[str] = DEFAULT_FAST_LOG_PATH
+    history_token_budget: int = DEFAULT_HISTORY_TOKEN_BUDGET
+    speculative_retrieval: bool = False
+    # None disables conversation storage ("off" in the secrets)
+    checkpoint_db_path: Optional[str] = DEFAULT_CHECKPOINT_PATH
+    checkpoint_retention_days: float = DEFAULT_CHECKPOINT_RETENTION_DAYS
+    # BM25 index for hybrid policy retrieval; None disables it ("off" in the secrets)
+    lexical_index_path: Optional[str] = DEFAULT_LEXICAL_PATH
+    # Lexical confidence needed to skip the embedding call; None always embeds ("off" in the secrets)
+    lexical_confidence: Optional[float] = DEFAULT_LEXICAL_CONFIDENCE
+    # Tokens of retrieved policy text per prompt; None sends the chunks unassembled ("off" in the secrets)
+    context_token_budget: Optional[int] = DEFAULT_CONTEXT_TOKEN_BUDGET
+    # Contest rules file, re-parsed only when it changes (src/contest_rules.py)
+    contest_rules_path: str = DEFAULT_CONTEST_RULES_PATH
+    # Local ticket queue (src/ticket_queue.py); None keeps tickets in memory only ("off" in the secrets)
+    ticket_db_path: Optional[str] = DEFAULT_TICKET_DB_PATH
+    # Ticketing endpoint the queued tickets are sent to; None leaves them in the queue
+    ticket_endpoint_url: Optional[str] = None
+    ticket_endpoint_token: Optional[str] = None
+    # Bearer token the API server requires on /chat and /threads (src/server.py), and the client sends
+    agent_server_token: Optional[str] = None
+    metrics_file: Optional[str] = None
+    metrics_port: Optional[int] = None
+    # Account limits enforced by the shared OpenAI client layer (src/api_clients.py); None is unlimited
+    openai_requests_per_minute: Optional[float] = None
+    openai_tokens_per_minute: Optional[float] = None
+
+    @classmethod
+    def from_mapping(cls, values: Mapping) -> "AgentConfig":
+        """
+        Build a config from secret-style keys (OPENAI_API_KEY, ...) with string or typed values.
+        Unknown keys are ignored and missing ones keep their defaults.
+        """
+        parsed = {}
+        for f in fields(cls):
+            value = values.get(f.name.upper(), values.get(f.name))
+            if value is None or value == "":
+                continue
+            if f.name in ("fast_classifier_threshold", "fast_classifier_log_path", "checkpoint_db_path",
+                          "lexical_index_path", "lexical_confidence", "context_token_budget", "ticket_db_path") \
+                    and str(value).lower() == "off":
+                parsed[f.name] = None
+            elif f.name in ("fast_classifier_threshold", "fast_classifier_shadow_rate", "checkpoint_retention_days",
+                            "lexical_confidence", "openai_requests_per_minute", "openai_tokens_per_minute"):
+                parsed[f.name] = float(value)
+            elif f.name in ("history_token_budget", "context_token_budget", "metrics_port"):
+                parsed[f.name] = int(value)
+            elif f.name == "speculative_retrieval":
+                parsed[f.name] = value if isinstance(value, bool) else str(value).lower() in ("1", "true", "yes", "on")
+            else:
+                parsed[f.name] = str(value)
+        return cls(**parsed)
+
+    @classmethod
+    def from_streamlit(cls) -> "AgentConfig":
+        """
+        Config from st.secrets, for the Streamlit pages.
+        """
+        import streamlit as st
+        return cls.from_mapping(st.secrets.to_dict())
+
+    def as_settings(self) -> dict:
+        """
+        The values that decide how the agent is built, for AgentRuntime's rebuild check.
+        """
+        return {k: v for k, v in asdict(self).items()
+                if k not in ("openai_api_key", "metrics_file", "metrics_port", "ticket_endpoint_token",
+                             "agent_server_token")}
+
+
+def load_config(secrets_path: str = DEFAULT_SECRETS_PATH, environ: Mapping = None) -> AgentConfig:
+    """
+    Config for processes that do not run under Streamlit (the API server, CLIs, workers):
+    .streamlit/secrets.toml if it exists, overridden by environment variables of the same names.
+    """
+    values = {}
+    if secrets_path and os.path.exists(secrets_path):
+        with open(secrets_path, "rb") as f:
+            values.update(tomllib.load(f))
+    environ = os.environ if environ is None else environ
+    values.update({f.name.upper(): environ[f.name.upper()] for f in fields(AgentConfig) if f.name.upper() in environ})
+    return AgentConfig.from_mapping(values)
@@ -1,71 +1,176 @@
 # src/contest_agent.py
 
+import re
+from typing import Optional
+
 from langchain_core.messages import SystemMessage, HumanMessage
+from src.contest_rules import (ContestRuleBook, ContestRules, check_payout, format_check_response,
+                               format_percent, format_rules_response, get_default_rule_book)
+from src.streaming import astream_chat_model, emit_text, stream_chat_model
+
+_AMOUNT = re.compile(r"(?<![\w.-])\$?\s?(\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)\s*(k|m|thousand|million)?\b(?!\s*%)",
+                     re.IGNORECASE)
+_OTI = re.compile(r"\bOTI\b|on[- ]target", re.IGNORECASE)
+_PERCENT_OF_OTI = re.compile(r"(\d+(?:\.\d+)?)\s*%\s*of\s+(?:the\s+|their\s+|his\s+|her\s+|my\s+)?(?:OTI|on[- ]target)",
+                             re.IGNORECASE)
+_DEAL = re.compile(r"\bdeal\s+(?:id\s+)?#?([A-Z]+-?\d+|\d{3,})\b", re.IGNORECASE)
+_PAYOUT_WORDS = re.compile(r"\b(pay|paid|payout|payouts|award|bonus|cap|capped|allowed|limit)\b", re.IGNORECASE)
+# Questions the rules alone cannot answer, which get a model-written explanation
+_EXPLANATION = re.compile(r"\b(why|explain|what if|what happens|difference|example|mean|means)\b", re.IGNORECASE)
+_MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "m": 1e6, "million": 1e6}
+
+
+def parse_payout_question(text: str) -> Optional[dict]:
+    """
+    Find a proposed contest payout in a question: a dollar amount (or a percent of OTI), the OTI if
+    given, and the deal. The amount closest to a mention of "OTI" is the OTI; the other one is the payout.
+
+    :return: {"payout", "oti", "fraction_of_oti", "deal_id"} or None if the question proposes no payout.
+    """
+    if not _PAYOUT_WORDS.search(text):
+        return None
+    amounts = []
+    for match in _AMOUNT.finditer(text):
+        number, suffix = match.groups()
+        value = float(number.replace(",", "")) * _MULTIPLIERS.get((suffix or "").lower(), 1)
+        # A bare small number is a count or a quarter, not money
+        if "$" not in match.group(0) and not suffix and value < 1000:
+            continue
+        amounts.append((match.start(), match.end(), value))
+    # Characters between each amount and the nearest "OTI"
+    mentions = [(m.start(), m.end()) for m in _OTI.finditer(text)]
+    gaps = [min((max(m_start - end, start - m_end, 0) for m_start, m_end in mentions), default=None)
+            for start, end, _ in amounts]
+    oti_at = None
+    if any(gap is not None and gap <= 25 for gap in gaps):
+        oti_at = min((gap, i) for i, gap in enumerate(gaps) if gap is not None)[1]
+    oti = amounts[oti_at][2] if oti_at is not None else None
+    payout = next((value for i, (_, _, value) in enumerate(amounts) if i != oti_at), None)
+    fraction = None
+    if match := _PERCENT_OF_OTI.search(text):
+        fraction = float(match.group(1)) / 100
+    if payout is None and fraction is None:
+        return None
+    deal = _DEAL.search(text)
+    return {"payout": payout, "oti": oti, "fraction_of_oti": fraction, "deal_id": deal.group(1) if deal else None}
+
 
 class ContestAgent:
-    
-    def __init__(self, model):
+
+    def __init__(self, model, rule_book: ContestRuleBook = None):
         """
-        Initialize the ContestAgent with a ChatOpenAI model.
-        
-        :param model: An instance of the ChatOpenAI model used for generating responses.
+        Initialize the ContestAgent with a ChatOpenAI model and the contest rules.
+
+        :param model: An instance of the ChatOpenAI model, used only to explain the rules in free form.
+        :param rule_book: ContestRuleBook (src/contest_rules.py) the rules are read from. Defaults to contestrules.txt.
         """
         self.model = model
+        self.rule_book = rule_book or get_default_rule_book()
 
-    def get_contest_info(self) -> str:
+    def get_contest_info(self) -> ContestRules:
         """
-        Retrieve contest information from an external source, e.g., a file.
-        
-        :return: A string containing the contest rules.
+        The parsed contest rules, re-read only when the rules file changes.
         """
-        with open('contestrules.txt', 'r') as file:
-            contest_rules = file.read()
-        return contest_rules
+        return self.rule_book.rules()
 
-    def generate_contest_response(self, user_query: str) -> str:
+    def deterministic_response(self, user_query: str, rules: ContestRules) -> Optional[str]:
         """
-        Generate a response for contest-related queries using the ChatOpenAI model.
-        
-        :param user_query: The original query from the user.
-        :return: A string response generated by the language model.
+        Answer from the parsed rules alone when possible: payout checks are evaluated in code and the form
+        URL is always taken from the rules file.
+
+        :return: The answer, or None if the question needs a free-form explanation.
         """
+        proposal = parse_payout_question(user_query)
+        if proposal is not None and proposal["payout"] is not None:
+            check = check_payout(rules, proposal["payout"], proposal["oti"], deal_id=proposal["deal_id"])
+            return format_check_response(check, rules)
+        if _EXPLANATION.search(user_query):
+            return None
+        if proposal is not None:
+            # "Can I pay 6% of OTI?" is checked as a fraction of any OTI
+            cap = rules.max_payout_fraction_of_oti
+            if cap is None:
+                return "The contest rules set no payout cap."
+            if proposal["fraction_of_oti"] <= cap:
+                return (f"Yes. {format_percent(proposal['fraction_of_oti'])} of OTI is within the cap of "
+                        f"{format_percent(cap)} of OTI.")
+            return f"No. {format_percent(proposal['fraction_of_oti'])} of OTI exceeds the cap of {format_percent(cap)} of OTI."
+        return format_rules_response(rules)
+
+    def contest_messages(self, user_query: str, rules: ContestRules) -> list:
+        """
+        Build the messages asking the model to explain the contest rules.
+        """
+        rule_lines = "\n".join(f"- {rule}" for rule in rules.rules)
         contest_prompt = f"""
-        You are a Sales Commissions expert. Users will ask you about how to start a sales contest.
-        You will send them a URL for a Google form to submit.
-        Please follow the contest rules as defined here: 
-        {self.get_contest_info()}
-        Please provide user instructions to fill out the Google form.      
+        You are a Sales Commissions expert. Users ask about sales contests. Explain the contest rules
+        below in answer to the user's question, briefly and without inventing rules.
+        Contest rules:
+        {rule_lines}
+        Please provide the response without using any LaTeX.
+        If the output includes the dollar sign, please escape it to prevent markdown rendering issues.
         """
-        
-        # Generate a response using the ChatOpenAI model's invoke method
-        llm_response = self.model.invoke([
+        return [
             SystemMessage(content=contest_prompt),
             HumanMessage(content=user_query)
-        ])
-        
-        # The response content should include all necessary information, such as the URL
-        full_response = llm_response.content
-        
-        # If the URL is part of the response content, you can extract it here
-        contest_url = "URL not found"  # Default value if URL not found
-        if "http" in full_response:  # Basic check for a URL in the response
-            contest_url = full_response.split()[0]  # Assuming the URL is the first item in the response
-        
-        return contest_url, full_response
+        ]
+
+    def form_line(self, rules: ContestRules) -> str:
+        return f"\n\nPlease submit the contest form here: {rules.form_url or 'URL not found'}"
+
+    def generate_contest_response(self, user_query: str) -> str:
+        """
+        Answer a contest question: from the rules where possible, otherwise with a model-written explanation
+        streamed to the chat UI. The form URL is never taken from the model.
+
+        :param user_query: The original query from the user.
+        :return: The response.
+        """
+        rules = self.get_contest_info()
+        response = self.deterministic_response(user_query, rules)
+        if response is not None:
+            emit_text("contest", response)
+            return response
+        explanation = stream_chat_model(self.model, self.contest_messages(user_query, rules), "contest")
+        form_line = self.form_line(rules)
+        emit_text("contest", form_line)
+        return explanation + form_line
+
+    async def agenerate_contest_response(self, user_query: str) -> str:
+        # Async version of generate_contest_response
+        rules = self.get_contest_info()
+        response = self.deterministic_response(user_query, rules)
+        if response is not None:
+            emit_text("contest", response)
+            return response
+        explanation = await astream_chat_model(self.model, self.contest_messages(user_query, rules), "contest")
+        form_line = self.form_line(rules)
+        emit_text("contest", form_line)
+        return explanation + form_line
 
     def contest_agent(self, state: dict) -> dict:
         """
-        Handle contest-related queries by generating a response using the ChatOpenAI model.
-        
+        Handle contest-related queries.
+
         :param state: A dictionary containing the state of the current conversation, including the user's initial message.
         :return: A dictionary with the updated state, including the response and the node category.
         """
-        # Generate a response based on the user's initial message
-        contest_url, full_response = self.generate_contest_response(state['initialMessage'])
-        
+        response = self.generate_contest_response(state['initialMessage'])
+
         # Return the updated state with the generated response and the category set to 'contest'
         return {
-            "lnode": "initial_classifier", 
-            "responseToUser": f"Please submit the contest form here: {contest_url}",
+            "lnode": "contest_agent",
+            "responseToUser": response,
+            "category": "contest"
+        }
+
+    async def acontest_agent(self, state: dict) -> dict:
+        """
+        Async version of contest_agent.
+        """
+        response = await self.agenerate_contest_response(state['initialMessage'])
+        return {
+            "lnode": "contest_agent",
+            "responseToUser": response,
             "category": "contest"
         }
@@ -0,0 +1,247 @@
+# src/contest_rules.py
+
+import argparse
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+from src.defaults import DEFAULT_CONTEST_RULES_PATH as DEFAULT_RULES_PATH
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Relative rules paths are resolved against the repository root, so the rules load from any working directory
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_URL = re.compile(r"https?://[^\s)>\]]+")
+_CADENCE = re.compile(r"payouts?\s+(?:will\s+be|is|are)\s+(?:paid\s+)?(weekly|monthly|quarterly|annually|yearly)",
+                      re.IGNORECASE)
+_ONE_PER_DEAL = re.compile(r"only\s+one\s+payout\s+per\s+deal", re.IGNORECASE)
+_CAP = re.compile(r"(\d+(?:\.\d+)?)\s*%\s*of\s+(?:the\s+|their\s+|your\s+)?(?:OTI|on[- ]target incentive)",
+                  re.IGNORECASE)
+_RULE_LINE = re.compile(r"^\s*(?:\d+[.)]|[-*])\s*(.+?)\s*$")
+_PERIODS = {"weekly": r"W\d{1,2}", "monthly": r"(?:M\d{1,2}|\d{4}-\d{2})", "quarterly": r"Q[1-4]",
+            "annually": r"(?:FY)?\d{4}", "yearly": r"(?:FY)?\d{4}"}
+
+
+@dataclass
+class ContestRules:
+    """
+    The contest rules, parsed from the rules file.
+    """
+    payout_cadence: Optional[str] = None
+    one_payout_per_deal: bool = False
+    max_payout_fraction_of_oti: Optional[float] = None
+    form_url: Optional[str] = None
+    rules: List[str] = field(default_factory=list)
+
+    def max_payout(self, oti: float) -> Optional[float]:
+        if self.max_payout_fraction_of_oti is None:
+            return None
+        return self.max_payout_fraction_of_oti * oti
+
+    def period_matches(self, period: Optional[str]) -> bool:
+        # Whether a payout period (e.g. "2024-Q3") fits the cadence; unknown cadences and periods pass
+        pattern = _PERIODS.get(self.payout_cadence or "")
+        if not period or pattern is None:
+            return True
+        return re.search(pattern, str(period), re.IGNORECASE) is not None
+
+
+def format_percent(fraction: float) -> str:
+    # 0.05 -> "5%", 0.075 -> "7.5%": as precise as the rules file, without trailing zeros
+    return f"{fraction * 100:g}%"
+
+
+def resolve_rules_path(path: str) -> str:
+    """
+    The absolute path of a rules file; relative paths are taken from the repository root.
+    """
+    return path if os.path.isabs(path) else os.path.join(REPO_ROOT, path)
+
+
+def parse_contest_rules(text: str) -> ContestRules:
+    """
+    Parse the contest rules text (see contestrules.txt) into a ContestRules.
+    Every numbered or bulleted line is kept in `rules`, whether or not it is understood.
+    """
+    rules = ContestRules()
+    rules.rules = [m.group(1) for m in map(_RULE_LINE.match, text.splitlines()) if m]
+    if match := _CADENCE.search(text):
+        rules.payout_cadence = match.group(1).lower()
+    rules.one_payout_per_deal = _ONE_PER_DEAL.search(text) is not None
+    if match := _CAP.search(text):
+        rules.max_payout_fraction_of_oti = float(match.group(1)) / 100
+    if match := _URL.search(text):
+        rules.form_url = match.group(0).rstrip(".,;")
+    return rules
+
+
+class ContestRuleBook:
+    """
+    The parsed rules of a rules file, re-parsed only when the file's modification time or size changes,
+    so edits take effect without a restart and unchanged files are never read again.
+    """
+
+    def __init__(self, path: str = DEFAULT_RULES_PATH):
+        """
+        :param path: The rules file. A relative path is taken from the repository root.
+        """
+        self.path = resolve_rules_path(path)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._rules = ContestRules()
+        self.loads = 0
+
+    def rules(self) -> ContestRules:
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+        with self._lock:
+            if signature != self._signature:
+                if signature is None:
+                    print(f"ContestRuleBook: {self.path} not found")
+                    self._rules = ContestRules()
+                else:
+                    with open(self.path, "r") as file:
+                        self._rules = parse_contest_rules(file.read())
+                    self.loads += 1
+                self._signature = signature
+            return self._rules
+
+
+_default_rule_books = {}
+_default_lock = threading.Lock()
+
+
+def get_default_rule_book(path: str = DEFAULT_RULES_PATH) -> ContestRuleBook:
+    """
+    Process-wide rule book for a rules file.
+    """
+    path = resolve_rules_path(path)
+    with _default_lock:
+        if path not in _default_rule_books:
+            _default_rule_books[path] = ContestRuleBook(path)
+        return _default_rule_books[path]
+
+
+@dataclass
+class PayoutCheck:
+    payout: float
+    oti: Optional[float]
+    max_payout: Optional[float]
+    violations: List[str]
+
+    @property
+    def allowed(self) -> bool:
+        return not self.violations
+
+
+def check_payout(rules: ContestRules, payout: float, oti: Optional[float] = None, deal_id: Optional[str] = None,
+                 period: Optional[str] = None, paid_deals: Iterable[str] = ()) -> PayoutCheck:
+    """
+    Check one proposed contest payout against the rules.
+
+    :param payout: Proposed payout in dollars.
+    :param oti: The rep's annual on-target incentive in dollars, needed for the cap.
+    :param deal_id: The deal the payout is for, checked against paid_deals.
+    :param period: The payout period (e.g. "2024-Q3"), checked against the cadence.
+    :param paid_deals: Deals that already received a contest payout.
+    """
+    violations = []
+    max_payout = rules.max_payout(oti) if oti is not None else None
+    if max_payout is not None and payout > max_payout:
+        violations.append(f"exceeds the cap of {format_percent(rules.max_payout_fraction_of_oti)} of OTI (\\${max_payout:,.2f})")
+    if rules.one_payout_per_deal and deal_id is not None and deal_id in (
+            paid_deals if isinstance(paid_deals, (set, frozenset)) else set(paid_deals)):
+        violations.append(f"deal {deal_id} already received a contest payout")
+    if not rules.period_matches(period):
+        violations.append(f"period {period} does not match the {rules.payout_cadence} payout cadence")
+    return PayoutCheck(payout, oti, max_payout, violations)
+
+
+def check_payouts(rules: ContestRules, payouts: "pd.DataFrame", payout_column: str = "payout",
+                  oti_column: str = "oti", deal_column: str = "deal_id",
+                  period_column: str = "period") -> "pd.DataFrame":
+    """
+    Check many proposed contest payouts at once. The deal and period columns are optional.
+
+    :return: A copy of the DataFrame with "max_payout", "within_cap", "duplicate_deal", "period_ok" and
+             "allowed" columns added. Within a batch, the first payout for a deal is allowed and later ones are not.
+    """
+    # pandas is only needed for batches, so answering a question does not load it
+    import numpy as np
+    import pandas as pd
+
+    result = payouts.copy()
+    payout = pd.to_numeric(result[payout_column], errors="coerce").to_numpy(dtype=np.float64)
+    oti = pd.to_numeric(result[oti_column], errors="coerce").to_numpy(dtype=np.float64)
+    if rules.max_payout_fraction_of_oti is not None:
+        max_payout = oti * rules.max_payout_fraction_of_oti
+        within_cap = payout <= max_payout
+    else:
+        max_payout = np.full(len(result), np.nan)
+        within_cap = ~np.isnan(payout)
+    result["max_payout"] = max_payout
+    result["within_cap"] = within_cap
+    if rules.one_payout_per_deal and deal_column in result:
+        deals = result[deal_column]
+        result["duplicate_deal"] = deals.notna().to_numpy() & deals.duplicated(keep="first").to_numpy()
+    else:
+        result["duplicate_deal"] = False
+    if period_column in result and rules.payout_cadence in _PERIODS:
+        periods = result[period_column].astype("string")
+        result["period_ok"] = (periods.isna() | periods.str.contains(_PERIODS[rules.payout_cadence], case=False,
+                                                                     regex=True)).fillna(True).to_numpy(dtype=bool)
+    else:
+        result["period_ok"] = True
+    result["allowed"] = result["within_cap"] & ~result["duplicate_deal"] & result["period_ok"]
+    return result
+
+
+def format_rules_response(rules: ContestRules) -> str:
+    # Dollar signs are escaped so Streamlit's markdown does not render them as LaTeX
+    lines = [f"Please submit the contest form here: {rules.form_url or 'URL not found'}"]
+    if rules.rules:
+        lines.append("\nThe contest rules are:")
+        lines.extend(f"- {rule}" for rule in rules.rules if not _URL.search(rule))
+    return "\n".join(lines)
+
+
+def format_check_response(check: PayoutCheck, rules: ContestRules) -> str:
+    if check.max_payout is None:
+        cap = (f"The cap is {format_percent(rules.max_payout_fraction_of_oti)} of the rep's OTI; tell me the OTI and I can check it."
+               if rules.max_payout_fraction_of_oti is not None else "The rules set no payout cap.")
+        status = "I found no rule it breaks." if check.allowed else f"It is not allowed: it {'; it '.join(check.violations)}."
+        return f"A contest payout of \\${check.payout:,.2f}: {status} {cap}"
+    if check.allowed:
+        return (f"Yes. A contest payout of \\${check.payout:,.2f} is within the cap of "
+                f"{format_percent(rules.max_payout_fraction_of_oti)} of OTI (\\${check.max_payout:,.2f} on an OTI of \\${check.oti:,.2f}).")
+    return f"No. A contest payout of \\${check.payout:,.2f} {'; it '.join(check.violations)}."
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a CSV of proposed contest payouts against the contest rules")
+    parser.add_argument("csv", help="input CSV with payout and oti columns, and optionally deal_id and period")
+    parser.add_argument("-o", "--output", help="write the result to this CSV")
+    parser.add_argument("--rules", help="contest rules file (default: CONTEST_RULES_PATH or contestrules.txt "
+                                         "in the repository root)")
+    args = parser.parse_args()
+
+    import pandas as pd
+    # A path given on the command line is relative to the working directory, like the CSV paths
+    rules = ContestRuleBook(os.path.abspath(args.rules) if args.rules else DEFAULT_RULES_PATH).rules()
+    result = check_payouts(rules, pd.read_csv(args.csv))
+    if args.output:
+        result.to_csv(args.output, index=False)
+    else:
+        print(result.to_csv(index=False))
+    print(f"{len(result)} payouts, {int((~result['allowed']).sum())} not allowed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# src/context_assembly.py
+
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from src.defaults import DEFAULT_CONTEXT_TOKEN_BUDGET
+from src.history import count_tokens
+
+# Longest overlap searched for between neighboring chunks; ingestion splits with chunk_overlap=200
+MAX_OVERLAP_CHARS = 400
+# Below this many tokens of remaining budget a passage is dropped rather than cut short
+MIN_PASSAGE_TOKENS = 40
+PASSAGE_SEPARATOR = "\n\n---\n\n"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+|\n+")
+
+
+@dataclass
+class Passage:
+    """
+    A run of adjacent chunks from one document, merged into a single text.
+    """
+    docname: Optional[str]
+    first_index: Optional[int]
+    last_index: Optional[int]
+    text: str
+    score: float
+    chunk_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class AssembledContext:
+    """
+    The context sent to the model and what assembling it saved.
+
+    tokens_before counts the retrieved chunks as they used to be put in the prompt (the list repr);
+    tokens_after counts the assembled text.
+    """
+    text: str
+    passages: List[Passage]
+    chunks_in: int
+    tokens_before: int
+    tokens_after: int
+    truncated: bool = False
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def raw_context(matches: List[dict]) -> str:
+    """
+    The retrieved chunks formatted the way the policy prompt always embedded them.
+    """
+    return str([m["metadata"]["text"] for m in matches])
+
+
+def overlap_length(left: str, right: str, max_chars: int = MAX_OVERLAP_CHARS) -> int:
+    """
+    Length of the longest suffix of left that is also a prefix of right.
+    """
+    for size in range(min(len(left), len(right), max_chars), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _index(match: dict) -> Optional[int]:
+    index = match["metadata"].get("index")
+    return int(index) if isinstance(index, (int, float)) else None
+
+
+def merge_chunks(matches: List[dict]) -> List[Passage]:
+    """
+    Drop duplicate chunks and merge chunks that are neighbors in the same document, removing the text
+    they share. A passage scores as its best chunk.
+
+    :param matches: Retrieved matches ({"id", "score", "metadata"}), best first.
+    :return: Passages, best first.
+    """
+    seen_ids, seen_texts = set(), set()
+    unique = []
+    for match in matches:
+        text = match["metadata"].get("text", "").strip()
+        if not text or match["id"] in seen_ids or text in seen_texts:
+            continue
+        seen_ids.add(match["id"])
+        seen_texts.add(text)
+        unique.append(match)
+
+    passages = []
+    by_document = {}
+    for match in unique:
+        by_document.setdefault(match["metadata"].get("docname"), []).append(match)
+    for docname, doc_matches in by_document.items():
+        doc_matches.sort(key=lambda m: (_index(m) is None, _index(m) or 0))
+        current = None
+        for match in doc_matches:
+            index, text = _index(match), match["metadata"]["text"].strip()
+            if current is not None and index is not None and current.last_index is not None \
+                    and index == current.last_index + 1:
+                overlap = overlap_length(current.text, text)
+                current.text += text[overlap:] if overlap else "\n" + text
+                current.last_index = index
+                current.score = max(current.score, match.get("score", 0.0))
+                current.chunk_ids.append(match["id"])
+                continue
+            current = Passage(docname, index, index, text, match.get("score", 0.0), [match["id"]])
+            passages.append(current)
+
+    # A chunk wholly contained in another passage (e.g. the same clause in two documents) adds nothing
+    passages.sort(key=lambda p: len(p.text), reverse=True)
+    kept = []
+    for passage in passages:
+        container = next((k for k in kept if passage.text in k.text), None)
+        if container is None:
+            kept.append(passage)
+        else:
+            container.score = max(container.score, passage.score)
+    kept.sort(key=lambda p: p.score, reverse=True)
+    return kept
+
+
+def _truncate(text: str, token_budget: int) -> str:
+    # Cut the text at the last sentence boundary that fits, or at a word boundary if no sentence does
+    if count_tokens(text) <= token_budget:
+        return text
+    cut = ""
+    for boundary in _SENTENCE_END.finditer(text):
+        candidate = text[:boundary.start()]
+        if count_tokens(candidate) > token_budget:
+            break
+        cut = candidate
+    if not cut:
+        words = text.split(" ")
+        low, high = 0, len(words)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if count_tokens(" ".join(words[:middle])) <= token_budget:
+                low = middle
+            else:
+                high = middle - 1
+        cut = " ".join(words[:low])
+    return cut.rstrip() + " ..."
+
+
+class ContextAssembler:
+    """
+    Turn retrieved chunks into the context of a policy prompt: duplicates dropped, neighboring chunks
+    of a document merged without their overlap, passages ordered by score and the whole fitted to a
+    token budget.
+    """
+
+    def __init__(self, token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET, include_sources: bool = False):
+        """
+        :param token_budget: Maximum tokens of context. The best passage is always included, cut short if needed.
+        :param include_sources: Prefix each passage with its document name.
+        """
+        self.token_budget = max(1, token_budget)
+        self.include_sources = include_sources
+
+    def _format(self, passage: Passage, text: str) -> str:
+        if self.include_sources and passage.docname:
+            return f"[{passage.docname}]\n{text}"
+        return text
+
+    def assemble(self, matches: List[dict]) -> AssembledContext:
+        """
+        :param matches: Retrieved matches ({"id", "score", "metadata"}), best first.
+        """
+        passages = merge_chunks(matches)
+        separator_tokens = count_tokens(PASSAGE_SEPARATOR)
+        parts, kept = [], []
+        remaining = self.token_budget
+        truncated = False
+        for passage in passages:
+            cost = separator_tokens if parts else 0
+            text = self._format(passage, passage.text)
+            tokens = count_tokens(text) + cost
+            if tokens > remaining:
+                truncated = True
+                if parts and remaining - cost < MIN_PASSAGE_TOKENS:
+                    break
+                header = count_tokens(self._format(passage, "")) + cost
+                text = self._format(passage, _truncate(passage.text, max(1, remaining - header)))
+                tokens = count_tokens(text) + cost
+            parts.append(text)
+            kept.append(passage)
+            remaining -= tokens
+            if remaining <= 0:
+                break
+        text = PASSAGE_SEPARATOR.join(parts)
+        return AssembledContext(text, kept, len(matches), count_tokens(raw_context(matches)), count_tokens(text),
+                                truncated or len(kept) < len(passages))
@@ -1,14 +1,18 @@
-import streamlit as st
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from src.history import clean_history
 
-def create_llm_message(system_prompt, sessionHistory):
+def create_llm_message(system_prompt, sessionHistory, history_manager=None):
     #print(f"CREATELLM: sessionHistory is {sessionHistory}")
     #st.write(f"CREATELLM: sessionHistory is {sessionHistory}")
     #msgs=st.session_state.messages
     #print(f"CREATELLM  msgs is {msgs}")
     resp = []
     resp.append(SystemMessage(content=system_prompt))
-    resp.extend(sessionHistory)
+    # With a HistoryManager (src/history.py) the history is trimmed to a token budget and older turns
+    # are summarized; either way the graph's internal bookkeeping messages are never sent to the model
+    if history_manager is not None:
+        resp.extend(history_manager.prepare(sessionHistory))
+    else:
+        resp.extend(clean_history(sessionHistory))
     #print(f"CREATELLM: resp is {resp}")
     return resp
-
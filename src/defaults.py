@@ -0,0 +1,37 @@
+# src/defaults.py
+#
+# Default settings shared by AgentConfig (src/config.py) and the modules that use them. Kept free of
+# third-party imports, so reading the config does not load LangGraph, numpy or tiktoken.
+
+import os
+
+# Conversation storage (src/checkpoint.py); "off" in the secrets disables it
+DEFAULT_CHECKPOINT_PATH = os.environ.get("CHECKPOINT_DB_PATH", ".cache/checkpoints.sqlite")
+DEFAULT_CHECKPOINT_RETENTION_DAYS = 30
+
+# Contest rules file (src/contest_rules.py), relative to the repository root
+DEFAULT_CONTEST_RULES_PATH = os.environ.get("CONTEST_RULES_PATH", "contestrules.txt")
+
+# Tokens of retrieved policy text sent to the model per answer (src/context_assembly.py)
+DEFAULT_CONTEXT_TOKEN_BUDGET = 1000
+
+# Margin between the two best centroid similarities needed to skip the LLM classifier
+# (src/fast_classifier.py). Calibrated with benchmarks/classifier_calibration.py: every labeled question
+# routed at this margin matches its label, while below about 0.31 commission-sounding policy and ticket
+# questions were misrouted.
+DEFAULT_FAST_THRESHOLD = 0.35
+# Share of fast-routed messages still sent to the LLM, so agreement is measured above the threshold too
+DEFAULT_FAST_SHADOW_RATE = 0.05
+# JSON lines of local-vs-LLM comparisons that calibrate_threshold reads; "off" disables the log
+DEFAULT_FAST_LOG_PATH = os.environ.get("FAST_CLASSIFIER_LOG_PATH", ".cache/fast_classifier.jsonl")
+
+# Tokens of conversation history sent to the model (src/history.py)
+DEFAULT_HISTORY_TOKEN_BUDGET = 2000
+
+# BM25 index for hybrid policy retrieval (src/lexical_index.py)
+DEFAULT_LEXICAL_PATH = os.environ.get("LEXICAL_INDEX_PATH", ".cache/lexical_index.sqlite")
+# Lexical confidence above which the policy agent answers from lexical matches alone
+DEFAULT_LEXICAL_CONFIDENCE = 0.7
+
+# Local ticket queue (src/ticket_queue.py)
+DEFAULT_TICKET_DB_PATH = os.environ.get("TICKET_DB_PATH", ".cache/tickets.sqlite")
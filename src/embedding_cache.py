@@ -0,0 +1,160 @@
+# src/embedding_cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+DEFAULT_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def text_hash(text: str) -> str:
+    # Same md5 used for vector IDs in src/ingestion.py, so chunk and query lookups share one keyspace
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of embeddings keyed on (text hash, embedding model).
+
+    Vectors are stored as float32 blobs in SQLite. When the total stored size goes over max_bytes,
+    the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Open (or create) the cache.
+
+        :param path: SQLite database file, or ":memory:" for a throwaway cache.
+        :param max_bytes: Upper bound on the total size of stored vectors.
+        """
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (hash, model)
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, hashes: Iterable[str], model: str) -> Dict[str, List[float]]:
+        """
+        Look up several embeddings at once.
+
+        :param hashes: Text hashes to look up.
+        :param model: Embedding model the vectors were created with.
+        :return: A dictionary of hash -> vector for the hashes that were found.
+        """
+        hashes = list(dict.fromkeys(hashes))
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [model, *batch]).fetchall()
+                for hash, blob in rows:
+                    found[hash] = array('f', blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE hash = ? AND model = ?",
+                                       [(now, hash, model) for hash in found])
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def get(self, hash: str, model: str) -> Optional[List[float]]:
+        return self.get_many([hash], model).get(hash)
+
+    def put_many(self, items: Dict[str, List[float]], model: str):
+        """
+        Store several embeddings and evict old entries if the cache is over its size limit.
+
+        :param items: A dictionary of hash -> vector.
+        :param model: Embedding model the vectors were created with.
+        """
+        now = time.time()
+        rows = []
+        for hash, vector in items.items():
+            blob = array('f', vector).tobytes()
+            rows.append((hash, model, blob, len(blob), now))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self._evict()
+
+    def put(self, hash: str, model: str, vector: List[float]):
+        self.put_many({hash: vector}, model)
+
+    def _evict(self):
+        # Drop least recently used entries until the stored size is back under the limit
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        victims = []
+        for hash, model, size in self._conn.execute(
+                "SELECT hash, model, size FROM embeddings ORDER BY last_used ASC"):
+            victims.append((hash, model))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE hash = ? AND model = ?", victims)
+        self._conn.commit()
+        self.evictions += len(victims)
+
+    def stats(self) -> dict:
+        """
+        Report hit/miss counts and current cache size.
+        """
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> EmbeddingCache:
+    """
+    Return the process-wide embedding cache shared by ingestion and policy retrieval.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
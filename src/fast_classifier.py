@@ -0,0 +1,250 @@
+# src/fast_classifier.py
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from src.defaults import (DEFAULT_FAST_LOG_PATH as DEFAULT_LOG_PATH, DEFAULT_FAST_SHADOW_RATE as DEFAULT_SHADOW_RATE,
+                          DEFAULT_FAST_THRESHOLD as DEFAULT_THRESHOLD)
+
+DEFAULT_TARGET_AGREEMENT = 0.98
+DEFAULT_MIN_SAMPLES = 20
+
+STOPWORDS = set("""
+a an the is are was were be been am i my me we our you your it its this that these those to of in on for
+with at by from about as or and if what whats how do does did can could will would should there any
+select category request related like such even
+""".split())
+
+# Categories the fast path may route to. "clarify" is always left to the LLM.
+FAST_CATEGORIES = ["policy", "commission", "contest", "ticket"]
+
+
+def tokenize(text: str) -> List[str]:
+    # Lowercased words with stopwords dropped and a light suffix strip, plus adjacent-word bigrams
+    words = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        for suffix in ("ing", "ed", "es", "s"):
+            if len(word) > len(suffix) + 3 and word.endswith(suffix):
+                word = word[:-len(suffix)]
+                break
+        words.append(word)
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def parse_prompt_examples(prompt: str) -> Dict[str, List[str]]:
+    """
+    Extract the training text for each category from the classifier prompt: the category's
+    description line plus every quoted example beneath it.
+    """
+    examples: Dict[str, List[str]] = {}
+    current = None
+    for line in prompt.splitlines():
+        header = re.match(r"\s*\d+\)\s*\*\*(\w+)\*\*:\s*(.*)", line)
+        if header:
+            current = header.group(1)
+            examples[current] = [header.group(2)]
+            continue
+        example = re.match(r'\s*-\s*Example:\s*"(.*?)"', line)
+        if example and current:
+            examples[current].append(example.group(1))
+    return examples
+
+
+def comparison(prediction: Optional["FastPrediction"], llm_category: str, shadow: bool = False) -> Optional[dict]:
+    """
+    One local-vs-LLM comparison as logged by FastClassifier, or None if there was no local prediction.
+    """
+    if prediction is None:
+        return None
+    return {"confidence": round(prediction.confidence, 4), "local": prediction.category, "llm": llm_category,
+            "agreed": prediction.category == llm_category, "shadow": shadow}
+
+
+def read_comparisons(path: str) -> List[dict]:
+    """
+    The comparisons logged at `path`, skipping lines that do not parse (a write cut short).
+    """
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r") as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def calibrate_threshold(records: Iterable[dict], target_agreement: float = DEFAULT_TARGET_AGREEMENT,
+                        min_samples: int = DEFAULT_MIN_SAMPLES) -> Optional[float]:
+    """
+    The smallest margin at which the local prediction agrees with the LLM often enough to skip it.
+
+    Every logged confidence is a candidate: it qualifies when the comparisons at or above it number at
+    least `min_samples` and agree with the LLM at `target_agreement` or better.
+
+    :param records: Comparisons with "confidence" and "agreed" keys (see comparison()).
+    :param target_agreement: Required agreement rate of the messages that would be fast-routed.
+    :param min_samples: Fewest comparisons at or above the margin for the rate to be trusted.
+    :return: The margin, or None if no margin has enough agreeing comparisons.
+    """
+    ranked = sorted(((r["confidence"], bool(r["agreed"])) for r in records), reverse=True)
+    best = None
+    agreed = 0
+    for count, (confidence, agreement) in enumerate(ranked, start=1):
+        agreed += agreement
+        # Ties are only a candidate once the last comparison with that confidence is counted
+        if count < len(ranked) and ranked[count][0] == confidence:
+            continue
+        if count >= min_samples and agreed / count >= target_agreement:
+            best = confidence
+    return best
+
+
+@dataclass
+class FastPrediction:
+    category: str
+    confidence: float
+    scores: Dict[str, float]
+
+
+class FastClassifier:
+    """
+    Lexical TF-IDF centroid classifier used in front of the LLM classifier.
+
+    Each category is represented by the centroid of its example texts. A message is routed locally
+    when the margin between the best and second-best category similarity is at least `threshold`.
+    Every message the LLM also classifies is logged to `log_path`, so the threshold can be recalibrated
+    from real traffic with `python -m src.fast_classifier --log PATH`.
+    """
+
+    def __init__(self, examples: Dict[str, List[str]], threshold: float = DEFAULT_THRESHOLD,
+                 shadow_rate: float = 0.0, log_path: Optional[str] = None):
+        """
+        :param examples: Training texts for each category.
+        :param threshold: Minimum confidence (similarity margin) required to skip the LLM.
+        :param shadow_rate: Fraction of confident predictions that are still checked against the LLM,
+                            so accuracy can be measured while the fast path is on.
+        :param log_path: JSON lines file the local-vs-LLM comparisons are appended to; None keeps no log.
+        """
+        self.threshold = threshold
+        self.shadow_rate = shadow_rate
+        self.log_path = log_path
+        if log_path and os.path.dirname(log_path):
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        documents = {category: Counter(tokenize(" ".join(texts))) for category, texts in examples.items()}
+        document_frequency = Counter(term for counts in documents.values() for term in counts)
+        self.idf = {term: math.log((1 + len(documents)) / (1 + df)) + 1 for term, df in document_frequency.items()}
+        self.centroids = {category: self._vectorize_counts(counts)
+                          for category, counts in documents.items() if category in FAST_CATEGORIES}
+        self._lock = threading.Lock()
+        self.fast_routed = 0
+        self.llm_fallbacks = 0
+        self.compared = 0
+        self.agreements = 0
+
+    @classmethod
+    def from_prompt(cls, prompt: str, **kwargs) -> "FastClassifier":
+        return cls(parse_prompt_examples(prompt), **kwargs)
+
+    def _vectorize_counts(self, counts: Counter) -> Dict[str, float]:
+        vector = {term: count * self.idf[term] for term, count in counts.items() if term in self.idf}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {term: v / norm for term, v in vector.items()}
+
+    def predict(self, text: str) -> Optional[FastPrediction]:
+        """
+        Score a message against every category.
+
+        :return: The best category with its confidence, or None if no known terms were found.
+        """
+        vector = self._vectorize_counts(Counter(tokenize(text)))
+        if not vector:
+            return None
+        scores = {category: sum(weight * centroid.get(term, 0.0) for term, weight in vector.items())
+                  for category, centroid in self.centroids.items()}
+        ranked = sorted(scores.values(), reverse=True)
+        best = max(scores, key=scores.get)
+        confidence = ranked[0] - (ranked[1] if len(ranked) > 1 else 0.0)
+        return FastPrediction(best, confidence, scores)
+
+    def is_confident(self, prediction: Optional[FastPrediction]) -> bool:
+        return prediction is not None and prediction.confidence >= self.threshold
+
+    def should_shadow(self) -> bool:
+        # Randomly pick confident predictions to double-check against the LLM
+        return self.shadow_rate > 0 and random.random() < self.shadow_rate
+
+    def record_fast_route(self):
+        with self._lock:
+            self.fast_routed += 1
+
+    def record_llm_result(self, prediction: Optional[FastPrediction], llm_category: str, shadow: bool = False):
+        """
+        Record that the LLM classified a message, and whether the local prediction agreed with it.
+        """
+        record = comparison(prediction, llm_category, shadow)
+        with self._lock:
+            if not shadow:
+                self.llm_fallbacks += 1
+            if record is not None:
+                self.compared += 1
+                self.agreements += record["agreed"]
+                if self.log_path:
+                    with open(self.log_path, "a") as file:
+                        file.write(json.dumps(record) + "\n")
+        if record is not None:
+            print(f"fast classifier {'agreed' if record['agreed'] else 'disagreed'}: local={prediction.category} "
+                  f"({prediction.confidence:.2f}) llm={llm_category}{' [shadow]' if shadow else ''}")
+
+    def stats(self) -> dict:
+        """
+        Report how many LLM classifier calls were skipped and how often the local model agreed with the LLM.
+        """
+        with self._lock:
+            total = self.fast_routed + self.llm_fallbacks
+            return {
+                "fast_routed": self.fast_routed,
+                "llm_fallbacks": self.llm_fallbacks,
+                "llm_calls_saved_rate": round(self.fast_routed / total, 4) if total else 0.0,
+                "compared": self.compared,
+                "agreement_rate": round(self.agreements / self.compared, 4) if self.compared else 0.0,
+                "threshold": self.threshold,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the fast classifier margin from logged LLM comparisons")
+    parser.add_argument("--log", default=DEFAULT_LOG_PATH, help="comparison log written by the app")
+    parser.add_argument("--target", type=float, default=DEFAULT_TARGET_AGREEMENT,
+                        help="required agreement of fast-routed messages")
+    parser.add_argument("--min-samples", type=int, default=DEFAULT_MIN_SAMPLES,
+                        help="fewest comparisons at or above a margin to trust it")
+    args = parser.parse_args()
+
+    records = read_comparisons(args.log)
+    threshold = calibrate_threshold(records, args.target, args.min_samples)
+    routed = [r for r in records if threshold is not None and r["confidence"] >= threshold]
+    print({"comparisons": len(records), "shadow": sum(bool(r.get("shadow")) for r in records),
+           "calibrated_threshold": threshold, "fast_routed_share": round(len(routed) / len(records), 4) if records else 0.0,
+           "current_default": DEFAULT_THRESHOLD})
+    if threshold is None:
+        print(f"Not enough agreeing comparisons for {args.target} agreement; keep FAST_CLASSIFIER_THRESHOLD "
+              f"at or above {DEFAULT_THRESHOLD}, or 'off'")
+    else:
+        print(f"Set FAST_CLASSIFIER_THRESHOLD = {threshold}")
+
+
+if __name__ == "__main__":
+    main()
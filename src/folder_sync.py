@@ -0,0 +1,220 @@
+# src/folder_sync.py
+#
+# Incremental sync of a folder of policy documents into the vector index. Run from the repository root:
+#   python -m src.folder_sync path/to/policies
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from src.answer_cache import get_default_generations, invalidate_documents
+from src.chunk_manifest import get_default_chunk_manifest
+from src.config import load_config
+from src.embedding_cache import get_default_cache, text_hash
+from src.ingestion import IngestionPipeline
+from src.lexical_index import get_default_lexical_index
+from src.pdf_extract import chunk_pages, extract_pages
+from src.vector_store import open_vector_store
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
+DEFAULT_MANIFEST_PATH = os.environ.get("SYNC_MANIFEST_PATH", ".cache/sync_manifest.json")
+
+
+@dataclass
+class SyncSummary:
+    """
+    What a sync run changed.
+    """
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    chunks_upserted: int = 0
+    embeddings_reused: int = 0
+    vectors_deleted: int = 0
+    elapsed_seconds: float = 0.0
+
+    def __str__(self):
+        lines = [f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed, "
+                 f"{self.unchanged} unchanged files in {self.elapsed_seconds:.2f}s",
+                 f"{self.chunks_upserted} chunks upserted, {self.embeddings_reused} embeddings reused, "
+                 f"{self.vectors_deleted} vectors deleted"]
+        lines += [f"  + {name}" for name in self.added]
+        lines += [f"  ~ {name}" for name in self.changed]
+        lines += [f"  - {name}" for name in self.removed]
+        return "\n".join(lines)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FolderSync:
+    """
+    Keep the vector index in step with a folder of documents (a local stand-in for the Google Drive folder).
+
+    A manifest records each file's size, mtime and content hash, plus the hashes of its chunks. A run only
+    re-extracts and re-upserts files whose content changed, only embeds chunks missing from the embedding
+    cache, and deletes the vectors of chunks that no file uses any more. Vector IDs are chunk hashes, so a chunk shared by several
+    files has a single vector; it is reference-counted across the manifest and deleted with its last user.
+    """
+
+    def __init__(self, folder: str, pipeline: IngestionPipeline, manifest_path: str = DEFAULT_MANIFEST_PATH,
+                 extraction_workers: Optional[int] = None):
+        """
+        :param folder: Folder to sync. Every .pdf, .txt and .md file below it is ingested.
+        :param pipeline: The IngestionPipeline (and through it the embedding client and index) to use.
+        :param manifest_path: JSON file holding the state of the previous sync.
+        :param extraction_workers: Processes used for PDF text extraction. Defaults to the number of CPUs.
+        """
+        self.folder = folder
+        self.pipeline = pipeline
+        self.manifest_path = manifest_path
+        self.extraction_workers = extraction_workers
+
+    def load_manifest(self) -> Dict[str, dict]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, "r") as f:
+            return json.load(f).get("files", {})
+
+    def save_manifest(self, files: Dict[str, dict]):
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"folder": os.path.abspath(self.folder), "files": files}, f)
+        os.replace(tmp, self.manifest_path)
+
+    def scan(self) -> Dict[str, str]:
+        """
+        :return: Document name (path relative to the folder, with "/" separators) -> absolute path.
+        """
+        found = {}
+        for root, _, names in os.walk(self.folder):
+            for name in names:
+                if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    found[os.path.relpath(path, self.folder).replace(os.sep, "/")] = path
+        return dict(sorted(found.items()))
+
+    def chunks(self, path: str):
+        """
+        Extract and split one file.
+
+        :return: A list of (chunk_text, extra_metadata) pairs.
+        """
+        if path.lower().endswith(".pdf"):
+            return list(chunk_pages(extract_pages(path, max_workers=self.extraction_workers),
+                                    self.pipeline.text_splitter))
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return [(text, {}) for text in self.pipeline.split(f.read())]
+
+    def sync(self, dry_run: bool = False) -> SyncSummary:
+        """
+        Bring the index up to date with the folder.
+
+        :param dry_run: Report what would change without extracting, embedding or deleting anything.
+        """
+        start = time.perf_counter()
+        summary = SyncSummary()
+        previous = self.load_manifest()
+        current = {}
+        refs = Counter(h for entry in previous.values() for h in entry["chunks"])
+
+        scanned = self.scan()
+        for docname, path in scanned.items():
+            stat = os.stat(path)
+            old = previous.get(docname)
+            if old and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime:
+                current[docname] = old
+                summary.unchanged += 1
+                continue
+
+            sha256 = file_sha256(path)
+            if old and old["sha256"] == sha256:
+                # Touched but not modified
+                current[docname] = dict(old, mtime=stat.st_mtime)
+                summary.unchanged += 1
+                continue
+
+            (summary.changed if old else summary.added).append(docname)
+            if dry_run:
+                continue
+
+            chunks = self.chunks(path)
+            hashes = [text_hash(text) for text, _ in chunks]
+            # Every chunk of a changed file is upserted, so unchanged chunks get their new position and both
+            # indexes hold all of them; the embedding cache keeps unchanged chunks off the embeddings API
+            # The orphans are deleted below, counted across every file of the folder
+            result = self.pipeline.ingest_stream(chunks, docname, chunks_total=len(chunks), delete_superseded=False)
+            summary.chunks_upserted += result.chunks
+            summary.embeddings_reused += result.cached_chunks
+
+            refs.update(set(hashes))
+            if old:
+                refs.subtract(set(old["chunks"]))
+            current[docname] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha256,
+                                "chunks": sorted(set(hashes))}
+
+        summary.removed = [docname for docname in previous if docname not in scanned]
+        if dry_run:
+            summary.elapsed_seconds = time.perf_counter() - start
+            return summary
+        for docname in summary.removed:
+            refs.subtract(set(previous[docname]["chunks"]))
+            self.pipeline.chunk_manifest.forget(docname)
+        if summary.removed:
+            invalidate_documents(summary.removed, self.pipeline.answer_generations)
+
+        # Chunks that were in the index before this run and no longer belong to any file
+        orphaned = sorted(h for h in {h for entry in previous.values() for h in entry["chunks"]} if refs[h] <= 0)
+        self.pipeline.delete_chunks(orphaned)
+        summary.vectors_deleted = len(orphaned)
+        if orphaned:
+            self.pipeline.flush()
+
+        self.save_manifest(current)
+        summary.elapsed_seconds = time.perf_counter() - start
+        return summary
+
+
+def main():
+    # Same settings as the app: .streamlit/secrets.toml, overridden by environment variables
+    config = load_config()
+    parser = argparse.ArgumentParser(description="Incrementally sync a folder of policy documents into the vector index")
+    parser.add_argument("folder", help="folder of .pdf, .txt and .md files (for example a local copy of the Drive folder)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH, help="manifest from the previous sync")
+    parser.add_argument("--backend", default=config.vector_backend, choices=["pinecone", "local"])
+    parser.add_argument("--local-path", default=config.local_index_path, help="local index directory")
+    parser.add_argument("--workers", type=int, default=None, help="PDF extraction processes")
+    parser.add_argument("--dry-run", action="store_true", help="only report which files changed")
+    args = parser.parse_args()
+
+    from src.api_clients import get_default_clients
+    client = get_default_clients(config.openai_requests_per_minute,
+                                 config.openai_tokens_per_minute).openai(config.openai_api_key)
+    index = open_vector_store(args.backend, pinecone_api_key=config.pinecone_api_key,
+                              index_name=config.pinecone_index_name, local_path=args.local_path)
+    lexical_index = get_default_lexical_index(config.lexical_index_path) if config.lexical_index_path else None
+    # Bumping the shared generations tells the running app which cached answers the sync made stale
+    pipeline = IngestionPipeline(client, index, embedding_cache=get_default_cache(), lexical_index=lexical_index,
+                                 answer_generations=get_default_generations(),
+                                 chunk_manifest=get_default_chunk_manifest())
+    summary = FolderSync(args.folder, pipeline, manifest_path=args.manifest,
+                         extraction_workers=args.workers).sync(dry_run=args.dry_run)
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
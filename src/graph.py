@@ -1,17 +1,27 @@
-import streamlit as st
-from openai import OpenAI
-from langchain_openai import ChatOpenAI
+import asyncio
+import time
 from typing import TypedDict, Annotated, List, Dict
 from langgraph.graph import StateGraph, END
 from pydantic import BaseModel
 from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage, AIMessage, ChatMessage
-from pinecone import Pinecone
+from langchain_core.runnables import RunnableLambda
+from src.api_clients import get_default_clients
+from src.config import load_config
+from src.vector_store import open_vector_store
 from src.policy_agent import PolicyAgent
 from src.commission_agent import CommissionAgent
 from src.contest_agent import ContestAgent
 from src.ticket_agent import TicketAgent 
 from src.clarify_agent import ClarifyAgent
+from src.context_assembly import DEFAULT_CONTEXT_TOKEN_BUDGET
 from src.create_llm_message import create_llm_message
+from src.history import DEFAULT_TOKEN_BUDGET, HistoryManager, clean_history
+from src.lazy import LazyClient
+from src.lexical_index import DEFAULT_CONFIDENCE as DEFAULT_LEXICAL_CONFIDENCE
+from src.metrics import get_default_metrics
+from src.speculative import SpeculativeRetriever
+from src.streaming import get_ttft_recorder
+from src.fast_classifier import DEFAULT_THRESHOLD as DEFAULT_FAST_THRESHOLD, FastClassifier
 
 from langgraph.graph.message import AnyMessage, add_messages
 
@@ -23,6 +33,10 @@ class AgentState(TypedDict):
     responseToUser: str
     lnode: str
     category: str
+    speculationId: str
+    # Route guessed by the last clarify turn and the request it was unsure about (src/clarify_agent.py)
+    clarifyGuess: str
+    clarifyRequest: str
     sessionHistory: Annotated[list[AnyMessage], add_messages]
 
 # Define the structure for category classification
@@ -47,104 +61,199 @@ class TicketResponse(BaseModel):
     ticket: str
     response: str
 
-def get_contest_info():
-        with open('contestrules.txt', 'r') as file:
-            contestrules = file.read()
-        return contestrules
-
 # Define valid categories
 VALID_CATEGORIES = ["policy", "commission", "contest", "ticket", "clarify"]
 
+CLASSIFIER_PROMPT = """
+You are an expert in sales operations with deep knowledge of sales compensation. Your job is to accurately classify customer requests into one of the following categories based on context and content, even if specific keywords are not used.
+
+1) **policy**: Select this category if the request is related to any formal sales compensation rules or guidelines, even if the word "policy" is not mentioned. This includes topics like windfall, minimum commission guarantees, bonus structures, or leave-related questions.
+   - Example: "What happens to my commission if I go on leave?" (This is about policy.)
+   - Example: "Is there any guarantee for minimum commission guarantee or MCG?" (This is about policy.)
+   - Example: "Can you tell me what is a windfall?" (This is about policy.)
+   - Example: "What is a teaming agreement?" (This is about policy.)
+   - Example: "What is a split or commission split?" (This is about policy.)
+
+2) **commission**: Select this category if the request involves the calculation or details of the user's sales commission, such as earnings, rates, or specific deal-related inquiries.
+   - Example: "How much commission will I earn on a $500,000 deal?" (This is about commission.)
+   - Example: "What is the new commission rate?" (This is about commission.)
+
+3) **contest**: Select this category if the request is about sales contests, such as rules, participation, or rewards.
+   - Example: "How do I enter the Q3 sales contest?" (This is about contests.)
+   - Example: "What are the rules for the upcoming contest?" (This is about contests.)
+
+4) **ticket**: Select this category if the request involves issues or problems that need to be reported, such as system issues, payment errors, or situations where a service ticket is required.
+   - Example: "I can't access my commission report." (This is about a ticket.)
+   - Example: "My commission was calculated incorrectly." (This is about a ticket.)
+
+5) **clarify**: Select this category if the request is unclear, ambiguous, or does not fit into the above categories. Ask the user for more details.
+   - Example: "Can you clarify your question?" (This is a request for clarification.)
+
+Remember to consider the context and content of the request, even if specific keywords like 'policy' or 'commission' are not used. 
+"""
+
 # Define the salesCompAgent class
 class salesCompAgent():
-    def __init__(self, api_key):
+    def __init__(self, api_key, model=None, client=None, index=None, clients=None, embedding_cache=None,
+                 answer_cache=None, fast_classifier_threshold=DEFAULT_FAST_THRESHOLD,
+                 history_token_budget=DEFAULT_TOKEN_BUDGET, async_client=None, speculative_retrieval=False,
+                 metrics=None, checkpointer=None, config=None, lexical_index=None,
+                 lexical_confidence=DEFAULT_LEXICAL_CONFIDENCE, context_token_budget=DEFAULT_CONTEXT_TOKEN_BUDGET,
+                 ticket_queue=None, ticket_worker=None, contest_rules=None, fast_classifier_shadow_rate=0.0,
+                 fast_classifier_log=None):
         # Initialize the ChatOpenAI model (from LangChain) and OpenAI client with the given API key
         # ChatOpenAI is used for chat interactions
         # OpenAI is used for creating embeddings
-        self.model = ChatOpenAI(model="gpt-4o-mini", temperature=0, api_key=api_key)
-        self.client = OpenAI(api_key=api_key)
+        # All of them go through one shared client layer (src/api_clients.py): pooled connections,
+        # rate limits, retries with backoff and a circuit breaker, coordinated across every agent
+        # They are built on first use (src/lazy.py), so building the agent does not import the OpenAI SDK
+        clients = clients or get_default_clients()
+        self.model = model or LazyClient(
+            lambda: clients.chat_model(api_key, model="gpt-4o-mini", temperature=0, stream_usage=True), "ChatOpenAI")
+        self.client = client or LazyClient(lambda: clients.openai(api_key), "OpenAI")
+        # AsyncOpenAI is used by the async node versions (graph.ainvoke / astream_tokens)
+        self.async_client = async_client or LazyClient(lambda: clients.async_openai(api_key), "AsyncOpenAI")
 
-        #Pinecone configurtion using Streamlit secrets
-        # Pinecone is used for storing and querying embeddings
-        self.pinecone_api_key = st.secrets['PINECONE_API_KEY']
-        self.pinecone_env = st.secrets['PINECONE_API_ENV']
-        self.pinecone_index_name = st.secrets['PINECONE_INDEX_NAME']
+        #Pinecone configurtion from the injected AgentConfig (src/config.py)
+        # Pinecone is used for storing and querying embeddings, unless vector_backend is "local"
+        # in which case the in-process NumpyVectorStore (src/vector_store.py) is used instead
+        if index is None:
+            config = config or load_config()
+            self.pinecone_api_key = config.pinecone_api_key
+            self.pinecone_env = config.pinecone_api_env
+            self.pinecone_index_name = config.pinecone_index_name
 
-        # Initialize Pinecone once
-        self.pinecone = Pinecone(api_key=self.pinecone_api_key)
-        self.index = self.pinecone.Index(self.pinecone_index_name)
+            # Initialize the vector store once
+            index = open_vector_store(config.vector_backend,
+                                      pinecone_api_key=self.pinecone_api_key,
+                                      index_name=self.pinecone_index_name,
+                                      local_path=config.local_index_path)
+        self.index = index
+
+        # Local classifier that lets obvious requests skip the LLM classifier call.
+        # Pass fast_classifier_threshold=None to always use the LLM.
+        # Its comparisons with the LLM go to fast_classifier_log, for recalibrating the threshold
+        self.fast_classifier = None
+        if fast_classifier_threshold is not None:
+            self.fast_classifier = FastClassifier.from_prompt(CLASSIFIER_PROMPT, threshold=fast_classifier_threshold,
+                                                              shadow_rate=fast_classifier_shadow_rate,
+                                                              log_path=fast_classifier_log)
+
+        # Keeps the conversation history sent to the model within a token budget
+        self.history_manager = HistoryManager(self.model, token_budget=history_token_budget)
 
         # Initialize the PolicyAgent, CommissionAgent, ContestAgent, TicketAgent, ClarifyAgent
-        self.policy_agent_class = PolicyAgent(self.client, self.index)
-        self.commission_agent_class = CommissionAgent(self.model, self.index)
-        self.contest_agent_class = ContestAgent(self.model) # ContestAgent does not need Pinecone
-        self.ticket_agent_class = TicketAgent(self.model)
-        self.clarify_agent_class = ClarifyAgent(self.model, self) # Capable of passing reference to the main agent
+        # With a lexical index (src/lexical_index.py) policy retrieval is hybrid BM25 + vector
+        # Retrieved policy text is fitted to context_token_budget (src/context_assembly.py)
+        self.policy_agent_class = PolicyAgent(self.client, self.index, embedding_cache, answer_cache,
+                                              async_client=self.async_client, lexical_index=lexical_index,
+                                              lexical_confidence=lexical_confidence,
+                                              context_token_budget=context_token_budget)
+        self.commission_agent_class = CommissionAgent(self.model, self.index, history_manager=self.history_manager)
+        # ContestAgent does not need Pinecone; its rules are parsed from contestrules.txt (src/contest_rules.py)
+        self.contest_agent_class = ContestAgent(self.model, contest_rules)
+        # Tickets go to a local queue (src/ticket_queue.py); the optional worker sends them in the background
+        self.ticket_agent_class = TicketAgent(self.model, ticket_queue, ticket_worker,
+                                              history_manager=self.history_manager)
+        self.clarify_agent_class = ClarifyAgent(self.model, history_manager=self.history_manager)
+
+        # Optionally start policy retrieval at the same time as LLM classification (src/speculative.py)
+        self.speculative_retriever = None
+        if speculative_retrieval:
+            self.speculative_retriever = SpeculativeRetriever(self.policy_agent_class)
+            self.policy_agent_class.speculative_retriever = self.speculative_retriever
 
-        # Build the state graph
+        # Build the state graph. Every node has a sync and an async implementation, so the same
+        # compiled graph serves graph.invoke/stream and graph.ainvoke/astream.
         workflow = StateGraph(AgentState)
-        workflow.add_node("classifier", self.initial_classifier)
-        workflow.add_node("policy", self.policy_agent_class.policy_agent)
-        workflow.add_node("commission", self.commission_agent_class.commission_agent)
-        workflow.add_node("contest", self.contest_agent_class.contest_agent)
-        workflow.add_node("ticket", self.ticket_agent_class.ticket_agent)
-        workflow.add_node("clarify", self.clarify_agent_class.clarify_agent)
+        workflow.add_node("classifier", RunnableLambda(self.initial_classifier, afunc=self.ainitial_classifier))
+        workflow.add_node("policy", RunnableLambda(self.policy_agent_class.policy_agent,
+                                                   afunc=self.policy_agent_class.apolicy_agent))
+        workflow.add_node("commission", RunnableLambda(self.commission_agent_class.commission_agent,
+                                                       afunc=self.commission_agent_class.acommission_agent))
+        workflow.add_node("contest", RunnableLambda(self.contest_agent_class.contest_agent,
+                                                    afunc=self.contest_agent_class.acontest_agent))
+        workflow.add_node("ticket", RunnableLambda(self.ticket_agent_class.ticket_agent,
+                                                   afunc=self.ticket_agent_class.aticket_agent))
+        workflow.add_node("clarify", RunnableLambda(self.clarify_agent_class.clarify_agent,
+                                                    afunc=self.clarify_agent_class.aclarify_agent))
 
         # Set the entry point and add conditional edges
         workflow.set_entry_point("classifier")
         workflow.add_conditional_edges("classifier", self.main_router)
 
         # Define end points for each node
-        workflow.add_edge("policy", END)
-        workflow.add_edge("commission", END)
-        workflow.add_edge("contest", END)
-        workflow.add_edge("ticket", END)
-        workflow.add_edge("clarify", END)
+        # Every agent's answer is added to the conversation before the turn ends
+        workflow.add_node("remember", RunnableLambda(self.remember_response))
+        workflow.add_edge("policy", "remember")
+        workflow.add_edge("commission", "remember")
+        workflow.add_edge("contest", "remember")
+        workflow.add_edge("ticket", "remember")
+        workflow.add_edge("clarify", "remember")
+        workflow.add_edge("remember", END)
 
-        # Set up in-memory SQLite database for state saving
-        #memory = SqliteSaver(conn=sqlite3.connect(":memory:", check_same_thread=False))
-        #self.graph = builder.compile(checkpointer=memory)
+        # With a checkpointer (src/checkpoint.py) the conversation is stored per thread_id, so each
+        # turn only needs to send the new message
+        self.checkpointer = checkpointer
 
-        self.graph = workflow.compile()
+        # Every node, model call and token is recorded per turn (src/metrics.py)
+        self.metrics = metrics or get_default_metrics()
+        self.graph = workflow.compile(checkpointer=checkpointer).with_config(callbacks=[self.metrics])
+
+    # Local fast-path classification. Returns (state update or None, prediction, shadow)
+    def fast_classify(self, state: AgentState):
+        prediction = None
+        shadow = False
+        if self.fast_classifier is not None:
+            prediction = self.fast_classifier.predict(state['initialMessage'])
+            if self.fast_classifier.is_confident(prediction):
+                shadow = self.fast_classifier.should_shadow()
+                if not shadow:
+                    self.fast_classifier.record_fast_route()
+                    print(f"category is {prediction.category} (fast path, confidence {prediction.confidence:.2f})")
+                    return {
+                        "lnode": "initial_classifier",
+                        "category": prediction.category,
+                        "speculationId": "",
+                        "clarifyGuess": "",
+                        "sessionHistory": f"SessionHistory: category is {prediction.category}"
+                    }, prediction, shadow
+        return None, prediction, shadow
+
+    # A "yes" to the last clarifying question goes to the route it guessed, with the original request
+    def confirmed_clarification(self, state: AgentState):
+        category = self.clarify_agent_class.confirmed_route(state)
+        if category is None:
+            return None
+        print(f"category is {category} (confirmed clarification)")
+        return {
+            "lnode": "initial_classifier",
+            "category": category,
+            "initialMessage": state.get('clarifyRequest') or state['initialMessage'],
+            "speculationId": "",
+            "clarifyGuess": "",
+            "sessionHistory": f"SessionHistory: category is {category}"
+        }
 
     # Initial classifier function to categorize user messages
     def initial_classifier(self, state: AgentState):
         print("initial classifier")
-        #print(f"state is {state}\n******\n")
-        if 'messages' in state:
-            print(f"messages is {state['messages']}")
-        
-        CLASSIFIER_PROMPT = f"""
-You are an expert in sales operations with deep knowledge of sales compensation. Your job is to accurately classify customer requests into one of the following categories based on context and content, even if specific keywords are not used.
 
-1) **policy**: Select this category if the request is related to any formal sales compensation rules or guidelines, even if the word "policy" is not mentioned. This includes topics like windfall, minimum commission guarantees, bonus structures, or leave-related questions.
-   - Example: "What happens to my commission if I go on leave?" (This is about policy.)
-   - Example: "Is there any guarantee for minimum commission guarantee or MCG?" (This is about policy.)
-   - Example: "Can you tell me what is a windfall?" (This is about policy.)
-   - Example: "What is a teaming agreement?" (This is about policy.)
-   - Example: "What is a split or commission split?" (This is about policy.)
+        confirmed = self.confirmed_clarification(state)
+        if confirmed is not None:
+            return confirmed
 
-2) **commission**: Select this category if the request involves the calculation or details of the user's sales commission, such as earnings, rates, or specific deal-related inquiries.
-   - Example: "How much commission will I earn on a $500,000 deal?" (This is about commission.)
-   - Example: "What is the new commission rate?" (This is about commission.)
+        # Try the local fast-path classifier first; only call the LLM when it is not confident
+        fast_result, prediction, shadow = self.fast_classify(state)
+        if fast_result is not None:
+            return fast_result
 
-3) **contest**: Select this category if the request is about sales contests, such as rules, participation, or rewards.
-   - Example: "How do I enter the Q3 sales contest?" (This is about contests.)
-   - Example: "What are the rules for the upcoming contest?" (This is about contests.)
+        # Speculatively start policy retrieval while the LLM classifies
+        speculation_id = ""
+        if self.speculative_retriever is not None:
+            speculation_id = self.speculative_retriever.start(state['initialMessage'])
 
-4) **ticket**: Select this category if the request involves issues or problems that need to be reported, such as system issues, payment errors, or situations where a service ticket is required.
-   - Example: "I can't access my commission report." (This is about a ticket.)
-   - Example: "My commission was calculated incorrectly." (This is about a ticket.)
-
-5) **clarify**: Select this category if the request is unclear, ambiguous, or does not fit into the above categories. Ask the user for more details.
-   - Example: "Can you clarify your question?" (This is a request for clarification.)
-
-Remember to consider the context and content of the request, even if specific keywords like 'policy' or 'commission' are not used. 
-"""
-  
-        abc = create_llm_message(CLASSIFIER_PROMPT,state['sessionHistory'])
-        msgs=st.session_state.messages
-        #print(f"GRAPHPY  msgs is {msgs}")
+        abc = create_llm_message(CLASSIFIER_PROMPT,state['sessionHistory'],self.history_manager)
 
         # Invoke the model with the classifier prompt
         #llm_response = self.model.with_structured_output(Category).invoke([
@@ -156,18 +265,126 @@ Remember to consider the context and content of the request, even if specific ke
 
         category = llm_response.category
         print(f"category is {category}")
+        if self.fast_classifier is not None:
+            self.fast_classifier.record_llm_result(prediction, category, shadow=shadow)
         
         # Return the updated state with the category
         return{
             "lnode": "initial_classifier", 
             #"responseToUser": "Classifier successful",
             "category": category,
+            "speculationId": speculation_id,
+            "clarifyGuess": "",
             "sessionHistory": f"SessionHistory: category is {category}"
         }
     
+    # Async version of initial_classifier
+    async def ainitial_classifier(self, state: AgentState):
+        print("initial classifier")
+        confirmed = self.confirmed_clarification(state)
+        if confirmed is not None:
+            return confirmed
+        fast_result, prediction, shadow = self.fast_classify(state)
+        if fast_result is not None:
+            return fast_result
+
+        speculation_id = ""
+        if self.speculative_retriever is not None:
+            speculation_id = self.speculative_retriever.astart(state['initialMessage'])
+
+        # Building the messages may summarize old history with a blocking call, so it runs in a thread
+        abc = await asyncio.to_thread(create_llm_message, CLASSIFIER_PROMPT, state['sessionHistory'],
+                                      self.history_manager)
+        llm_response = await self.model.with_structured_output(Category).ainvoke(abc)
+
+        category = llm_response.category
+        print(f"category is {category}")
+        if self.fast_classifier is not None:
+            self.fast_classifier.record_llm_result(prediction, category, shadow=shadow)
+        return {
+            "lnode": "initial_classifier",
+            "category": category,
+            "speculationId": speculation_id,
+            "clarifyGuess": "",
+            "sessionHistory": f"SessionHistory: category is {category}"
+        }
+
+    # Run one turn and stream generated tokens as they arrive
+    def stream_tokens(self, inputs: dict, config: dict = None):
+        """
+        Run the graph for one user turn, yielding ("token", text) for each piece of text a node
+        generates and finally ("final", updates) with the merged state updates of the turn.
+        Time-to-first-token per node is recorded in the shared TTFTRecorder.
+        """
+        start = time.perf_counter()
+        recorder = get_ttft_recorder()
+        first_token_seen = set()
+        updates = {}
+        for mode, chunk in self.graph.stream(inputs, config, stream_mode=["custom", "updates"]):
+            if mode == "custom":
+                node = chunk.get("node")
+                if node not in first_token_seen:
+                    first_token_seen.add(node)
+                    recorder.record(node, time.perf_counter() - start)
+                yield "token", chunk["token"]
+            else:
+                for node, update in chunk.items():
+                    if update:
+                        updates.update(update)
+        yield "final", updates
+
+    # Async version of stream_tokens
+    async def astream_tokens(self, inputs: dict, config: dict = None):
+        """
+        Async version of stream_tokens, driving the graph with graph.astream so many conversations
+        can share one event loop.
+        """
+        start = time.perf_counter()
+        recorder = get_ttft_recorder()
+        first_token_seen = set()
+        updates = {}
+        async for mode, chunk in self.graph.astream(inputs, config, stream_mode=["custom", "updates"]):
+            if mode == "custom":
+                node = chunk.get("node")
+                if node not in first_token_seen:
+                    first_token_seen.add(node)
+                    recorder.record(node, time.perf_counter() - start)
+                yield "token", chunk["token"]
+            else:
+                for node, update in chunk.items():
+                    if update:
+                        updates.update(update)
+        yield "final", updates
+
+    # Add the turn's answer to the stored conversation
+    def remember_response(self, state: AgentState):
+        return {"sessionHistory": [AIMessage(content=state.get('responseToUser') or "")]}
+
+    def turn_input(self, message: str, history: list) -> dict:
+        """
+        Graph input for one user turn. With a checkpointer only the new message is sent, since the
+        rest of the conversation is already stored for the thread; without one the whole history is.
+        """
+        if self.checkpointer is not None:
+            history = [{"role": "user", "content": message}]
+        return {'initialMessage': message, 'sessionHistory': history}
+
+    def conversation(self, config: dict) -> list:
+        """
+        The stored conversation of a thread as chat messages ({"role", "content"}), without bookkeeping entries.
+        """
+        if self.checkpointer is None:
+            return []
+        values = self.graph.get_state(config).values
+        return [{"role": "user" if m.type == "human" else "assistant", "content": m.content}
+                for m in clean_history(values.get('sessionHistory', [])) if m.type in ("human", "ai")]
+
      # Main router function to direct to the appropriate agent based on the category
     def main_router(self, state: AgentState):
         my_category = state['category']
+        # Speculative retrieval is only useful for the policy route
+        if self.speculative_retriever is not None and my_category != "policy":
+            self.speculative_retriever.discard(state.get('speculationId'))
         if my_category in VALID_CATEGORIES:
             return my_category
         else:
@@ -0,0 +1,155 @@
+# src/history.py
+
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, convert_to_messages
+
+from src.defaults import DEFAULT_HISTORY_TOKEN_BUDGET as DEFAULT_TOKEN_BUDGET
+
+# Messages the graph adds for its own bookkeeping (see salesCompAgent.initial_classifier)
+BOOKKEEPING_PREFIX = "SessionHistory:"
+
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # Loaded on the first count rather than at import, so pages that never count tokens skip tiktoken
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:  # tiktoken is optional; fall back to a character-based estimate
+        return None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens in a piece of text (approximately, if tiktoken is not installed).
+    """
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def is_bookkeeping(message: BaseMessage) -> bool:
+    return isinstance(message.content, str) and message.content.startswith(BOOKKEEPING_PREFIX)
+
+
+def clean_history(session_history) -> List[BaseMessage]:
+    """
+    Convert the session history to messages and drop internal bookkeeping messages.
+    """
+    return [m for m in convert_to_messages(list(session_history or [])) if not is_bookkeeping(m)]
+
+
+class HistoryManager:
+    """
+    Keep the conversation sent to the model within a token budget.
+
+    The most recent messages are kept verbatim. Older messages are folded, in blocks, into a rolling
+    summary that is cached by the content it covers, so each block is summarized only once.
+    """
+
+    def __init__(self, model=None, token_budget: int = DEFAULT_TOKEN_BUDGET, fold_block: int = 6,
+                 max_cached_summaries: int = 256):
+        """
+        :param model: ChatOpenAI model used to write summaries. Without one, older turns are simply dropped.
+        :param token_budget: Maximum tokens for the recent window of verbatim messages.
+        :param fold_block: Number of messages folded into the summary at a time. Folding in blocks keeps
+                           the summarized prefix stable across turns, so the cached summary is reused.
+        :param max_cached_summaries: Number of summaries kept in memory.
+        """
+        self.model = model
+        self.token_budget = token_budget
+        self.fold_block = max(1, fold_block)
+        self.max_cached_summaries = max_cached_summaries
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+        self.summary_calls = 0
+
+    @staticmethod
+    def _prefix_keys(messages: List[BaseMessage]) -> List[str]:
+        # keys[i] identifies messages[:i + 1]; each key chains the previous one
+        keys = []
+        digest = hashlib.sha256()
+        for m in messages:
+            digest.update(f"{m.type}\0{m.content}\0".encode("utf-8"))
+            keys.append(digest.copy().hexdigest())
+        return keys
+
+    def _fold_count(self, messages: List[BaseMessage]) -> int:
+        # Smallest multiple of fold_block that brings the recent window within the budget.
+        # The latest message is always kept verbatim.
+        sizes = [message_tokens(m) for m in messages]
+        total = sum(sizes)
+        folded = 0
+        while total > self.token_budget and folded < len(messages) - 1:
+            step = min(self.fold_block, len(messages) - 1 - folded)
+            total -= sum(sizes[folded:folded + step])
+            folded += step
+        return folded
+
+    def _summarize(self, previous_summary: str, messages: List[BaseMessage]) -> str:
+        self.summary_calls += 1
+        transcript = "\n".join(f"{m.type}: {m.content}" for m in messages)
+        prompt = f"""
+        Summarize this sales compensation support conversation in a few sentences. Keep any figures
+        (deal values, OTI, quota), policy names and open questions the user raised.
+
+        Summary so far:
+        {previous_summary or "(none)"}
+
+        New messages:
+        {transcript}
+        """
+        return self.model.invoke([SystemMessage(content=prompt)]).content
+
+    def summary_for(self, messages: List[BaseMessage]) -> str:
+        """
+        Return a summary of the given messages, extending the longest cached summary of a prefix.
+        """
+        if not messages or self.model is None:
+            return ""
+        keys = self._prefix_keys(messages)
+        with self._lock:
+            if keys[-1] in self._summaries:
+                self._summaries.move_to_end(keys[-1])
+                return self._summaries[keys[-1]]
+            covered, summary = 0, ""
+            for i in range(len(keys) - 1, -1, -1):
+                if keys[i] in self._summaries:
+                    covered, summary = i + 1, self._summaries[keys[i]]
+                    break
+
+        summary = self._summarize(summary, messages[covered:])
+        with self._lock:
+            self._summaries[keys[-1]] = summary
+            while len(self._summaries) > self.max_cached_summaries:
+                self._summaries.popitem(last=False)
+        return summary
+
+    def prepare(self, session_history) -> List[BaseMessage]:
+        """
+        Build the messages to send to the model: bookkeeping removed, older turns summarized and
+        the recent window kept within the token budget.
+        """
+        messages = clean_history(session_history)
+        folded = self._fold_count(messages)
+        if not folded:
+            return messages
+        recent = messages[folded:]
+        summary = self.summary_for(messages[:folded])
+        if summary:
+            return [HumanMessage(content=f"(Summary of the earlier conversation: {summary})")] + recent
+        return recent
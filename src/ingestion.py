@@ -0,0 +1,303 @@
+# src/ingestion.py
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.answer_cache import DocumentGenerations, invalidate_documents
+from src.chunk_manifest import ChunkManifest
+from src.embedding_cache import EMBEDDING_MODEL, EmbeddingCache, text_hash
+from src.pdf_extract import chunk_pages, extract_pages, page_count, read_pdf_bytes
+
+# Value written into each vector's metadata. Kept as-is so re-ingested vectors match existing ones.
+METADATA_MODEL = "text-embedding-ada-003"
+# IDs per delete request when superseded chunks are removed from the indexes
+DELETE_BATCH_SIZE = 1000
+
+
+@dataclass
+class IngestionProgress:
+    """
+    Snapshot of an ingestion run, passed to the progress callback after every batch.
+    """
+    chunks_done: int
+    chunks_total: int
+    elapsed_seconds: float
+    pages_done: int = 0
+    pages_total: int = 0
+
+    @property
+    def fraction(self) -> float:
+        # While a document is still being streamed the chunk total is unknown, so pages are used if given
+        if self.pages_total:
+            return min(self.pages_done / self.pages_total, 1.0)
+        return self.chunks_done / self.chunks_total if self.chunks_total else 1.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks_done / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+
+@dataclass
+class IngestionResult:
+    """
+    Summary of a finished ingestion run.
+    """
+    docname: str
+    chunks: int
+    embedding_requests: int
+    upsert_requests: int
+    retries: int
+    cached_chunks: int
+    elapsed_seconds: float
+    # Chunks of the document's previous version that were deleted from the indexes
+    superseded_chunks: int = 0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+
+class IngestionPipeline:
+    """
+    Split text into chunks, embed them in batches and upsert them into a vector index.
+
+    Works with any client that exposes `embeddings.create(model=..., input=[...])` and any index that
+    exposes `upsert(vectors)`, so local stand-ins (see src/local_backends.py) can replace OpenAI and Pinecone.
+    """
+
+    def __init__(self, client, index, embed_batch_size: int = 64, upsert_batch_size: int = 100,
+                 max_workers: int = 4, max_retries: int = 5, backoff_seconds: float = 0.5,
+                 progress_callback: Optional[Callable[[IngestionProgress], None]] = None,
+                 embedding_cache: Optional[EmbeddingCache] = None, lexical_index=None,
+                 answer_generations: Optional[DocumentGenerations] = None,
+                 chunk_manifest: Optional[ChunkManifest] = None):
+        """
+        Initialize the pipeline.
+
+        :param client: An OpenAI client (or stand-in) used for creating embeddings.
+        :param index: A Pinecone index (or stand-in) that receives the vectors.
+        :param embed_batch_size: Number of chunks sent in a single embeddings request.
+        :param upsert_batch_size: Maximum number of vectors sent in a single upsert request.
+        :param max_workers: Number of batches processed concurrently.
+        :param max_retries: Attempts per request before the error is raised.
+        :param backoff_seconds: Base delay for exponential backoff between retries.
+        :param progress_callback: Called with an IngestionProgress after each finished batch.
+        :param embedding_cache: Optional cache of embeddings keyed on chunk hash. Cached chunks skip the
+                                embeddings API but are still upserted, since the cache says nothing about
+                                what the index (which may be new, wiped or another backend) holds.
+        :param lexical_index: Optional BM25Index (src/lexical_index.py) that receives every upserted chunk too.
+        :param answer_generations: Document generations (src/answer_cache.py) bumped for every ingested
+                                   document, so answer caches in other processes drop its answers. None
+                                   (benchmarks, tests) only invalidates the answer caches of this process.
+        :param chunk_manifest: The chunks each document was stored under (src/chunk_manifest.py), so the
+                               chunks a re-ingested document no longer has are deleted from both indexes.
+                               Defaults to one in memory, which only knows this pipeline's documents.
+        """
+        self.client = client
+        self.index = index
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.upsert_batch_size = max(1, upsert_batch_size)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max(1, max_retries)
+        self.backoff_seconds = backoff_seconds
+        self.progress_callback = progress_callback
+        self.embedding_cache = embedding_cache
+        self.lexical_index = lexical_index
+        self.answer_generations = answer_generations
+        self.chunk_manifest = chunk_manifest if chunk_manifest is not None else ChunkManifest()
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200,
+                                                            length_function=len, is_separator_regex=False)
+        self._lock = threading.Lock()
+        self._retries = 0
+
+    def split(self, text: str) -> List[str]:
+        """
+        Split text into the same chunks upload_pdf.embed has always produced.
+        """
+        return [d.page_content for d in self.text_splitter.create_documents([text])]
+
+    def _with_retries(self, fn, *args, **kwargs):
+        # Retry a request with jittered exponential backoff
+        for attempt in range(self.max_retries):
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries - 1:
+                    raise
+                with self._lock:
+                    self._retries += 1
+                delay = self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+                print(f"ingestion: {type(e).__name__}: {e}; retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of texts with a single request, preserving input order.
+        """
+        response = self._with_retries(self.client.embeddings.create, model=EMBEDDING_MODEL, input=texts)
+        data = sorted(response.data, key=lambda d: getattr(d, "index", 0))
+        return [d.embedding for d in data]
+
+    def _process_batch(self, batch: List[tuple], docname: str, cached: dict = None) -> tuple:
+        # Embed one batch of (idx, text, extra_metadata) and upsert the results in sized batches.
+        # Chunks found in `cached` reuse the stored vector instead of calling the API.
+        cached = cached or {}
+        missing = [text for _, text, _ in batch if text_hash(text) not in cached]
+        fresh = {}
+        if missing:
+            fresh = dict(zip((text_hash(t) for t in missing), self.embed_texts(missing)))
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_many(fresh, EMBEDDING_MODEL)
+
+        vectors = []
+        for idx, text, extra in batch:
+            hash = text_hash(text)
+            embedding = fresh[hash] if hash in fresh else cached[hash]
+            metadata = {"hash": hash, "text": text, "index": idx, "model": METADATA_MODEL, "docname": docname}
+            metadata.update(extra)
+            vectors.append((hash, embedding, metadata))
+
+        upserts = 0
+        for start in range(0, len(vectors), self.upsert_batch_size):
+            self._with_retries(self.index.upsert, vectors[start:start + self.upsert_batch_size])
+            upserts += 1
+        # Keep the lexical index in step with the vector index
+        if self.lexical_index is not None:
+            self.lexical_index.upsert(vectors)
+        return len(batch), upserts, 1 if missing else 0
+
+    def delete_chunks(self, hashes: List[str]):
+        """
+        Delete chunks from the vector index and the lexical index.
+        """
+        for start in range(0, len(hashes), DELETE_BATCH_SIZE):
+            self._with_retries(self.index.delete, ids=hashes[start:start + DELETE_BATCH_SIZE])
+            if self.lexical_index is not None:
+                self.lexical_index.delete(hashes[start:start + DELETE_BATCH_SIZE])
+
+    def flush(self):
+        """
+        Persist the index once a document is in, for stores that buffer writes (NumpyVectorStore).
+        """
+        flush = getattr(self.index, "flush", None)
+        if flush is not None:
+            self._with_retries(flush)
+
+    def ingest_stream(self, chunks: Iterable[Tuple[str, dict]], docname: str, chunks_total: int = 0,
+                      pages_total: int = 0, delete_superseded: bool = True) -> IngestionResult:
+        """
+        Embed and upsert chunks as they are produced, using a bounded pool of workers.
+
+        Batches are submitted as soon as they fill up and at most two per worker are in flight, so a
+        long document never has to be split (or held) in full before embedding starts.
+
+        :param chunks: (text, extra_metadata) pairs in document order. Their position becomes the "index"
+                       metadata; extra_metadata (for example {"page": 3}) is added to each vector's metadata.
+        :param docname: Document name stored in each vector's metadata.
+        :param chunks_total: Number of chunks, if known in advance, for progress reporting.
+        :param pages_total: Number of pages, if known. Progress is then reported against the "page" metadata.
+        :param delete_superseded: Delete the chunks of the document's previous version that it no longer has.
+                                  FolderSync passes False, since it deletes by its own reference counts.
+        :return: An IngestionResult summarising the run.
+        """
+        start = time.perf_counter()
+        self._retries = 0
+        seen = done = cached_chunks = upserts = embedding_requests = 0
+        hashes = set()
+        page = 0
+        # Future of each batch being processed -> last page that batch covers
+        in_flight = {}
+
+        def report():
+            if self.progress_callback:
+                self.progress_callback(IngestionProgress(done, max(chunks_total, seen), time.perf_counter() - start,
+                                                         pages_done=page, pages_total=pages_total))
+
+        def collect(futures):
+            nonlocal done, upserts, embedding_requests, page
+            for future in futures:
+                batch_chunks, batch_upserts, batch_requests = future.result()
+                page = max(page, in_flight.pop(future))
+                done += batch_chunks
+                upserts += batch_upserts
+                embedding_requests += batch_requests
+                report()
+
+        def submit(batch):
+            nonlocal cached_chunks
+            # Unchanged chunks reuse their cached embedding, but every chunk is upserted into both indexes,
+            # so the vectors carry this upload's "index" and "docname" metadata
+            cached = {}
+            if self.embedding_cache is not None:
+                cached = self.embedding_cache.get_many((text_hash(t) for _, t, _ in batch), EMBEDDING_MODEL)
+            cached_chunks += sum(1 for _, t, _ in batch if text_hash(t) in cached)
+            batch_page = max(extra.get("page", 0) for _, _, extra in batch)
+            in_flight[executor.submit(self._process_batch, batch, docname, cached)] = batch_page
+            # Report batches that have finished, and wait for one before reading too far ahead
+            collect([f for f in in_flight if f.done()])
+            while len(in_flight) >= self.max_workers * 2:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(finished)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            batch = []
+            for text, extra in chunks:
+                batch.append((seen, text, extra))
+                hashes.add(text_hash(text))
+                seen += 1
+                if len(batch) >= self.embed_batch_size:
+                    submit(batch)
+                    batch = []
+            if batch:
+                submit(batch)
+            collect(as_completed(in_flight))
+        page = pages_total
+        # Only once every new chunk is in, so a failed upload leaves the previous version searchable
+        superseded = self.chunk_manifest.replace(docname, hashes)
+        if delete_superseded and superseded:
+            self.delete_chunks(superseded)
+        self.flush()
+        report()
+
+        # Answers cached from the previous version of this document are now stale
+        invalidate_documents([docname], self.answer_generations)
+
+        return IngestionResult(docname=docname, chunks=seen, embedding_requests=embedding_requests,
+                               upsert_requests=upserts, retries=self._retries, cached_chunks=cached_chunks,
+                               elapsed_seconds=time.perf_counter() - start,
+                               superseded_chunks=len(superseded) if delete_superseded else 0)
+
+    def ingest_chunks(self, chunks: List[str], docname: str) -> IngestionResult:
+        """
+        Embed and upsert pre-split chunks using a bounded pool of workers.
+
+        :param chunks: Chunk texts, in document order. Their position becomes the "index" metadata.
+        :param docname: Document name stored in each vector's metadata.
+        :return: An IngestionResult summarising the run.
+        """
+        return self.ingest_stream(((text, {}) for text in chunks), docname, chunks_total=len(chunks))
+
+    def ingest_pdf(self, source, docname: str, max_workers: Optional[int] = None) -> IngestionResult:
+        """
+        Extract, split, embed and upsert a PDF as a stream: pages are extracted in parallel
+        (see src/pdf_extract.py) and embedding starts while later pages are still being read.
+        Each vector's metadata records the page its chunk starts on.
+
+        :param source: A path, a file-like object or the PDF's bytes.
+        :param max_workers: Processes used for text extraction. Defaults to the number of CPUs.
+        """
+        data = source if isinstance(source, bytes) else read_pdf_bytes(source)
+        pages = extract_pages(data, max_workers=max_workers)
+        return self.ingest_stream(chunk_pages(pages, self.text_splitter), docname, pages_total=page_count(data))
+
+    def ingest_text(self, text: str, docname: str) -> IngestionResult:
+        """
+        Split, embed and upsert a document's text.
+        """
+        return self.ingest_chunks(self.split(text), docname)
@@ -0,0 +1,52 @@
+# src/lazy.py
+
+import threading
+from typing import Callable
+
+
+class LazyClient:
+    """
+    Stand-in for a client that is slow to import or construct (the OpenAI SDK, ChatOpenAI, a Pinecone
+    index), built on first use.
+
+    Attribute access is forwarded to the client, so agents use it exactly like the client itself. Building
+    an agent therefore neither imports the SDKs nor opens connections; the first request that needs a
+    client pays for it once, and processes that never need it (a page that only reads the conversation,
+    a worker answering only from caches) never do.
+    """
+
+    def __init__(self, factory: Callable, name: str = "client"):
+        """
+        :param factory: Callable with no arguments that builds the client.
+        :param name: Label used in the build log line.
+        """
+        self._factory = factory
+        self._name = name
+        self._lock = threading.Lock()
+        self._client = None
+
+    @property
+    def built(self) -> bool:
+        return self._client is not None
+
+    def get(self):
+        """
+        The client, built on the first call.
+        """
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+                    print(f"LazyClient: built {self._name}")
+                client = self._client
+        return client
+
+    def __getattr__(self, name):
+        # Only called for attributes not found on the LazyClient itself (or before __init__ set its own)
+        if name.startswith("__") or name in ("_factory", "_name", "_lock", "_client"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __repr__(self) -> str:
+        return f"LazyClient({self._name}, built={self.built})"
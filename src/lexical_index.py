@@ -0,0 +1,297 @@
+# src/lexical_index.py
+
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from src.defaults import DEFAULT_LEXICAL_CONFIDENCE as DEFAULT_CONFIDENCE, DEFAULT_LEXICAL_PATH
+
+# Constant of reciprocal rank fusion: larger values flatten the difference between ranks
+RRF_K = 60
+
+STOPWORDS = frozenset("""
+a about an and any are as at be been but by can could do does for from get got has have how i if in
+into is it its me my of on or our please should so than that the their them then there these they
+this to was we what when where which who why will with would you your
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:['\-][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased words without stopwords, with plurals and possessives folded ("MCGs" -> "mcg",
+    "rep's" -> "rep"), so exact policy terms and acronyms match however they are written.
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token.endswith("'s"):
+            token = token[:-2]
+        if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+            token = token[:-1]
+        if token and token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+@dataclass
+class LexicalResult:
+    """
+    Ranked matches for a query, in the vector store's match shape, and how sure the index is of them.
+
+    confidence is in [0, 1]: the share of the query's term weight (IDF) found in the best chunk, counting
+    only terms that occur in the corpus, scaled down when its rarest matched term is common.
+    """
+    matches: List[dict] = field(default_factory=list)
+    confidence: float = 0.0
+
+    def confident_matches(self, top_k: int, min_relative_score: float = 0.5) -> List[dict]:
+        # The best matches, dropping those that score far below the best, so fewer chunks go into the prompt
+        if not self.matches:
+            return []
+        best = self.matches[0]["score"]
+        return [m for m in self.matches[:top_k] if m["score"] >= best * min_relative_score]
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over the chunk text stored in each vector's metadata.
+
+    Mirrors the vector store's upsert/delete API, so ingestion keeps both in step, and answers queries
+    in microseconds without an embedding call. Chunks are persisted in SQLite and the postings rebuilt in
+    memory on start; writes committed by another process (e.g. a folder sync) are picked up on the next
+    search.
+    """
+
+    def __init__(self, path: str = DEFAULT_LEXICAL_PATH, k1: float = 1.5, b: float = 0.75):
+        """
+        :param path: SQLite database file, or ":memory:" for a throwaway index.
+        :param k1: BM25 term-frequency saturation.
+        :param b: BM25 length normalization.
+        """
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, metadata TEXT NOT NULL)")
+        self._conn.commit()
+        self._checked = 0.0
+        self._load()
+
+    # --- in-memory postings -------------------------------------------------
+
+    def _load(self):
+        with self._lock:
+            self._postings: Dict[str, Dict[str, int]] = {}
+            self._lengths: Dict[str, int] = {}
+            self._metadata: Dict[str, dict] = {}
+            self._total_length = 0
+            for id, metadata in self._conn.execute("SELECT id, metadata FROM chunks"):
+                self._add(id, json.loads(metadata))
+            self._version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _add(self, id: str, metadata: dict):
+        self._remove(id)
+        counts = Counter(tokenize(metadata.get("text", "")))
+        for term, count in counts.items():
+            self._postings.setdefault(term, {})[id] = count
+        length = sum(counts.values())
+        self._lengths[id] = length
+        self._metadata[id] = metadata
+        self._total_length += length
+
+    def _remove(self, id: str):
+        metadata = self._metadata.pop(id, None)
+        if metadata is None:
+            return
+        for term in set(tokenize(metadata.get("text", ""))):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(id)
+
+    def _refresh(self):
+        # Reload if another connection committed since we last looked (checked at most once a second)
+        now = time.monotonic()
+        if now - self._checked < 1.0:
+            return
+        self._checked = now
+        if self._conn.execute("PRAGMA data_version").fetchone()[0] != self._version:
+            self._load()
+
+    # --- writes ---------------------------------------------------------------
+
+    def upsert(self, vectors, namespace: str = ""):
+        """
+        Index the chunks of Pinecone-style (id, values, metadata) tuples; the values are ignored.
+        """
+        rows = [(id, metadata) for id, _, metadata in vectors if metadata and metadata.get("text")]
+        with self._lock:
+            for id, metadata in rows:
+                self._add(id, metadata)
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (id, metadata) VALUES (?, ?)",
+                                   [(id, json.dumps(metadata)) for id, metadata in rows])
+            self._conn.commit()
+            self._version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return {"upserted_count": len(rows)}
+
+    def delete(self, ids, namespace: str = ""):
+        ids = list(ids)
+        with self._lock:
+            for id in ids:
+                self._remove(id)
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(id,) for id in ids])
+            self._conn.commit()
+            self._version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # --- reads ----------------------------------------------------------------
+
+    def _idf(self, df: int, n: int) -> float:
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int = 3) -> LexicalResult:
+        """
+        Rank chunks by BM25 against the query.
+
+        :return: A LexicalResult with up to top_k matches ({"id", "score", "metadata"}) and its confidence.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            self._refresh()
+            n = len(self._lengths)
+            if not terms or n == 0:
+                return LexicalResult()
+            average_length = self._total_length / n or 1.0
+            idf = {t: self._idf(len(self._postings.get(t, ())), n) for t in terms}
+            scores = Counter()
+            for term in terms:
+                for id, tf in self._postings.get(term, {}).items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[id] / average_length)
+                    scores[id] += idf[term] * tf * (self.k1 + 1) / norm
+            if not scores:
+                return LexicalResult()
+            top = scores.most_common(top_k)
+            best = top[0][0]
+            # Words no chunk contains cannot be matched by any chunk, so they do not count against it
+            known = [t for t in terms if t in self._postings]
+            matched = [t for t in known if best in self._postings[t]]
+            coverage = sum(idf[t] for t in matched) / sum(idf[t] for t in known)
+            rarest = min(len(self._postings[t]) for t in matched)
+            matches = [{"id": id, "score": score, "metadata": self._metadata[id]} for id, score in top]
+        return LexicalResult(matches, coverage * (1 - rarest / n))
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"chunks": len(self._lengths), "terms": len(self._postings)}
+
+    def covers(self, index) -> bool:
+        """
+        Whether this index holds at least as many chunks as the vector index, i.e. it was built alongside
+        it or backfilled. Until it does, its matches cannot stand in for a vector query.
+        """
+        count = vector_count(index)
+        with self._lock:
+            self._refresh()
+            return count is not None and len(self._lengths) >= count
+
+    def backfill(self, index, batch_size: int = 100) -> int:
+        """
+        Index every chunk already stored in a vector index, for data ingested before the lexical index
+        existed. Works with NumpyVectorStore and with Pinecone indexes that support list and fetch.
+
+        :return: Number of chunks indexed.
+        """
+        total = 0
+        if hasattr(index, "items"):
+            items = list(index.items())
+            for i in range(0, len(items), batch_size):
+                total += self.upsert((id, None, metadata) for id, metadata in items[i:i + batch_size])["upserted_count"]
+            return total
+        for ids in index.list(namespace=""):
+            ids = list(ids)
+            for i in range(0, len(ids), batch_size):
+                fetched = index.fetch(ids=ids[i:i + batch_size], namespace="").vectors
+                total += self.upsert((id, None, dict(v.metadata or {})) for id, v in fetched.items())["upserted_count"]
+        return total
+
+
+def vector_count(index) -> Optional[int]:
+    """
+    Number of vectors in a NumpyVectorStore, a Pinecone index or a stand-in with items(), or None if unknown.
+    """
+    if hasattr(index, "__len__"):
+        return len(index)
+    if hasattr(index, "describe_index_stats"):
+        return int(index.describe_index_stats().total_vector_count)
+    if hasattr(index, "items"):
+        return len(index.items())
+    return None
+
+
+def reciprocal_rank_fusion(ranked_lists: Iterable[List], top_k: int = 3, k: int = RRF_K) -> List[dict]:
+    """
+    Merge ranked match lists (vector and lexical) by reciprocal rank: each chunk scores
+    sum(1 / (k + rank)) over the lists it appears in, so chunks found by both rank first.
+
+    :return: Up to top_k matches as {"id", "score", "metadata"} dicts, best first.
+    """
+    scores = Counter()
+    metadata = {}
+    for matches in ranked_lists:
+        for rank, match in enumerate(matches, start=1):
+            scores[match["id"]] += 1.0 / (k + rank)
+            metadata.setdefault(match["id"], match["metadata"])
+    return [{"id": id, "score": score, "metadata": metadata[id]} for id, score in scores.most_common(top_k)]
+
+
+_default_indexes = {}
+_default_lock = threading.Lock()
+
+
+def get_default_lexical_index(path: str = DEFAULT_LEXICAL_PATH) -> BM25Index:
+    """
+    Process-wide lexical index for a database file, shared by the agents and ingestion.
+    """
+    with _default_lock:
+        if path not in _default_indexes:
+            _default_indexes[path] = BM25Index(path)
+        return _default_indexes[path]
+
+
+def main():
+    import argparse
+
+    from src.config import load_config
+    from src.vector_store import open_vector_store
+
+    parser = argparse.ArgumentParser(description="Build the lexical index from the chunks already in the vector index")
+    parser.add_argument("--path", default=DEFAULT_LEXICAL_PATH, help="lexical index database")
+    args = parser.parse_args()
+
+    config = load_config()
+    index = open_vector_store(config.vector_backend, pinecone_api_key=config.pinecone_api_key,
+                              index_name=config.pinecone_index_name, local_path=config.local_index_path)
+    lexical = BM25Index(args.path)
+    start = time.perf_counter()
+    count = lexical.backfill(index)
+    print(f"Indexed {count} chunks in {time.perf_counter() - start:.1f}s: {lexical.stats()}")
+
+
+if __name__ == "__main__":
+    main()
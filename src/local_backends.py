@@ -0,0 +1,46 @@
+# src/local_backends.py
+
+import hashlib
+import math
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import List
+
+
+class LocalEmbeddingClient:
+    """
+    Offline stand-in for the OpenAI client's embeddings API.
+
+    Embeddings are deterministic feature-hashed bags of words, so texts that share words are similar.
+    Useful for benchmarking and running the app without network access.
+    """
+
+    def __init__(self, dimension: int = 1536, latency_seconds: float = 0.0):
+        """
+        :param dimension: Length of each embedding vector.
+        :param latency_seconds: Simulated round-trip time for each embeddings request.
+        """
+        self.dimension = dimension
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.embeddings = self  # Mirrors client.embeddings.create(...)
+
+    def embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for word in re.findall(r"\w+", text.lower()):
+            bucket = int(hashlib.md5(word.encode('utf-8')).hexdigest(), 16) % self.dimension
+            vector[bucket] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def create(self, model: str, input):
+        with self._lock:
+            self.requests += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        texts = [input] if isinstance(input, str) else list(input)
+        data = [SimpleNamespace(index=i, embedding=self.embed(t)) for i, t in enumerate(texts)]
+        return SimpleNamespace(data=data, model=model)
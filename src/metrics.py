@@ -0,0 +1,422 @@
+# src/metrics.py
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler, dispatch_custom_event
+
+# Name of the LangChain custom event carrying usage that callbacks cannot see (direct OpenAI calls,
+# embeddings, vector queries, context assembly). See record_llm_call and friends below.
+METRICS_EVENT = "sales_comp_metrics"
+
+# Estimated USD per million tokens, (prompt, completion). Matched on the longest model-name prefix.
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "text-embedding-ada-002": (0.10, 0.0),
+}
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+COST_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+
+
+def estimate_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Estimated USD cost of a call, or 0.0 for models not in MODEL_PRICES.
+    """
+    matches = [name for name in MODEL_PRICES if model and model.startswith(name)]
+    if not matches:
+        return 0.0
+    prompt_price, completion_price = MODEL_PRICES[max(matches, key=len)]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def _record(kind: str, **data):
+    # Outside a graph run (ingestion, scripts) there is no run to attach the event to, so nothing is recorded
+    try:
+        dispatch_custom_event(METRICS_EVENT, dict(data, kind=kind))
+    except Exception:
+        pass
+
+
+def record_llm_call(model: str, prompt_tokens: int = 0, completion_tokens: int = 0):
+    """
+    Record a chat completion made without LangChain (LangChain model calls are recorded automatically).
+    """
+    _record("llm", model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+
+def record_embedding_call(model: str, tokens: int = 0):
+    _record("embedding", model=model, tokens=tokens)
+
+
+def record_vector_query(seconds: float):
+    _record("vector_query", seconds=seconds)
+
+
+def record_context(tokens_before: int, tokens_after: int):
+    """
+    Record the retrieved context of a prompt before and after assembly (src/context_assembly.py).
+    """
+    _record("context", tokens_before=tokens_before, tokens_after=tokens_after)
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed upper bounds, in the Prometheus style.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        return {"count": self.count, "sum": round(self.sum, 6), "buckets": cumulative}
+
+
+@dataclass
+class TurnMetrics:
+    """
+    Everything recorded for one run of the graph.
+    """
+    wall_seconds: float = 0.0
+    node_seconds: Dict[str, float] = field(default_factory=dict)
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    embedding_calls: int = 0
+    embedding_tokens: int = 0
+    vector_queries: int = 0
+    vector_query_seconds: float = 0.0
+    context_tokens_before: int = 0
+    context_tokens_after: int = 0
+    cost_usd: float = 0.0
+
+    def add_llm(self, model: Optional[str], prompt_tokens: int, completion_tokens: int):
+        self.llm_calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost_usd += estimate_cost(model, prompt_tokens, completion_tokens)
+
+
+class MetricsRecorder(BaseCallbackHandler):
+    """
+    LangChain callback handler that turns graph runs into per-turn metrics and aggregated histograms.
+
+    Attached to the compiled graph by salesCompAgent, so every node and every LangChain model call inside
+    it is seen. A turn starts with the graph's root run and ends when it finishes; nodes are the runs
+    directly below the root. Work done outside LangChain reports itself through record_llm_call,
+    record_embedding_call, record_vector_query and record_context.
+    """
+
+    run_inline = True
+
+    def __init__(self, max_recent: int = 100, export_path: Optional[str] = None,
+                 export_interval_seconds: float = 10.0):
+        """
+        :param max_recent: Number of recent turns kept in full for the snapshot.
+        :param export_path: If set, a JSON snapshot is written here at most every export_interval_seconds.
+        :param export_interval_seconds: Minimum time between two exports.
+        """
+        self.export_path = export_path
+        self.export_interval_seconds = export_interval_seconds
+        self._lock = threading.Lock()
+        self._turns = {}        # root run id -> (TurnMetrics, start time)
+        self._root_of = {}      # run id -> root run id
+        self._nodes = {}        # node run id -> (node name, start time)
+        self._models = {}       # model run id -> model name
+        self._recent = deque(maxlen=max_recent)
+        self._finished = OrderedDict()  # root run id -> TurnMetrics, for callers that passed a run_id
+        self._max_finished = 1000
+        self._last_export = 0.0
+        self._server = None
+        self.turns = 0
+        self.histograms = {
+            "turn_seconds": Histogram(SECONDS_BUCKETS),
+            "llm_calls_per_turn": Histogram(COUNT_BUCKETS),
+            "tokens_per_turn": Histogram(TOKEN_BUCKETS),
+            "embedding_calls_per_turn": Histogram(COUNT_BUCKETS),
+            "vector_query_seconds": Histogram(SECONDS_BUCKETS),
+            "cost_usd_per_turn": Histogram(COST_BUCKETS),
+        }
+        self.node_histograms = {}
+        self.totals = {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "embedding_calls": 0,
+                       "vector_queries": 0, "context_tokens_before": 0, "context_tokens_after": 0,
+                       "cost_usd": 0.0}
+
+    # LangChain callbacks
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        with self._lock:
+            if parent_run_id is None:
+                self._turns[run_id] = (TurnMetrics(), time.perf_counter())
+                self._root_of[run_id] = run_id
+                return
+            root = self._root_of.get(parent_run_id)
+            if root is None:
+                return
+            self._root_of[run_id] = root
+            node = (metadata or {}).get("langgraph_node")
+            if parent_run_id == root and node:
+                self._nodes[run_id] = (node, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end_run(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end_run(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start_model(run_id, parent_run_id, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start_model(run_id, parent_run_id, kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt_tokens = completion_tokens = 0
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        if usage:
+            prompt_tokens, completion_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        elif response.llm_output and response.llm_output.get("token_usage"):
+            token_usage = response.llm_output["token_usage"]
+            prompt_tokens = token_usage.get("prompt_tokens", 0)
+            completion_tokens = token_usage.get("completion_tokens", 0)
+        with self._lock:
+            model = self._models.pop(run_id, None)
+            if response.llm_output and response.llm_output.get("model_name"):
+                model = response.llm_output["model_name"]
+            turn = self._turn_for(run_id)
+            if turn is not None:
+                turn.add_llm(model, prompt_tokens, completion_tokens)
+            self._root_of.pop(run_id, None)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._models.pop(run_id, None)
+            self._root_of.pop(run_id, None)
+
+    def on_custom_event(self, name, data, *, run_id, **kwargs):
+        if name != METRICS_EVENT:
+            return
+        with self._lock:
+            turn = self._turn_for(run_id)
+            if turn is None:
+                return
+            kind = data.get("kind")
+            if kind == "llm":
+                turn.add_llm(data.get("model"), data.get("prompt_tokens", 0), data.get("completion_tokens", 0))
+            elif kind == "embedding":
+                turn.embedding_calls += 1
+                turn.embedding_tokens += data.get("tokens", 0)
+                turn.cost_usd += estimate_cost(data.get("model"), data.get("tokens", 0), 0)
+            elif kind == "vector_query":
+                turn.vector_queries += 1
+                turn.vector_query_seconds += data.get("seconds", 0.0)
+                self.histograms["vector_query_seconds"].observe(data.get("seconds", 0.0))
+            elif kind == "context":
+                turn.context_tokens_before += data.get("tokens_before", 0)
+                turn.context_tokens_after += data.get("tokens_after", 0)
+
+    # Bookkeeping
+
+    def _turn_for(self, run_id) -> Optional[TurnMetrics]:
+        root = self._root_of.get(run_id)
+        entry = self._turns.get(root) if root is not None else None
+        return entry[0] if entry else None
+
+    def _start_model(self, run_id, parent_run_id, kwargs):
+        params = kwargs.get("invocation_params") or {}
+        with self._lock:
+            root = self._root_of.get(parent_run_id)
+            if root is None:
+                return
+            self._root_of[run_id] = root
+            self._models[run_id] = params.get("model_name") or params.get("model")
+
+    def _end_run(self, run_id):
+        finished = None
+        with self._lock:
+            node = self._nodes.pop(run_id, None)
+            if node is not None:
+                turn = self._turn_for(run_id)
+                if turn is not None:
+                    name, start = node
+                    seconds = time.perf_counter() - start
+                    turn.node_seconds[name] = turn.node_seconds.get(name, 0.0) + seconds
+                    self.node_histograms.setdefault(name, Histogram(SECONDS_BUCKETS)).observe(seconds)
+            if run_id in self._turns:
+                turn, start = self._turns.pop(run_id)
+                turn.wall_seconds = time.perf_counter() - start
+                # Forget every run that belonged to this turn
+                self._root_of = {r: root for r, root in self._root_of.items() if root != run_id}
+                self._observe(turn)
+                self._finished[run_id] = turn
+                if len(self._finished) > self._max_finished:
+                    self._finished.popitem(last=False)
+                finished = turn
+            else:
+                self._root_of.pop(run_id, None)
+        if finished is not None and self.export_path:
+            self._maybe_export()
+
+    def _observe(self, turn: TurnMetrics):
+        self.turns += 1
+        self.histograms["turn_seconds"].observe(turn.wall_seconds)
+        self.histograms["llm_calls_per_turn"].observe(turn.llm_calls)
+        self.histograms["tokens_per_turn"].observe(turn.prompt_tokens + turn.completion_tokens)
+        self.histograms["embedding_calls_per_turn"].observe(turn.embedding_calls)
+        self.histograms["cost_usd_per_turn"].observe(turn.cost_usd)
+        self.totals["llm_calls"] += turn.llm_calls
+        self.totals["prompt_tokens"] += turn.prompt_tokens
+        self.totals["completion_tokens"] += turn.completion_tokens
+        self.totals["embedding_calls"] += turn.embedding_calls
+        self.totals["vector_queries"] += turn.vector_queries
+        self.totals["context_tokens_before"] += turn.context_tokens_before
+        self.totals["context_tokens_after"] += turn.context_tokens_after
+        self.totals["cost_usd"] += turn.cost_usd
+        self._recent.append(turn)
+
+    def pop_turn(self, run_id) -> Optional[TurnMetrics]:
+        """
+        Metrics of one finished turn, for callers that started the graph with {"run_id": run_id} in its
+        config. Only the latest 1000 finished turns are kept.
+        """
+        with self._lock:
+            return self._finished.pop(run_id, None)
+
+    # Export
+
+    def snapshot(self) -> dict:
+        """
+        :return: Totals, histograms (overall and per node) and the most recent turns, as plain data.
+        """
+        with self._lock:
+            return {
+                "turns": self.turns,
+                "totals": dict(self.totals, cost_usd=round(self.totals["cost_usd"], 6)),
+                "histograms": {name: h.snapshot() for name, h in self.histograms.items()},
+                "node_seconds": {name: h.snapshot() for name, h in sorted(self.node_histograms.items())},
+                "recent_turns": [asdict(t) for t in self._recent],
+            }
+
+    def prometheus(self) -> str:
+        """
+        :return: The histograms and totals in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def histogram(name, h, labels=""):
+            for bound, count in h["buckets"].items():
+                lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {count}')
+            lines.append(f"{name}_sum{{{labels}}} {h['sum']}")
+            lines.append(f"{name}_count{{{labels}}} {h['count']}")
+
+        for name, h in snapshot["histograms"].items():
+            lines.append(f"# TYPE salescomp_{name} histogram")
+            histogram(f"salescomp_{name}", h)
+        lines.append("# TYPE salescomp_node_seconds histogram")
+        for node, h in snapshot["node_seconds"].items():
+            histogram("salescomp_node_seconds", h, f'node="{node}"')
+        for name, value in snapshot["totals"].items():
+            lines.append(f"# TYPE salescomp_{name}_total counter")
+            lines.append(f"salescomp_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: Optional[str] = None):
+        """
+        Write the snapshot as JSON, atomically.
+        """
+        path = path or self.export_path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+    def _maybe_export(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_export < self.export_interval_seconds:
+                return
+            self._last_export = now
+        try:
+            self.export()
+        except OSError as e:
+            print(f"metrics export failed: {e}")
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """
+        Serve /metrics (Prometheus text) and /metrics.json from a background thread. Calling it again is a no-op.
+        """
+        with self._lock:
+            if self._server is not None:
+                return self._server
+            recorder = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path == "/metrics":
+                        body, content_type = recorder.prometheus().encode(), "text/plain; version=0.0.4"
+                    elif self.path == "/metrics.json":
+                        body, content_type = json.dumps(recorder.snapshot()).encode(), "application/json"
+                    else:
+                        self.send_error(404)
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+            print(f"metrics: serving http://{host}:{port}/metrics")
+            return self._server
+
+
+_default_recorder = None
+_default_lock = threading.Lock()
+
+
+def get_default_metrics() -> MetricsRecorder:
+    """
+    Process-wide recorder shared by every agent. METRICS_FILE, if set, is where snapshots are exported.
+    """
+    global _default_recorder
+    with _default_lock:
+        if _default_recorder is None:
+            _default_recorder = MetricsRecorder(export_path=os.environ.get("METRICS_FILE"))
+        return _default_recorder
@@ -0,0 +1,132 @@
+# src/pdf_extract.py
+
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional, Tuple
+
+import PyPDF2
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Documents with fewer pages than this are extracted in-process; starting a pool costs more than it saves
+MIN_PARALLEL_PAGES = 16
+
+# Set in each worker process by _init_worker, so the PDF is sent and parsed once per process, not once per page
+_worker_reader = None
+
+
+def _init_worker(data: bytes):
+    global _worker_reader
+    _worker_reader = PyPDF2.PdfReader(io.BytesIO(data))
+
+
+def _extract_page(page_index: int) -> str:
+    return _worker_reader.pages[page_index].extract_text() or ""
+
+
+def read_pdf_bytes(source) -> bytes:
+    """
+    Read a PDF from a path or a file-like object (such as a Streamlit UploadedFile).
+    """
+    if hasattr(source, "read"):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return source.read()
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def page_count(data: bytes) -> int:
+    return len(PyPDF2.PdfReader(io.BytesIO(data)).pages)
+
+
+def extract_pages(source, max_workers: Optional[int] = None, window: Optional[int] = None,
+                  min_parallel_pages: int = MIN_PARALLEL_PAGES) -> Iterator[Tuple[int, str]]:
+    """
+    Extract the text of a PDF page by page across a process pool.
+
+    Pages are yielded in order as soon as they and every page before them are done. At most `window`
+    pages are in flight at once, so memory stays bounded however long the document is.
+
+    :param source: A path, a file-like object or the PDF's bytes.
+    :param max_workers: Worker processes. Defaults to the number of CPUs.
+    :param window: Pages submitted ahead of the one being yielded. Defaults to 4 per worker.
+    :param min_parallel_pages: Documents shorter than this are extracted in the calling process.
+    :return: An iterator of (page_number, text), with page numbers starting at 1.
+    """
+    data = source if isinstance(source, bytes) else read_pdf_bytes(source)
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    count = len(reader.pages)
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, count))
+
+    if count < min_parallel_pages or max_workers == 1:
+        for i in range(count):
+            yield i + 1, reader.pages[i].extract_text() or ""
+        return
+
+    window = max(max_workers, window or max_workers * 4)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(data,)) as executor:
+        in_flight = deque()
+        next_page = 0
+        while next_page < count or in_flight:
+            while next_page < count and len(in_flight) < window:
+                in_flight.append(executor.submit(_extract_page, next_page))
+                next_page += 1
+            page_number = next_page - len(in_flight) + 1
+            yield page_number, in_flight.popleft().result()
+
+
+def chunk_pages(pages, text_splitter: RecursiveCharacterTextSplitter) -> Iterator[Tuple[str, dict]]:
+    """
+    Split a stream of (page_number, text) into chunks without joining the whole document first.
+
+    Text is split as pages arrive. The last chunk of each split may continue onto the next page, so it
+    is carried over and split again with it. Each chunk records the page it starts on.
+
+    :return: An iterator of (chunk_text, {"page": page_number}).
+    """
+    buffer = ""
+    # (offset in buffer, page number) for every page that starts inside the buffer
+    page_starts = []
+
+    def page_at(offset):
+        page = page_starts[0][1]
+        for start, number in page_starts:
+            if start > offset:
+                break
+            page = number
+        return page
+
+    def split_buffer():
+        # (offset, text) for each chunk. Chunks are in order and each starts after the previous one.
+        chunks, offset = [], -1
+        for doc in text_splitter.create_documents([buffer]):
+            found = buffer.find(doc.page_content, offset + 1)
+            offset = found if found >= 0 else offset + 1
+            chunks.append((offset, doc.page_content))
+        return chunks
+
+    for page_number, text in pages:
+        if not text:
+            continue
+        if buffer:
+            buffer += "\n"
+        page_starts.append((len(buffer), page_number))
+        buffer += text
+
+        chunks = split_buffer()
+        if len(chunks) < 2:
+            continue
+        # Emit everything except the last chunk, which is carried over to the next page
+        for start, chunk in chunks[:-1]:
+            yield chunk, {"page": page_at(start)}
+        carry_start = chunks[-1][0]
+        carry_page = page_at(carry_start)
+        buffer = buffer[carry_start:]
+        page_starts = [(max(0, start - carry_start), number) for start, number in page_starts
+                       if start >= carry_start or number == carry_page]
+
+    if buffer:
+        for start, chunk in split_buffer():
+            yield chunk, {"page": page_at(start)}
@@ -1,54 +1,268 @@
 # src/policy_agent.py
 
+import asyncio
+import threading
+import time
 from typing import List
 
+from src.context_assembly import DEFAULT_CONTEXT_TOKEN_BUDGET, ContextAssembler, raw_context
+from src.embedding_cache import EMBEDDING_MODEL, text_hash
+from src.lexical_index import DEFAULT_CONFIDENCE as DEFAULT_LEXICAL_CONFIDENCE, reciprocal_rank_fusion
+from src.metrics import record_context, record_embedding_call, record_vector_query
+from src.streaming import astream_openai_chat, emit_text, stream_openai_chat
+
+# Chunks sent to the model, and candidates taken from each retriever before fusing them
+RETRIEVAL_K = 3
+HYBRID_CANDIDATES = 6
+# How often to re-check that the lexical index covers the vector index, while it does not
+LEXICAL_COVERAGE_CHECK_SECONDS = 60.0
+
 class PolicyAgent:
     
-    def __init__(self, client, index):
+    def __init__(self, client, index, embedding_cache=None, answer_cache=None, async_client=None,
+                 lexical_index=None, lexical_confidence=DEFAULT_LEXICAL_CONFIDENCE,
+                 context_token_budget=DEFAULT_CONTEXT_TOKEN_BUDGET):
         
         # Initialize the PolicyAgent with an OpenAI client and a Pinecone Index
+        # The optional embedding cache (src/embedding_cache.py) saves the embedding call for repeated queries
+        # The optional answer cache (src/answer_cache.py) returns stored answers for similar questions
+        # The optional AsyncOpenAI client is used by the async methods (apolicy_agent and friends)
+        # The optional BM25 lexical index (src/lexical_index.py) makes retrieval hybrid; when it is at least
+        # lexical_confidence sure of its matches, the embedding call and vector query are skipped, once it
+        # covers the vector index (built alongside it or backfilled with python -m src.lexical_index)
+        # Retrieved chunks are merged, deduplicated and fitted to context_token_budget before they go into
+        # the prompt (src/context_assembly.py); None sends them as retrieved
         self.client = client
+        self.async_client = async_client
         self.index = index
+        self.embedding_cache = embedding_cache
+        self.answer_cache = answer_cache
+        self.lexical_index = lexical_index
+        self.lexical_confidence = lexical_confidence
+        self._counts_lock = threading.Lock()
+        self.retrieval_counts = {"lexical_only": 0, "hybrid": 0, "vector_only": 0}
+        self._lexical_covers = False
+        self._lexical_checked = None
+        self.context_assembler = None
+        if context_token_budget is not None:
+            self.context_assembler = ContextAssembler(context_token_budget)
+        # Set by salesCompAgent when speculative retrieval is on (see src/speculative.py)
+        self.speculative_retriever = None
+
+    def embed_query(self, query: str) -> List[float]:
+        # Return the query's embedding, from the cache when we have seen this exact text before
+        hash = text_hash(query)
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(hash, EMBEDDING_MODEL)
+            if cached is not None:
+                return cached
+        response = self.client.embeddings.create(model=EMBEDDING_MODEL, input=query)
+        record_embedding_call(EMBEDDING_MODEL, getattr(getattr(response, "usage", None), "total_tokens", 0))
+        embedding = response.data[0].embedding
+        if self.embedding_cache is not None:
+            self.embedding_cache.put(hash, EMBEDDING_MODEL, embedding)
+        return embedding
+
+    async def aembed_query(self, query: str) -> List[float]:
+        # Async version of embed_query
+        hash = text_hash(query)
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(hash, EMBEDDING_MODEL)
+            if cached is not None:
+                return cached
+        response = await self.async_client.embeddings.create(model=EMBEDDING_MODEL, input=query)
+        record_embedding_call(EMBEDDING_MODEL, getattr(getattr(response, "usage", None), "total_tokens", 0))
+        embedding = response.data[0].embedding
+        if self.embedding_cache is not None:
+            self.embedding_cache.put(hash, EMBEDDING_MODEL, embedding)
+        return embedding
+
+    def cached_query_embedding(self, query: str):
+        # The query's embedding if it is already in the cache, without calling the API
+        if self.embedding_cache is None:
+            return None
+        return self.embedding_cache.get(text_hash(query), EMBEDDING_MODEL)
+
+    def _count(self, kind: str):
+        with self._counts_lock:
+            self.retrieval_counts[kind] += 1
+
+    def lexical_covers_index(self) -> bool:
+        # Whether lexical matches may replace the vector query: an index missing older chunks would
+        # confidently answer from the chunks it has. Once it covers the vector index it stays trusted,
+        # since ingestion keeps both in step.
+        if self._lexical_covers:
+            return True
+        now = time.monotonic()
+        if self._lexical_checked is not None and now - self._lexical_checked < LEXICAL_COVERAGE_CHECK_SECONDS:
+            return False
+        self._lexical_checked = now
+        try:
+            self._lexical_covers = self.lexical_index.covers(self.index)
+        except Exception as e:
+            print(f"PolicyAgent: could not compare the lexical and vector indexes: {type(e).__name__}: {e}")
+        if not self._lexical_covers:
+            print("PolicyAgent: the lexical index has fewer chunks than the vector index, so every policy question "
+                  "also queries the vector index; run python -m src.lexical_index to backfill it")
+        return self._lexical_covers
+
+    def lexical_search(self, query: str):
+        # Lexical matches for the query, and the matches to use on their own if the index is confident enough
+        if self.lexical_index is None:
+            return None, None
+        lexical = self.lexical_index.search(query, top_k=HYBRID_CANDIDATES)
+        if self.lexical_confidence is not None and lexical.confidence >= self.lexical_confidence \
+                and self.lexical_covers_index():
+            self._count("lexical_only")
+            return lexical, lexical.confident_matches(RETRIEVAL_K)
+        return lexical, None
+
+    def fuse(self, vector_matches: List[dict], lexical) -> List[dict]:
+        # Combine vector and lexical rankings; without lexical matches the vector ranking is used as is
+        if lexical is None or not lexical.matches:
+            self._count("vector_only")
+            return vector_matches[:RETRIEVAL_K]
+        self._count("hybrid")
+        return reciprocal_rank_fusion([vector_matches, lexical.matches], top_k=RETRIEVAL_K)
+
+    def retrieve_matches(self, query: str, embedding: List[float] = None, lexical=None) -> List[dict]:
+        # Retrieve the top matches (with metadata) for the query from Pinecone, fused with the lexical matches
+        if embedding is None:
+            embedding = self.embed_query(query)
+        if lexical is None and self.lexical_index is not None:
+            lexical = self.lexical_index.search(query, top_k=HYBRID_CANDIDATES)
+        top_k = HYBRID_CANDIDATES if lexical is not None and lexical.matches else RETRIEVAL_K
+        start = time.perf_counter()
+        results = self.index.query(vector=embedding, top_k=top_k, namespace="", include_metadata=True)
+        record_vector_query(time.perf_counter() - start)
+        return self.fuse(results['matches'], lexical)
+
+    async def aretrieve_matches(self, query: str, embedding: List[float] = None, lexical=None) -> List[dict]:
+        # Async version of retrieve_matches. The index client is synchronous, so it runs in a worker thread.
+        if embedding is None:
+            embedding = await self.aembed_query(query)
+        if lexical is None and self.lexical_index is not None:
+            lexical = self.lexical_index.search(query, top_k=HYBRID_CANDIDATES)
+        top_k = HYBRID_CANDIDATES if lexical is not None and lexical.matches else RETRIEVAL_K
+        start = time.perf_counter()
+        results = await asyncio.to_thread(self.index.query, vector=embedding, top_k=top_k, namespace="",
+                                          include_metadata=True)
+        record_vector_query(time.perf_counter() - start)
+        return self.fuse(results['matches'], lexical)
+
+    def speculative_retrieve(self, query: str):
+        # Embedding and matches for a query, computed while the classifier is still running
+        lexical, matches = self.lexical_search(query)
+        if matches is not None:
+            return self.cached_query_embedding(query), matches
+        embedding = self.embed_query(query)
+        return embedding, self.retrieve_matches(query, embedding, lexical)
+
+    async def aspeculative_retrieve(self, query: str):
+        lexical, matches = self.lexical_search(query)
+        if matches is not None:
+            return self.cached_query_embedding(query), matches
+        embedding = await self.aembed_query(query)
+        return embedding, await self.aretrieve_matches(query, embedding, lexical)
 
     def retrieve_documents(self, query: str) -> List[str]:
         # Generate an embedding for the query and retrieve relevant documents from Pinecone.
-        embedding = self.client.embeddings.create(model="text-embedding-ada-002", input=query).data[0].embedding
-        results = self.index.query(vector=embedding, top_k=3, namespace="", include_metadata=True)
-        
-        retrieved_content = [r['metadata']['text'] for r in results['matches']]
+        retrieved_content = [r['metadata']['text'] for r in self.retrieve_matches(query)]
         return retrieved_content
 
-    def generate_response(self, retrieved_content: List[str], user_query: str) -> str:
-        # Generate a response using the retrieved content and the user's original query.
-        
+    def build_context(self, matches: List[dict]) -> str:
+        # The retrieved text for the prompt, assembled within the token budget; its size before and after is recorded
+        if self.context_assembler is None:
+            return raw_context(matches)
+        context = self.context_assembler.assemble(matches)
+        record_context(context.tokens_before, context.tokens_after)
+        return context.text
+
+    def build_messages(self, retrieved_content, user_query: str) -> List[dict]:
         # Construct the prompt to guide the language model in generating a response
+        # retrieved_content is the assembled context, or a list of chunk texts
         prompt_guidance = f"""
         I have retrieved the following information related to your query:
         {retrieved_content}
 
         Based on this, here is the guidance related to your question: {user_query}
         """
-        # Generate a response using the GPT-4 model, including system and user messages
-        llm_response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful and patient guide based in Silicon Valley."},
-                {"role": "user", "content": prompt_guidance}
-            ]
-        )
-        
-        # Extract and return the full response from the language model's output
-        full_response = llm_response.choices[0].message.content
+        return [
+            {"role": "system", "content": "You are a helpful and patient guide based in Silicon Valley."},
+            {"role": "user", "content": prompt_guidance}
+        ]
+
+    def generate_response(self, retrieved_content, user_query: str) -> str:
+        # Generate a response using the retrieved content and the user's original query.
+        # Tokens are streamed to the chat UI as they arrive (see src/streaming.py).
+        full_response = stream_openai_chat(self.client, "policy", model="gpt-4o-mini",
+                                           messages=self.build_messages(retrieved_content, user_query))
         return full_response
 
+    async def agenerate_response(self, retrieved_content, user_query: str) -> str:
+        # Async version of generate_response
+        full_response = await astream_openai_chat(self.async_client, "policy", model="gpt-4o-mini",
+                                                  messages=self.build_messages(retrieved_content, user_query))
+        return full_response
+
+    def cached_answer(self, query: str, embedding: List[float] = None):
+        # Return the policy node's state update for a cached answer, or None. Without an embedding
+        # (lexical-only retrieval) only a previous question with the same text matches.
+        if self.answer_cache is None:
+            return None
+        cached = self.answer_cache.lookup(embedding, question=query)
+        if cached is None:
+            return None
+        emit_text("policy", cached.answer)
+        return {
+            "lnode": "policy_agent",
+            "responseToUser": cached.answer,
+            "category": "policy"
+        }
+
+    def answer_generation(self):
+        # Document generation before retrieval, so a re-ingestion while the answer is written invalidates it
+        return self.answer_cache.generation() if self.answer_cache is not None else None
+
+    def store_answer(self, query: str, embedding: List[float], matches: List[dict], response: str, seconds: float,
+                     generation: int = None):
+        # Answers found without an embedding (lexical-only retrieval) are stored for exact-text lookups
+        if self.answer_cache is not None:
+            docnames = [r['metadata'].get('docname') for r in matches]
+            self.answer_cache.store(query, embedding, response, docnames, seconds, documents_generation=generation)
+
     def policy_agent(self, state: dict) -> dict:
         #Handle policy-related queries by retrieving relevant documents and generating a response.
         
+        query = state['initialMessage']
+
+        generation = self.answer_generation()
+        # Use the retrieval started speculatively alongside the classifier, if there is one
+        prefetched = None
+        if self.speculative_retriever is not None:
+            prefetched = self.speculative_retriever.take(state.get('speculationId'))
+        lexical = None
+        if prefetched:
+            embedding, matches = prefetched
+        else:
+            # Exact policy terms found with high confidence skip the embedding call and vector query
+            lexical, matches = self.lexical_search(query)
+            embedding = self.cached_query_embedding(query) if matches is not None else self.embed_query(query)
+
+        # Answer from the cache if a similar enough question was answered before
+        if (cached := self.cached_answer(query, embedding)) is not None:
+            return cached
+
         # Retrieve relevant documents based on the user's initial message
-        retrieved_content = self.retrieve_documents(state['initialMessage'])
+        start = time.perf_counter()
+        if matches is None:
+            matches = self.retrieve_matches(query, embedding, lexical)
+        retrieved_content = self.build_context(matches)
         
         # Generate a response using the retrieved documents and the user's initial message
-        full_response = self.generate_response(retrieved_content, state['initialMessage'])
+        full_response = self.generate_response(retrieved_content, query)
+
+        self.store_answer(query, embedding, matches, full_response, time.perf_counter() - start, generation)
         
         # Return the updated state with the generated response and the category set to 'policy'
         return {
@@ -56,3 +270,32 @@ class PolicyAgent:
             "responseToUser": full_response,
             "category": "policy"
         }
+
+    async def apolicy_agent(self, state: dict) -> dict:
+        # Async version of policy_agent
+        query = state['initialMessage']
+        generation = self.answer_generation()
+        prefetched = None
+        if self.speculative_retriever is not None:
+            prefetched = await self.speculative_retriever.atake(state.get('speculationId'))
+        lexical = None
+        if prefetched:
+            embedding, matches = prefetched
+        else:
+            lexical, matches = self.lexical_search(query)
+            embedding = self.cached_query_embedding(query) if matches is not None else await self.aembed_query(query)
+        if (cached := self.cached_answer(query, embedding)) is not None:
+            return cached
+
+        start = time.perf_counter()
+        if matches is None:
+            matches = await self.aretrieve_matches(query, embedding, lexical)
+        retrieved_content = self.build_context(matches)
+        full_response = await self.agenerate_response(retrieved_content, query)
+        self.store_answer(query, embedding, matches, full_response, time.perf_counter() - start, generation)
+
+        return {
+            "lnode": "policy_agent",
+            "responseToUser": full_response,
+            "category": "policy"
+        }
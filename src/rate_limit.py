@@ -0,0 +1,127 @@
+# src/rate_limit.py
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` units a minute, holding at most `capacity`.
+
+    Reservations may take the bucket below zero: the caller is told how long to wait until its share
+    has been refilled, so concurrent callers queue up in reservation order instead of polling, and a
+    request larger than the capacity still goes through once its cost has been paid for.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        :param per_minute: Refill rate (requests or tokens per minute).
+        :param capacity: Largest burst; defaults to one second's worth, since providers also enforce
+                         per-minute limits over shorter windows.
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take `amount` from the bucket.
+
+        :return: Seconds to wait before using it.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level -= amount
+            return max(0.0, -self.level / self.rate) if self.rate else 0.0
+
+    def adjust(self, amount: float):
+        """
+        Charge `amount` more (or refund it, if negative) once the real cost of a reservation is known.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level - amount)
+
+    def pause(self, seconds: float):
+        """
+        Hold back every caller for `seconds`, e.g. after the provider answered 429.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.level, -seconds * self.rate)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits, as API providers enforce them.
+
+    Callers reserve an estimate before a call (acquire/aacquire) and settle the difference once the
+    actual usage is known, so the limits hold on average without knowing token counts up front.
+    Either limit may be None to leave it unlimited.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        """
+        :param requests_per_minute: Request limit, or None.
+        :param tokens_per_minute: Token limit (prompt plus completion), or None.
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._stats_lock = threading.Lock()
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def reserve(self, requests: float = 1, tokens: float = 0) -> float:
+        """
+        :return: Seconds to wait before sending `requests` requests using about `tokens` tokens.
+        """
+        wait = 0.0
+        if self.requests is not None and requests:
+            wait = max(wait, self.requests.reserve(requests))
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            with self._stats_lock:
+                self.waits += 1
+                self.wait_seconds += wait
+        return wait
+
+    def acquire(self, requests: float = 1, tokens: float = 0):
+        wait = self.reserve(requests, tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, requests: float = 1, tokens: float = 0):
+        wait = self.reserve(requests, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def settle(self, requests: float = 0, tokens: float = 0):
+        """
+        Correct an earlier reservation by the difference between actual and estimated usage.
+        """
+        if self.requests is not None and requests:
+            self.requests.adjust(requests)
+        if self.tokens is not None and tokens:
+            self.tokens.adjust(tokens)
+
+    def pause(self, seconds: float):
+        """
+        Make every caller wait at least `seconds` before its next request, so one rate-limit response
+        slows the whole process down instead of each caller finding out with its own 429.
+        """
+        for bucket in (self.requests, self.tokens):
+            if bucket is not None:
+                bucket.pause(seconds)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {"waits": self.waits, "wait_seconds": round(self.wait_seconds, 3)}
@@ -0,0 +1,175 @@
+# src/runtime.py
+
+import hashlib
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from src.answer_cache import get_default_answer_cache
+from src.api_clients import get_default_clients
+from src.checkpoint import get_default_checkpointer
+from src.config import AgentConfig
+from src.contest_rules import get_default_rule_book
+from src.embedding_cache import get_default_cache
+from src.lexical_index import get_default_lexical_index
+from src.metrics import get_default_metrics
+from src.ticket_queue import get_default_ticket_queue, get_default_ticket_worker
+
+if TYPE_CHECKING:
+    from src.graph import salesCompAgent
+
+
+def build_sales_comp_agent(api_key: str, **kwargs) -> "salesCompAgent":
+    # The graph module (LangGraph and every sub-agent) is imported on the first build, not when a page
+    # imports the runtime
+    from src.graph import salesCompAgent
+    return salesCompAgent(api_key, **kwargs)
+
+
+class AgentRuntime:
+    """
+    Process-wide holder for a single salesCompAgent.
+
+    Building a salesCompAgent imports LangGraph, creates every sub-agent and compiles the StateGraph
+    (the OpenAI and Pinecone clients themselves are built on their first request). The runtime builds
+    it lazily on first use and then hands the same instance to every Streamlit session until the
+    configuration it was built from changes.
+    """
+
+    def __init__(self, factory=build_sales_comp_agent):
+        """
+        Initialize an empty runtime.
+
+        :param factory: Callable used to build the agent, called as factory(api_key, **kwargs).
+        """
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._agent = None
+        self._fingerprint = None
+        self.builds = 0
+        self.cache_hits = 0
+        self.last_build_seconds = 0.0
+        self.total_build_seconds = 0.0
+
+    @staticmethod
+    def fingerprint(api_key: str, settings: dict) -> str:
+        """
+        Hash the configuration the agent depends on, so secrets are never kept around in plain text.
+
+        :param api_key: The OpenAI API key.
+        :param settings: Any other configuration values the agent depends on.
+        :return: A hex digest identifying this configuration.
+        """
+        digest = hashlib.sha256(str(api_key).encode("utf-8"))
+        for key in sorted(settings):
+            digest.update(f"\0{key}={settings[key]}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_agent(self, api_key: str, settings: dict = None, **kwargs) -> "salesCompAgent":
+        """
+        Return the shared agent, building (or rebuilding) it if needed.
+
+        :param api_key: The OpenAI API key.
+        :param settings: Configuration values that should trigger a rebuild when they change.
+        :param kwargs: Extra keyword arguments forwarded to the factory on build.
+        :return: The shared salesCompAgent instance.
+        """
+        fingerprint = self.fingerprint(api_key, settings or {})
+
+        # Fast path: no lock needed to read a fully built agent
+        agent = self._agent
+        if agent is not None and self._fingerprint == fingerprint:
+            with self._lock:
+                self.cache_hits += 1
+            return agent
+
+        with self._lock:
+            # Another session may have built it while we were waiting for the lock
+            if self._agent is not None and self._fingerprint == fingerprint:
+                self.cache_hits += 1
+                return self._agent
+
+            start = time.perf_counter()
+            agent = self.factory(api_key, **kwargs)
+            elapsed = time.perf_counter() - start
+
+            self.builds += 1
+            self.last_build_seconds = elapsed
+            self.total_build_seconds += elapsed
+            self._agent = agent
+            self._fingerprint = fingerprint
+            print(f"AgentRuntime: built salesCompAgent in {elapsed:.3f}s (build #{self.builds})")
+            return agent
+
+    def reset(self):
+        """
+        Drop the shared agent so the next call to get_agent rebuilds it.
+        """
+        with self._lock:
+            self._agent = None
+            self._fingerprint = None
+
+    def stats(self) -> dict:
+        """
+        Report how often the shared agent was built and reused.
+
+        :return: A dictionary with build count, cache hits and build timings.
+        """
+        with self._lock:
+            return {
+                "builds": self.builds,
+                "cache_hits": self.cache_hits,
+                "last_build_seconds": round(self.last_build_seconds, 4),
+                "total_build_seconds": round(self.total_build_seconds, 4),
+            }
+
+
+# The single runtime shared by every Streamlit session in this process
+_runtime = AgentRuntime()
+
+
+def get_runtime() -> AgentRuntime:
+    return _runtime
+
+
+def get_agent(config: AgentConfig = None) -> "salesCompAgent":
+    """
+    Return the process-wide salesCompAgent for a configuration.
+
+    :param config: The configuration to build from. Defaults to the Streamlit secrets, for the Streamlit
+                   pages; other processes (src/server.py, CLIs) pass load_config() or their own.
+    """
+    config = config or AgentConfig.from_streamlit()
+    # METRICS_FILE exports the graph metrics (src/metrics.py) as JSON; METRICS_PORT serves them over HTTP
+    metrics = get_default_metrics()
+    if config.metrics_file:
+        metrics.export_path = config.metrics_file
+    if config.metrics_port:
+        metrics.serve(config.metrics_port)
+    # Conversations are stored in SQLite (src/checkpoint.py) unless CHECKPOINT_DB_PATH is "off"
+    checkpointer = None
+    if config.checkpoint_db_path:
+        checkpointer = get_default_checkpointer(config.checkpoint_db_path,
+                                                retention_days=config.checkpoint_retention_days)
+    # Policy retrieval is hybrid BM25 + vector unless LEXICAL_INDEX_PATH is "off" (src/lexical_index.py)
+    lexical_index = get_default_lexical_index(config.lexical_index_path) if config.lexical_index_path else None
+    # Tickets are queued locally and, when TICKET_ENDPOINT_URL is set, sent by a background worker
+    ticket_queue = get_default_ticket_queue(config.ticket_db_path or ":memory:")
+    ticket_worker = None
+    if config.ticket_endpoint_url:
+        ticket_worker = get_default_ticket_worker(ticket_queue, config.ticket_endpoint_url, config.ticket_endpoint_token)
+    # Every OpenAI call goes through the shared client layer: pooled connections, the account's
+    # rate limits, retries with backoff and a circuit breaker (src/api_clients.py)
+    clients = get_default_clients(config.openai_requests_per_minute, config.openai_tokens_per_minute)
+    return _runtime.get_agent(config.openai_api_key, config.as_settings(), config=config, clients=clients,
+                              embedding_cache=get_default_cache(), answer_cache=get_default_answer_cache(),
+                              fast_classifier_threshold=config.fast_classifier_threshold,
+                              fast_classifier_shadow_rate=config.fast_classifier_shadow_rate,
+                              fast_classifier_log=config.fast_classifier_log_path,
+                              history_token_budget=config.history_token_budget,
+                              speculative_retrieval=config.speculative_retrieval,
+                              checkpointer=checkpointer, lexical_index=lexical_index,
+                              lexical_confidence=config.lexical_confidence,
+                              context_token_budget=config.context_token_budget,
+                              ticket_queue=ticket_queue, ticket_worker=ticket_worker,
+                              contest_rules=get_default_rule_book(config.contest_rules_path))
@@ -0,0 +1,304 @@
+# src/server.py
+#
+# Headless HTTP API for the agent graph, so Slack bots, scripts or the Streamlit app can share one
+# worker process, and several workers can run behind a load balancer. Run from the repository root:
+#   python -m src.server --port 8080 --max-concurrency 16
+
+import argparse
+import hmac
+import json
+import re
+import threading
+import uuid
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from src.config import load_config
+
+# Thread IDs are generated as uuid4 hex; anything else a client picks must stay within this shape
+THREAD_ID_PATTERN = re.compile(r"[A-Za-z0-9_.:-]{1,128}")
+# User IDs identify the rep across conversations (ticket dedup); typically an email address
+USER_ID_PATTERN = re.compile(r"[A-Za-z0-9_.:@+-]{1,256}")
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # The socketserver default backlog of 5 resets connections under bursts; excess load should
+    # reach the handler and get a 503 instead
+    request_queue_size = 256
+    daemon_threads = True
+
+
+class AgentServer:
+    """
+    Serve one shared salesCompAgent over HTTP.
+
+    Endpoints:
+    - POST /chat with {"message": "...", "thread_id": "..." (optional), "user_id": "..." (optional),
+      "stream": false}. The user_id lets repeated ticket reports from one rep merge across threads. Returns
+      {"thread_id", "response", "category"}; with "stream": true, newline-delimited JSON with one
+      {"token": ...} per generated piece of text and the same final object at the end. A turn that
+      fails after streaming has started ends with {"error", "thread_id"} instead.
+    - GET /threads/<thread_id>: the stored conversation.
+    - GET /healthz: capacity and load.
+    - GET /metrics: the graph metrics in Prometheus format (src/metrics.py).
+
+    With an api_token, /chat and /threads require an "Authorization: Bearer <api_token>" header. A
+    thread ID is all it takes to read a conversation, and it is also in the Streamlit page URL, so
+    a server reachable by anyone but the front end should always have a token.
+
+    Conversation state lives in the agent's checkpointer, keyed on thread_id, so any worker sharing
+    the checkpoint database can serve any turn. At most `max_concurrency` turns run at once; a request
+    that cannot start within `queue_timeout_seconds` is rejected with 503 and Retry-After, so an
+    overloaded worker sheds load instead of queueing without bound.
+    """
+
+    def __init__(self, agent, host: str = "127.0.0.1", port: int = 8080, max_concurrency: int = 16,
+                 queue_timeout_seconds: float = 2.0, max_body_bytes: int = 64 * 1024, api_token: str = None):
+        """
+        :param agent: The shared salesCompAgent (see src/runtime.py get_agent).
+        :param host: Interface to listen on.
+        :param port: Port to listen on (0 picks a free one).
+        :param max_concurrency: Turns allowed to run at the same time.
+        :param queue_timeout_seconds: How long a request may wait for a free slot before it gets a 503.
+        :param max_body_bytes: Larger request bodies are rejected with 413.
+        :param api_token: Shared secret required as a bearer token on /chat and /threads. None leaves them open.
+        """
+        self.agent = agent
+        self.api_token = api_token
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.max_body_bytes = max_body_bytes
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        # One lock per conversation, so two requests for the same thread never interleave their turns
+        self._thread_locks = weakref.WeakValueDictionary()
+        self.in_flight = 0
+        self.served = 0
+        self.rejected = 0
+        self.failed = 0
+        self.httpd = _HTTPServer((host, port), _make_handler(self))
+
+    @property
+    def address(self):
+        return self.httpd.server_address
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"status": "ok", "in_flight": self.in_flight, "capacity": self.max_concurrency,
+                    "served": self.served, "rejected": self.rejected, "failed": self.failed}
+
+    def _thread_lock(self, thread_id: str) -> threading.Lock:
+        with self._lock:
+            lock = self._thread_locks.get(thread_id)
+            if lock is None:
+                lock = threading.Lock()
+                self._thread_locks[thread_id] = lock
+            return lock
+
+    def acquire(self) -> bool:
+        """
+        Take a slot for one turn, waiting at most queue_timeout_seconds.
+        """
+        if not self._slots.acquire(timeout=self.queue_timeout_seconds):
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release(self, failed: bool = False):
+        with self._lock:
+            self.in_flight -= 1
+            if failed:
+                self.failed += 1
+            else:
+                self.served += 1
+        self._slots.release()
+
+    def run_turn(self, message: str, thread_id: str, user_id: str = None):
+        """
+        Run one turn, yielding ("token", text) as text is generated and finally ("final", response).
+        The caller must hold a slot (see acquire).
+        """
+        config = {"configurable": {"thread_id": thread_id}}
+        if user_id:
+            config["configurable"]["user_id"] = user_id
+        # The checkpointer (if any) holds the earlier turns; without one the turn is answered on its own
+        history = [{"role": "user", "content": message}]
+        with self._thread_lock(thread_id):
+            final = {}
+            for kind, payload in self.agent.stream_tokens(self.agent.turn_input(message, history), config):
+                if kind == "token":
+                    yield kind, payload
+                else:
+                    final = payload
+        yield "final", {"thread_id": thread_id, "response": final.get("responseToUser", ""),
+                        "category": final.get("category")}
+
+    def authorized(self, header: str) -> bool:
+        """
+        Check an Authorization header against the api_token.
+        """
+        if self.api_token is None:
+            return True
+        scheme, _, token = (header or "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), self.api_token.encode())
+
+    def serve_forever(self):
+        host, port = self.address[:2]
+        print(f"AgentServer: listening on http://{host}:{port} (max {self.max_concurrency} concurrent turns)")
+        if self.api_token is None:
+            print("AgentServer: no API token set, so anyone who can reach this address can read any conversation")
+        self.httpd.serve_forever()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _make_handler(server: AgentServer):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _send_json(self, status: int, body: dict, headers: dict = None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _authorized(self) -> bool:
+            if server.authorized(self.headers.get("Authorization")):
+                return True
+            self._send_json(401, {"error": "missing or invalid bearer token"}, {"WWW-Authenticate": "Bearer"})
+            return False
+
+        def do_GET(self):
+            if self.path == "/healthz":
+                self._send_json(200, server.stats())
+            elif self.path == "/metrics":
+                data = server.agent.metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            elif self.path.startswith("/threads/"):
+                if not self._authorized():
+                    return
+                thread_id = unquote(self.path[len("/threads/"):])
+                if not THREAD_ID_PATTERN.fullmatch(thread_id):
+                    self._send_json(400, {"error": "invalid thread_id"})
+                    return
+                messages = server.agent.conversation({"configurable": {"thread_id": thread_id}})
+                self._send_json(200, {"thread_id": thread_id, "messages": messages})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/chat":
+                self._send_json(404, {"error": "not found"})
+                return
+            if not self._authorized():
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > server.max_body_bytes:
+                self._send_json(413, {"error": f"request body larger than {server.max_body_bytes} bytes"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                message = str(payload["message"]).strip()
+            except (ValueError, KeyError, TypeError):
+                self._send_json(400, {"error": 'expected a JSON body with a "message"'})
+                return
+            if not message:
+                self._send_json(400, {"error": "message is empty"})
+                return
+            thread_id = str(payload.get("thread_id") or uuid.uuid4().hex)
+            if not THREAD_ID_PATTERN.fullmatch(thread_id):
+                self._send_json(400, {"error": "invalid thread_id"})
+                return
+            user_id = payload.get("user_id")
+            if user_id is not None and not USER_ID_PATTERN.fullmatch(str(user_id)):
+                self._send_json(400, {"error": "invalid user_id"})
+                return
+
+            self._streaming = False
+            if not server.acquire():
+                self._send_json(503, {"error": "server busy, retry shortly"}, {"Retry-After": "1"})
+                return
+            failed = False
+            try:
+                if payload.get("stream"):
+                    self._stream(message, thread_id, user_id)
+                else:
+                    final = {}
+                    for kind, value in server.run_turn(message, thread_id, user_id):
+                        if kind == "final":
+                            final = value
+                    self._send_json(200, final)
+            except Exception as e:
+                failed = True
+                print(f"AgentServer: turn failed for thread {thread_id}: {type(e).__name__}: {e}")
+                if not self.wfile.closed:
+                    error = {"error": "internal error", "thread_id": thread_id}
+                    try:
+                        if self._streaming:
+                            # The 200 and part of the body are already out, so end the stream with the error
+                            self.wfile.write(json.dumps(error).encode("utf-8") + b"\n")
+                            self.wfile.flush()
+                        else:
+                            self._send_json(500, error)
+                    except OSError:
+                        pass
+                self.close_connection = True
+            finally:
+                server.release(failed)
+
+        def _stream(self, message: str, thread_id: str, user_id: str = None):
+            # Newline-delimited JSON; the connection is closed at the end instead of sending a length
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self._streaming = True
+            for kind, value in server.run_turn(message, thread_id, user_id):
+                line = {"token": value} if kind == "token" else value
+                self.wfile.write(json.dumps(line).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            self.close_connection = True
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the sales comp agent over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-concurrency", type=int, default=16, help="turns allowed to run at once")
+    parser.add_argument("--queue-timeout", type=float, default=2.0,
+                        help="seconds a request may wait for a free slot before getting a 503")
+    args = parser.parse_args()
+
+    from src.runtime import get_agent
+    # .streamlit/secrets.toml, overridden by environment variables
+    config = load_config()
+    agent = get_agent(config)
+    server = AgentServer(agent, host=args.host, port=args.port, max_concurrency=args.max_concurrency,
+                         queue_timeout_seconds=args.queue_timeout, api_token=config.agent_server_token)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# src/speculative.py
+
+import asyncio
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+
+class SpeculativeRetriever:
+    """
+    Runs policy retrieval (query embedding + vector query) while the classifier is still deciding.
+
+    The classifier calls start() and puts the returned key in the graph state. If the route is
+    "policy", the policy node calls take() to collect the prefetched result; otherwise the router
+    calls discard() and the work is counted as wasted.
+    """
+
+    def __init__(self, policy_agent, max_workers: int = 8, max_age_seconds: float = 120.0):
+        """
+        :param policy_agent: The PolicyAgent whose speculative_retrieve / aspeculative_retrieve are run.
+        :param max_workers: Threads available for speculative retrieval in the sync path.
+        :param max_age_seconds: Speculations never collected (e.g. a failed turn) are dropped after this long.
+        """
+        self.policy_agent = policy_agent
+        self.max_age_seconds = max_age_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative")
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.used = 0
+        self.wasted = 0
+        self.wasted_seconds = 0.0
+
+    def _timed(self, fn, query):
+        start = time.perf_counter()
+        result = fn(query)
+        return result, time.perf_counter() - start
+
+    async def _atimed(self, query):
+        start = time.perf_counter()
+        result = await self.policy_agent.aspeculative_retrieve(query)
+        return result, time.perf_counter() - start
+
+    def _register(self, future) -> str:
+        key = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            stale = [k for k, (_, created) in self._pending.items() if now - created > self.max_age_seconds]
+            stale = [self._pending.pop(k)[0] for k in stale]
+            self._pending[key] = (future, now)
+            self.started += 1
+        for old in stale:
+            self._forget(old)
+        return key
+
+    def start(self, query: str) -> str:
+        """
+        Start retrieval for a query in a worker thread.
+
+        :return: The key to pass to take() or discard().
+        """
+        # Run in a copy of the caller's context so the work is attributed to this turn's metrics
+        context = contextvars.copy_context()
+        return self._register(self._executor.submit(context.run, self._timed, self.policy_agent.speculative_retrieve,
+                                                    query))
+
+    def astart(self, query: str) -> str:
+        """
+        Start retrieval for a query as a task on the running event loop.
+        """
+        return self._register(asyncio.ensure_future(self._atimed(query)))
+
+    def _pop(self, key: Optional[str]):
+        if not key:
+            return None
+        with self._lock:
+            entry = self._pending.pop(key, None)
+        return entry[0] if entry else None
+
+    def take(self, key: Optional[str]):
+        """
+        Collect a speculative result, waiting for it if it is still running.
+
+        :return: (embedding, matches), or None if there is nothing to collect or it failed.
+        """
+        future = self._pop(key)
+        if future is None or not isinstance(future, Future):
+            return None
+        try:
+            result, _ = future.result()
+        except Exception as e:
+            print(f"speculative retrieval failed: {e}")
+            return None
+        with self._lock:
+            self.used += 1
+        return result
+
+    async def atake(self, key: Optional[str]):
+        """
+        Async version of take().
+        """
+        future = self._pop(key)
+        if future is None:
+            return None
+        try:
+            result, _ = await (asyncio.wrap_future(future) if isinstance(future, Future) else future)
+        except Exception as e:
+            print(f"speculative retrieval failed: {e}")
+            return None
+        with self._lock:
+            self.used += 1
+        return result
+
+    def _forget(self, future):
+        # Count a speculation whose result will never be used; its run time is wasted work
+        def account(done):
+            if done.cancelled() or done.exception() is not None:
+                return
+            with self._lock:
+                self.wasted_seconds += done.result()[1]
+
+        with self._lock:
+            self.wasted += 1
+        future.add_done_callback(account)
+
+    def discard(self, key: Optional[str]):
+        """
+        Drop a speculative result because the turn was not routed to the policy agent.
+        """
+        future = self._pop(key)
+        if future is not None:
+            self._forget(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "started": self.started,
+                "used": self.used,
+                "wasted": self.wasted,
+                "wasted_seconds": round(self.wasted_seconds, 4),
+                "pending": len(self._pending),
+            }
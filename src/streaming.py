@@ -0,0 +1,136 @@
+# src/streaming.py
+
+import statistics
+import threading
+from collections import defaultdict
+from typing import List
+
+from src.metrics import record_llm_call
+
+
+def _writer():
+    # LangGraph's custom stream writer for the running node, or a no-op outside a graph run
+    try:
+        from langgraph.config import get_stream_writer
+        return get_stream_writer()
+    except Exception:
+        return lambda chunk: None
+
+
+def emit_text(node: str, text: str):
+    """
+    Send a piece of generated text to anyone streaming the graph with stream_mode="custom".
+    """
+    if text:
+        _writer()({"node": node, "token": text})
+
+
+def stream_chat_model(model, messages, node: str) -> str:
+    """
+    Generate with a LangChain chat model, emitting tokens as they arrive.
+
+    :return: The full generated text.
+    """
+    writer = _writer()
+    parts: List[str] = []
+    for chunk in model.stream(messages):
+        text = chunk.content if isinstance(chunk.content, str) else ""
+        if text:
+            parts.append(text)
+            writer({"node": node, "token": text})
+    return "".join(parts)
+
+
+def _record_usage(model: str, usage):
+    # The final chunk of a stream requested with include_usage carries the token counts
+    record_llm_call(model, getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0)
+
+
+def stream_openai_chat(client, node: str, **kwargs) -> str:
+    """
+    Generate with the OpenAI chat completions API, emitting tokens as they arrive.
+
+    :param kwargs: Arguments for client.chat.completions.create (model, messages, ...).
+    :return: The full generated text.
+    """
+    writer = _writer()
+    parts: List[str] = []
+    usage = None
+    for chunk in client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **kwargs):
+        usage = getattr(chunk, "usage", None) or usage
+        if not chunk.choices:
+            continue
+        text = chunk.choices[0].delta.content
+        if text:
+            parts.append(text)
+            writer({"node": node, "token": text})
+    _record_usage(kwargs.get("model"), usage)
+    return "".join(parts)
+
+
+async def astream_chat_model(model, messages, node: str) -> str:
+    """
+    Async version of stream_chat_model.
+    """
+    writer = _writer()
+    parts: List[str] = []
+    async for chunk in model.astream(messages):
+        text = chunk.content if isinstance(chunk.content, str) else ""
+        if text:
+            parts.append(text)
+            writer({"node": node, "token": text})
+    return "".join(parts)
+
+
+async def astream_openai_chat(async_client, node: str, **kwargs) -> str:
+    """
+    Async version of stream_openai_chat, for an AsyncOpenAI client.
+    """
+    writer = _writer()
+    parts: List[str] = []
+    usage = None
+    async for chunk in await async_client.chat.completions.create(stream=True, stream_options={"include_usage": True},
+                                                                  **kwargs):
+        usage = getattr(chunk, "usage", None) or usage
+        if not chunk.choices:
+            continue
+        text = chunk.choices[0].delta.content
+        if text:
+            parts.append(text)
+            writer({"node": node, "token": text})
+    _record_usage(kwargs.get("model"), usage)
+    return "".join(parts)
+
+
+class TTFTRecorder:
+    """
+    Records time-to-first-token per node, measured from the start of the user's turn.
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self._samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, node: str, seconds: float):
+        with self._lock:
+            samples = self._samples[node]
+            samples.append(seconds)
+            if len(samples) > self.max_samples:
+                del samples[0]
+
+    def stats(self) -> dict:
+        """
+        :return: Sample count, mean and median time-to-first-token for every node.
+        """
+        with self._lock:
+            return {node: {"count": len(s), "mean_seconds": round(statistics.fmean(s), 4),
+                           "p50_seconds": round(statistics.median(s), 4)}
+                    for node, s in self._samples.items() if s}
+
+
+_recorder = TTFTRecorder()
+
+
+def get_ttft_recorder() -> TTFTRecorder:
+    return _recorder
@@ -1,56 +1,107 @@
 # src/ticket_agent.py
 
-from langchain_core.messages import SystemMessage, HumanMessage  # Import necessary message classes
+import asyncio
+
+from src.create_llm_message import create_llm_message
+from src.streaming import emit_text
+from src.ticket_queue import TicketFields, TicketQueue
+
+EXTRACTION_PROMPT = """
+You are a sales operations assistant filing a support ticket for the user. From the conversation,
+fill in the ticket:
+- summary: one line naming the problem
+- description: what the user reported, keeping every figure, date, deal and account they mentioned
+- issue_type: payout_error, data_correction, access, plan_question or other
+- priority: high if the user's pay is wrong or late, low for general questions, otherwise normal
+- deal_id and amount: only if the user gave them. Do not guess.
+"""
+
 
 class TicketAgent:
-    
-    def __init__(self, model):
+
+    def __init__(self, model, queue: TicketQueue = None, worker=None, history_manager=None):
         """
-        Initialize the TicketAgent with a ChatOpenAI model.
-        
-        :param model: An instance of the ChatOpenAI model used for generating responses.
+        Initialize the TicketAgent with a ChatOpenAI model and the local ticket queue.
+
+        :param model: An instance of the ChatOpenAI model used for extracting the ticket fields.
+        :param queue: TicketQueue (src/ticket_queue.py) the tickets are written to. Defaults to an in-memory queue.
+        :param worker: Optional TicketWorker sending queued tickets to the ticketing system; it is notified
+                       of every new ticket. Without one, tickets stay in the queue until sent by other means.
+        :param history_manager: Optional HistoryManager that keeps the conversation within a token budget.
         """
         self.model = model
+        self.queue = queue if queue is not None else TicketQueue(":memory:")
+        self.worker = worker
+        self.history_manager = history_manager
 
-    def generate_ticket_response(self, user_query: str) -> str:
-        """
-        Generate a response for ticket-related queries using the ChatOpenAI model.
-        
-        :param user_query: The original query from the user.
-        :return: A string response generated by the language model.
-        """
-        ticket_prompt = f"""
-        You are a Sales Commissions expert. Users will ask you about what their commission
-        will be for a particular deal. You can assume their on-target incentive to be $100000
-        and their annual quota to be $2000000. Also note that Commission is equal to on-target
-        incentive divided by annual quota. 
-        
-        Please provide user commission as well as explain how you computed it.      
-        """
-        
-        # Generate a response using the ChatOpenAI model's invoke method
-        llm_response = self.model.invoke([
-            SystemMessage(content=ticket_prompt),
-            HumanMessage(content=user_query)
-        ])
-        
-        # Extract the response content
-        full_response = llm_response.content
-        return full_response
-
-    def ticket_agent(self, state: dict) -> dict:
-        """
-        Handle ticket-related queries by generating a response using the ChatOpenAI model.
-        
-        :param state: A dictionary containing the state of the current conversation, including the user's initial message.
-        :return: A dictionary with the updated state, including the response and the node category.
+    def extraction_messages(self, session_history) -> list:
+        """
+        Build the messages asking the model for the ticket fields.
+        """
+        return create_llm_message(EXTRACTION_PROMPT, session_history, self.history_manager)
+
+    def extract_ticket(self, session_history) -> TicketFields:
+        """
+        Extract the ticket fields from the conversation with a single structured-output call.
+        """
+        return self.model.with_structured_output(TicketFields).invoke(self.extraction_messages(session_history))
+
+    async def aextract_ticket(self, session_history) -> TicketFields:
+        # Async version of extract_ticket. Building the messages may summarize history, so it runs in a thread.
+        abc = await asyncio.to_thread(self.extraction_messages, session_history)
+        return await self.model.with_structured_output(TicketFields).ainvoke(abc)
+
+    @staticmethod
+    def reporter(config) -> tuple:
+        # (reporter, thread_id): the caller's user_id when it passes one, otherwise the conversation
+        configurable = (config or {}).get("configurable", {})
+        thread_id = configurable.get("thread_id")
+        return str(configurable.get("user_id") or thread_id or "anonymous"), thread_id
+
+    def queue_ticket(self, fields: TicketFields, config) -> dict:
+        """
+        Queue the ticket (or merge it into the reporter's matching open ticket) and build the node's state update.
+        The ticketing system is called later by the worker, so the turn does not wait for it.
         """
-        # Generate a response based on the user's initial message
-        full_response = self.generate_ticket_response(state['initialMessage'])
-        
-        # Return the updated state with the generated response and the category set to 'ticket'
+        reporter, thread_id = self.reporter(config)
+        ticket, merged = self.queue.enqueue(reporter, fields.model_dump(), thread_id)
+        if self.worker is not None:
+            self.worker.notify()
+        if merged:
+            response = (f"This looks like the issue you already reported in ticket #{ticket.id} "
+                        f"(\"{ticket.fields.get('summary')}\"), so I've added the new details to it.")
+        else:
+            response = (f"I've logged ticket #{ticket.id} (\"{fields.summary}\"). "
+                        "Sales operations will follow up with you.")
+        print(f"ticket #{ticket.id} {'merged' if merged else 'queued'} for {reporter}")
         return {
-            "lnode": "initial_classifier", 
-            "responseToUser": "ServiceNow email address placeholder",
+            "lnode": "ticket_agent",
+            "responseToUser": response,
             "category": "ticket"
         }
+
+    @staticmethod
+    def session_history(state: dict) -> list:
+        # The conversation, or just the request when the node is called without one
+        return state.get('sessionHistory') or [{"role": "user", "content": state['initialMessage']}]
+
+    def ticket_agent(self, state: dict, config=None) -> dict:
+        """
+        Handle ticket requests: extract the ticket fields and queue the ticket.
+
+        :param state: A dictionary containing the state of the current conversation, including the session history.
+        :param config: The graph's runnable config, whose thread_id (or user_id) identifies the reporter.
+        :return: A dictionary with the updated state, including the response and the node category.
+        """
+        result = self.queue_ticket(self.extract_ticket(self.session_history(state)), config)
+        emit_text("ticket", result["responseToUser"])
+        return result
+
+    async def aticket_agent(self, state: dict, config=None) -> dict:
+        """
+        Async version of ticket_agent.
+        """
+        fields = await self.aextract_ticket(self.session_history(state))
+        result = await asyncio.to_thread(self.queue_ticket, fields, config)
+        emit_text("ticket", result["responseToUser"])
+        return result
@@ -0,0 +1,521 @@
+# src/ticket_queue.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from src.defaults import DEFAULT_TICKET_DB_PATH
+from src.lexical_index import tokenize
+
+# Reports from the same rep this similar (Jaccard over normalized words) and this recent merge into one ticket
+DEFAULT_DUPLICATE_THRESHOLD = 0.5
+DEFAULT_DUPLICATE_WINDOW_DAYS = 7
+
+
+class TicketFields(BaseModel):
+    """
+    The fields of a support ticket, as extracted from the conversation.
+    """
+    summary: str = Field(description="One-line summary of the issue")
+    description: str = Field(description="What the user reported, with every detail they gave")
+    issue_type: Literal["payout_error", "data_correction", "access", "plan_question", "other"] = Field(
+        "other", description="Kind of issue")
+    priority: Literal["low", "normal", "high"] = Field("normal", description="high if pay is wrong or late")
+    deal_id: Optional[str] = Field(None, description="Deal or opportunity ID the issue is about, if given")
+    amount: Optional[float] = Field(None, description="Amount in dollars the issue is about, if given")
+
+
+@dataclass
+class QueuedTicket:
+    """
+    A ticket in the local queue.
+    """
+    id: int
+    reporter: str
+    thread_id: Optional[str]
+    fields: dict
+    status: str
+    reports: int
+    attempts: int
+    external_id: Optional[str]
+    last_error: Optional[str]
+    created_at: float
+    updated_at: float
+
+    def payload(self) -> dict:
+        # What the ticketing endpoint receives. correlation_id lets it ignore a batch sent twice.
+        return dict(self.fields, correlation_id=str(self.id), reporter=self.reporter, thread_id=self.thread_id,
+                    reports=self.reports, created_at=self.created_at)
+
+
+def similarity(a: dict, b: dict) -> float:
+    """
+    How alike two tickets' fields are: Jaccard similarity of the normalized words of their summary and
+    description. Tickets about different deals are never alike.
+    """
+    if a.get("deal_id") and b.get("deal_id") and a["deal_id"] != b["deal_id"]:
+        return 0.0
+    words_a = set(tokenize(f"{a.get('summary', '')} {a.get('description', '')}"))
+    words_b = set(tokenize(f"{b.get('summary', '')} {b.get('description', '')}"))
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+class TicketQueue:
+    """
+    Durable local queue of support tickets in SQLite (WAL mode).
+
+    Tickets are queued by the ticket agent and sent by a TicketWorker, so a ticket turn never waits for
+    the ticketing system. A report similar enough to an open ticket from the same reporter is merged
+    into it instead of creating another one.
+
+    Statuses: queued -> sending -> submitted, or back to queued with a retry time after a failed
+    submission, or failed once max_attempts is reached.
+    """
+
+    def __init__(self, path: str = DEFAULT_TICKET_DB_PATH, duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+                 duplicate_window_days: float = DEFAULT_DUPLICATE_WINDOW_DAYS, lease_seconds: float = 300.0):
+        """
+        :param path: SQLite database file, or ":memory:" for a throwaway queue.
+        :param duplicate_threshold: Similarity (see similarity) above which a report merges into an open ticket.
+        :param duplicate_window_days: Only tickets updated this recently are merge candidates.
+        :param lease_seconds: Tickets left "sending" for longer than this (e.g. by a crashed worker) are sent again.
+        """
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.duplicate_threshold = duplicate_threshold
+        self.duplicate_window_seconds = duplicate_window_days * 86400
+        self.lease_seconds = lease_seconds
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tickets (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                reporter TEXT NOT NULL,
+                thread_id TEXT,
+                fields TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                reports INTEGER NOT NULL DEFAULT 1,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                external_id TEXT,
+                last_error TEXT,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tickets_reporter ON tickets (reporter, updated_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tickets_status ON tickets (status, next_attempt_at)")
+
+    @staticmethod
+    def _ticket(row) -> QueuedTicket:
+        id, reporter, thread_id, fields, status, reports, attempts, external_id, last_error, created, updated = row
+        return QueuedTicket(id, reporter, thread_id, json.loads(fields), status, reports, attempts, external_id,
+                            last_error, created, updated)
+
+    _COLUMNS = ("id, reporter, thread_id, fields, status, reports, attempts, external_id, last_error, "
+                "created_at, updated_at")
+
+    def find_duplicate(self, reporter: str, fields: dict) -> Optional[QueuedTicket]:
+        """
+        The reporter's open ticket most similar to these fields, if any is similar enough.
+        """
+        since = time.time() - self.duplicate_window_seconds
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {self._COLUMNS} FROM tickets WHERE reporter = ? AND updated_at >= ? "
+                                      "AND status != 'failed' ORDER BY updated_at DESC LIMIT 50",
+                                      (reporter, since)).fetchall()
+        best, best_score = None, self.duplicate_threshold
+        for ticket in map(self._ticket, rows):
+            score = similarity(ticket.fields, fields)
+            if score >= best_score:
+                best, best_score = ticket, score
+        return best
+
+    def enqueue(self, reporter: str, fields: dict, thread_id: str = None) -> tuple:
+        """
+        Queue a ticket, or merge it into the reporter's matching open ticket.
+
+        :return: (QueuedTicket, merged). merged is True when the report was added to an existing ticket.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                duplicate = self.find_duplicate(reporter, fields)
+                if duplicate is not None:
+                    merged = dict(duplicate.fields)
+                    if fields.get("description") and fields["description"] not in merged.get("description", ""):
+                        merged["description"] = f"{merged.get('description', '')}\n\nFollow-up: {fields['description']}"
+                    for key, value in fields.items():
+                        if merged.get(key) in (None, "") and value not in (None, ""):
+                            merged[key] = value
+                    if fields.get("priority") == "high":
+                        merged["priority"] = "high"
+                    # A submitted ticket is sent again so the ticketing system sees the follow-up
+                    self._conn.execute("UPDATE tickets SET fields = ?, reports = reports + 1, updated_at = ?, "
+                                       "status = CASE WHEN status = 'sending' THEN status ELSE 'queued' END, "
+                                       "next_attempt_at = 0 WHERE id = ?",
+                                       (json.dumps(merged), now, duplicate.id))
+                    id = duplicate.id
+                else:
+                    id = self._conn.execute("INSERT INTO tickets (reporter, thread_id, fields, created_at, updated_at) "
+                                            "VALUES (?, ?, ?, ?, ?)",
+                                            (reporter, thread_id, json.dumps(fields), now, now)).lastrowid
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(id), duplicate is not None
+
+    def get(self, id: int) -> Optional[QueuedTicket]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {self._COLUMNS} FROM tickets WHERE id = ?", (id,)).fetchone()
+        return self._ticket(row) if row else None
+
+    def claim(self, limit: int) -> List[QueuedTicket]:
+        """
+        Mark up to `limit` tickets that are due as "sending" and return them.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    f"SELECT {self._COLUMNS} FROM tickets WHERE (status = 'queued' AND next_attempt_at <= ?) "
+                    "OR (status = 'sending' AND next_attempt_at <= ?) ORDER BY id LIMIT ?",
+                    (now, now - self.lease_seconds, limit)).fetchall()
+                self._conn.executemany("UPDATE tickets SET status = 'sending', next_attempt_at = ? WHERE id = ?",
+                                       [(now, row[0]) for row in rows])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [self._ticket(row) for row in rows]
+
+    def mark_submitted(self, external_ids: Dict[int, str], sent_at: float):
+        """
+        Record the ticketing system's IDs. Tickets merged with a new report since `sent_at` are queued again.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE tickets SET external_id = ?, last_error = NULL, attempts = 0, "
+                "status = CASE WHEN updated_at > ? THEN 'queued' ELSE 'submitted' END WHERE id = ?",
+                [(external_id, sent_at, id) for id, external_id in external_ids.items()])
+
+    def mark_failed(self, ids: List[int], error: str, backoff_seconds: float, max_attempts: int):
+        """
+        Return tickets to the queue after a failed submission, with exponential backoff, or give up on them.
+        """
+        now = time.time()
+        with self._lock:
+            for id in ids:
+                self._conn.execute(
+                    "UPDATE tickets SET attempts = attempts + 1, last_error = ?, "
+                    "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'queued' END, "
+                    "next_attempt_at = ? + ? * (1 << MIN(attempts, 10)) WHERE id = ?",
+                    (error, max_attempts, now, backoff_seconds, id))
+
+    def tickets(self, status: str = None, limit: int = 100) -> List[QueuedTicket]:
+        query = f"SELECT {self._COLUMNS} FROM tickets"
+        params = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id DESC LIMIT ?", params + (limit,)).fetchall()
+        return [self._ticket(row) for row in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM tickets GROUP BY status").fetchall())
+            reports = self._conn.execute("SELECT COALESCE(SUM(reports), 0) FROM tickets").fetchone()[0]
+        return {"tickets": sum(counts.values()), "reports": reports, **counts}
+
+
+class HttpTicketEndpoint:
+    """
+    Sends batches of tickets to a ticketing service over HTTP.
+
+    POSTs {"tickets": [payload, ...]} as JSON and expects {"tickets": [{"correlation_id", "id"}, ...]} back,
+    the shape LocalTicketServer implements. Another ticketing system plugs in as any object with the same
+    submit method.
+    """
+
+    def __init__(self, url: str, token: str = None, timeout_seconds: float = 10.0):
+        self.url = url
+        self.token = token
+        self.timeout_seconds = timeout_seconds
+
+    def submit(self, tickets: List[dict]) -> Dict[str, str]:
+        """
+        :return: The ticketing system's ID for each accepted ticket, keyed on its correlation_id.
+        """
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(self.url, data=json.dumps({"tickets": tickets}).encode("utf-8"),
+                                         headers=headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout_seconds) as response:
+            body = json.loads(response.read())
+        return {str(t["correlation_id"]): str(t["id"]) for t in body.get("tickets", [])}
+
+
+class TicketWorker:
+    """
+    Background thread that sends queued tickets to the ticketing endpoint in batches.
+
+    notify() wakes it when a ticket is queued; it then waits `linger_seconds` so tickets queued close
+    together go in one request. Failed batches are retried with exponential backoff.
+    """
+
+    def __init__(self, queue: TicketQueue, endpoint, batch_size: int = 20, linger_seconds: float = 0.5,
+                 poll_seconds: float = 5.0, backoff_seconds: float = 2.0, max_attempts: int = 8):
+        """
+        :param queue: The TicketQueue to drain.
+        :param endpoint: Object with submit(payloads) -> {correlation_id: external_id}, e.g. HttpTicketEndpoint.
+        :param batch_size: Maximum tickets per submission.
+        :param linger_seconds: Time to wait for more tickets after being notified.
+        :param poll_seconds: Interval between checks for retries that have become due.
+        :param backoff_seconds: Base delay before a failed ticket is retried, doubled on every attempt.
+        :param max_attempts: Attempts before a ticket is marked failed.
+        """
+        self.queue = queue
+        self.endpoint = endpoint
+        self.batch_size = max(1, batch_size)
+        self.linger_seconds = linger_seconds
+        self.poll_seconds = poll_seconds
+        self.backoff_seconds = backoff_seconds
+        self.max_attempts = max(1, max_attempts)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.batches = 0
+        self.submitted = 0
+        self.failures = 0
+
+    def start(self) -> "TicketWorker":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ticket-worker", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def notify(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._wake.wait(self.poll_seconds) and self.linger_seconds:
+                self._stop.wait(self.linger_seconds)
+            self._wake.clear()
+            try:
+                while not self._stop.is_set() and self.send_batch():
+                    pass
+            except Exception as e:
+                print(f"TicketWorker: {type(e).__name__}: {e}")
+
+    def send_batch(self) -> int:
+        """
+        Claim and send one batch.
+
+        :return: Number of tickets claimed (0 when nothing was due).
+        """
+        tickets = self.queue.claim(self.batch_size)
+        if not tickets:
+            return 0
+        sent_at = time.time()
+        try:
+            accepted = self.endpoint.submit([t.payload() for t in tickets])
+        except Exception as e:
+            self.failures += 1
+            print(f"TicketWorker: submitting {len(tickets)} tickets failed: {type(e).__name__}: {e}")
+            self.queue.mark_failed([t.id for t in tickets], f"{type(e).__name__}: {e}", self.backoff_seconds,
+                                   self.max_attempts)
+            return len(tickets)
+        external_ids = {t.id: accepted[str(t.id)] for t in tickets if str(t.id) in accepted}
+        self.queue.mark_submitted(external_ids, sent_at)
+        rejected = [t.id for t in tickets if t.id not in external_ids]
+        if rejected:
+            self.queue.mark_failed(rejected, "not accepted by the endpoint", self.backoff_seconds, self.max_attempts)
+        self.batches += 1
+        self.submitted += len(external_ids)
+        return len(tickets)
+
+    def drain(self, timeout: float = 30.0) -> bool:
+        """
+        Send everything that is due now, in the calling thread.
+
+        :return: True if nothing due is left.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self.send_batch():
+                return True
+        return False
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "submitted": self.submitted, "failures": self.failures}
+
+
+class LocalTicketServer:
+    """
+    Local stand-in for a ticketing service, for development and benchmarks.
+
+    POST /tickets accepts HttpTicketEndpoint's batches and assigns IDs (LOCAL-1, LOCAL-2, ...); a batch
+    sent again is answered with the same IDs. GET /tickets lists everything received.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_seconds: float = 0.0):
+        """
+        :param port: Port to listen on; 0 picks a free one (see url).
+        :param latency_seconds: Simulated processing time per request.
+        """
+        self.latency_seconds = latency_seconds
+        self.tickets = {}       # correlation id -> ticket
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/tickets"
+
+    def _accept(self, payloads: List[dict]) -> List[dict]:
+        with self._lock:
+            self.requests += 1
+            accepted = []
+            for payload in payloads:
+                key = str(payload["correlation_id"])
+                if key not in self.tickets:
+                    self.tickets[key] = dict(payload, id=f"LOCAL-{len(self.tickets) + 1}")
+                else:
+                    self.tickets[key].update(payload, id=self.tickets[key]["id"])
+                accepted.append({"correlation_id": key, "id": self.tickets[key]["id"]})
+            return accepted
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def _send_json(self, status: int, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                if self.path != "/tickets":
+                    return self._send_json(404, {"error": "not found"})
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                    payloads = list(body["tickets"])
+                except (ValueError, KeyError, TypeError):
+                    return self._send_json(400, {"error": "expected {\"tickets\": [...]}"})
+                if server.latency_seconds:
+                    time.sleep(server.latency_seconds)
+                self._send_json(200, {"tickets": server._accept(payloads)})
+
+            def do_GET(self):
+                if self.path != "/tickets":
+                    return self._send_json(404, {"error": "not found"})
+                with server._lock:
+                    self._send_json(200, {"tickets": list(server.tickets.values())})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "LocalTicketServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="local-ticket-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+_default_queues = {}
+_default_workers = {}
+_default_lock = threading.Lock()
+
+
+def get_default_ticket_queue(path: str = DEFAULT_TICKET_DB_PATH) -> TicketQueue:
+    """
+    Process-wide ticket queue for a database file.
+    """
+    with _default_lock:
+        if path not in _default_queues:
+            _default_queues[path] = TicketQueue(path)
+        return _default_queues[path]
+
+
+def get_default_ticket_worker(queue: TicketQueue, endpoint_url: str, token: str = None) -> TicketWorker:
+    """
+    Process-wide, started worker sending a queue's tickets to an HTTP ticketing endpoint.
+    """
+    key = (queue.path, endpoint_url)
+    with _default_lock:
+        if key not in _default_workers:
+            _default_workers[key] = TicketWorker(queue, HttpTicketEndpoint(endpoint_url, token)).start()
+        return _default_workers[key]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect and send the local ticket queue")
+    parser.add_argument("--path", default=DEFAULT_TICKET_DB_PATH, help="ticket queue database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    listing = commands.add_parser("list", help="show queued and sent tickets")
+    listing.add_argument("--status", help="only tickets with this status")
+    send = commands.add_parser("send", help="send everything due to a ticketing endpoint and exit")
+    send.add_argument("endpoint", help="URL of the ticketing endpoint")
+    serve = commands.add_parser("serve-local", help="run the local stand-in ticketing service")
+    serve.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+
+    if args.command == "serve-local":
+        server = LocalTicketServer(port=args.port)
+        print(f"LocalTicketServer: accepting tickets at {server.url}")
+        server.httpd.serve_forever()
+        return
+    queue = TicketQueue(args.path)
+    if args.command == "list":
+        for ticket in queue.tickets(args.status):
+            print(f"#{ticket.id} [{ticket.status}] {ticket.external_id or '-'} {ticket.reporter} "
+                  f"x{ticket.reports}: {ticket.fields.get('summary')}")
+        print(queue.stats())
+    else:
+        worker = TicketWorker(queue, HttpTicketEndpoint(args.endpoint))
+        worker.drain()
+        print(f"{worker.stats()} {queue.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,4 +2,22 @@ import streamlit as st
 
 def show_navigation():
     with st.container(border=True):
-        st.page_link("pages/upload_pdf.py", label="Upload PDF", icon="1️⃣")
\ No newline at end of file
+        st.page_link("pages/upload_pdf.py", label="Upload PDF", icon="1️⃣")
+
+def current_user_id():
+    # The signed-in viewer's email (Streamlit authentication, st.login), so ticket dedup spans their chats.
+    # None when nobody is signed in; tickets are then matched per conversation only.
+    try:
+        if st.user.get("is_logged_in"):
+            return st.user.get("email") or st.user.get("sub")
+    except Exception:
+        pass
+    return None
+
+def run_config(thread_id):
+    # Graph config for a turn: the conversation and, when known, the user it belongs to
+    configurable = {"thread_id": thread_id}
+    user_id = current_user_id()
+    if user_id:
+        configurable["user_id"] = user_id
+    return {"configurable": configurable}
\ No newline at end of file
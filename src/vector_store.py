@@ -0,0 +1,298 @@
+# src/vector_store.py
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.lazy import LazyClient
+
+
+class VectorStore:
+    """
+    The subset of the Pinecone Index API the agents and ingestion use.
+
+    Any backend implementing these three methods (including a real Pinecone Index) can be passed
+    wherever the code expects `index`. Query results use Pinecone's shape:
+    {"matches": [{"id": ..., "score": ..., "metadata": {...}}, ...]}.
+    """
+
+    def upsert(self, vectors, namespace: str = ""):
+        raise NotImplementedError
+
+    def query(self, vector, top_k: int = 3, namespace: str = "", include_metadata: bool = False,
+              filter: Optional[dict] = None) -> dict:
+        raise NotImplementedError
+
+    def delete(self, ids, namespace: str = ""):
+        raise NotImplementedError
+
+
+def _filter_values(condition) -> Optional[set]:
+    # Translate a Pinecone-style condition ("x", {"$eq": "x"} or {"$in": [...]}) into a set of allowed values
+    if isinstance(condition, dict):
+        if "$eq" in condition:
+            return {condition["$eq"]}
+        if "$in" in condition:
+            return set(condition["$in"])
+        raise ValueError(f"Unsupported filter condition: {condition}")
+    return {condition}
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process vector index holding all embeddings in one contiguous float32 matrix.
+
+    Rows are L2-normalized on insert so a single matrix-vector product gives cosine similarity for
+    every stored chunk. When a directory is given, the matrix is saved as vectors.npy (memory-mapped
+    on the next start) and IDs/metadata as metadata.json. Writes are kept in memory until flush(),
+    which ingestion calls once per document; reads pick up a newer copy saved by another process.
+    """
+
+    def __init__(self, path: Optional[str] = None, dimension: Optional[int] = None, autosave: bool = False):
+        """
+        Open (or create) a local vector store.
+
+        :param path: Directory the index is persisted to. None keeps it in memory only.
+        :param dimension: Embedding size. Inferred from the first upsert when not given.
+        :param autosave: Persist to disk after every upsert and delete, instead of on flush().
+        """
+        self.path = path
+        self.autosave = autosave and path is not None
+        self._lock = threading.RLock()
+        # Writes not yet saved, and the metadata.json modification time of the copy in memory
+        self._dirty = False
+        self._saved_mtime = None
+        self._ids: List[str] = []
+        self._metadata: List[dict] = []
+        self._positions: Dict[str, int] = {}
+        self._docnames = np.empty(0, dtype=object)
+        self._matrix = np.empty((0, dimension or 0), dtype=np.float32)
+        self._count = 0
+        if path and os.path.exists(os.path.join(path, "metadata.json")):
+            self._load()
+
+    # --- persistence -------------------------------------------------------
+
+    def _metadata_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.path, "metadata.json")).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        mtime = self._metadata_mtime()
+        with open(os.path.join(self.path, "metadata.json"), "r") as file:
+            stored = json.load(file)
+        # Memory-map the matrix; it is only copied into RAM if it has to grow
+        matrix = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r")
+        if matrix.shape[0] != len(stored["ids"]):
+            # Caught between the two renames of a concurrent save; the next read tries again
+            return
+        self._ids = stored["ids"]
+        self._metadata = stored["metadata"]
+        self._positions = {id: i for i, id in enumerate(self._ids)}
+        self._docnames = np.array([m.get("docname") for m in self._metadata], dtype=object)
+        self._matrix = matrix
+        self._count = len(self._ids)
+        self._saved_mtime = mtime
+
+    def refresh(self):
+        """
+        Reload the index if another process (the upload page, a folder sync) saved a newer copy.
+        Unflushed writes in this process are kept instead.
+        """
+        if not self.path or self._dirty:
+            return
+        mtime = self._metadata_mtime()
+        if mtime is not None and mtime != self._saved_mtime:
+            with self._lock:
+                if not self._dirty and self._metadata_mtime() != self._saved_mtime:
+                    self._load()
+
+    def save(self):
+        """
+        Write the matrix and metadata to disk atomically.
+        """
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            vectors_tmp = os.path.join(self.path, "vectors.tmp.npy")
+            metadata_tmp = os.path.join(self.path, "metadata.tmp.json")
+            np.save(vectors_tmp, np.ascontiguousarray(self._matrix[:self._count]))
+            with open(metadata_tmp, "w") as file:
+                json.dump({"ids": self._ids, "metadata": self._metadata}, file)
+            os.replace(vectors_tmp, os.path.join(self.path, "vectors.npy"))
+            os.replace(metadata_tmp, os.path.join(self.path, "metadata.json"))
+            self._dirty = False
+            self._saved_mtime = self._metadata_mtime()
+
+    def flush(self):
+        """
+        Save the index if it changed since the last save.
+        """
+        with self._lock:
+            if self._dirty:
+                self.save()
+
+    # --- writes ------------------------------------------------------------
+
+    def _reserve(self, rows: int, dimension: int):
+        # Grow the matrix geometrically so repeated upserts stay amortized O(1) per row
+        if self._matrix.shape[1] not in (0, dimension) and self._count:
+            raise ValueError(f"Expected {self._matrix.shape[1]}-dimensional vectors, got {dimension}")
+        capacity = self._matrix.shape[0]
+        needed = self._count + rows
+        if needed <= capacity and self._matrix.flags.writeable and self._matrix.shape[1] == dimension:
+            return
+        grown = np.zeros((max(needed, 2 * capacity, 64), dimension), dtype=np.float32)
+        if self._count:
+            grown[:self._count] = self._matrix[:self._count]
+        self._matrix = grown
+        docnames = np.empty(grown.shape[0], dtype=object)
+        docnames[:self._count] = self._docnames[:self._count]
+        self._docnames = docnames
+
+    def upsert(self, vectors, namespace: str = ""):
+        vectors = list(vectors)
+        if not vectors:
+            return {"upserted_count": 0}
+        values = np.asarray([v[1] for v in vectors], dtype=np.float32)
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        values /= np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            self._reserve(len(vectors), values.shape[1])
+            for (id, _, metadata), row in zip(vectors, values):
+                position = self._positions.get(id)
+                if position is None:
+                    position = self._count
+                    self._count += 1
+                    self._positions[id] = position
+                    self._ids.append(id)
+                    self._metadata.append(dict(metadata))
+                else:
+                    self._metadata[position] = dict(metadata)
+                self._matrix[position] = row
+                self._docnames[position] = metadata.get("docname")
+            self._dirty = True
+            if self.autosave:
+                self.save()
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids, namespace: str = ""):
+        with self._lock:
+            if not self._matrix.flags.writeable:
+                self._reserve(0, self._matrix.shape[1])
+            for id in ids:
+                position = self._positions.pop(id, None)
+                if position is None:
+                    continue
+                # Move the last row into the freed slot to keep the matrix contiguous
+                last = self._count - 1
+                if position != last:
+                    self._matrix[position] = self._matrix[last]
+                    self._docnames[position] = self._docnames[last]
+                    self._ids[position] = self._ids[last]
+                    self._metadata[position] = self._metadata[last]
+                    self._positions[self._ids[position]] = position
+                self._ids.pop()
+                self._metadata.pop()
+                self._count -= 1
+                self._dirty = True
+            if self.autosave:
+                self.save()
+
+    # --- reads -------------------------------------------------------------
+
+    def query(self, vector, top_k: int = 3, namespace: str = "", include_metadata: bool = False,
+              filter: Optional[dict] = None) -> dict:
+        query = np.array(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        self.refresh()
+        with self._lock:
+            count = self._count
+            if count == 0:
+                return {"matches": [], "namespace": namespace}
+            # Scores are computed under the lock so a concurrent delete cannot move rows underneath us
+            scores = self._matrix[:count] @ query
+            docnames = self._docnames[:count].copy()
+            ids = self._ids[:count]
+            metadata = self._metadata[:count]
+
+        if filter:
+            mask = np.ones(count, dtype=bool)
+            for key, condition in filter.items():
+                allowed = _filter_values(condition)
+                if key == "docname":
+                    mask &= np.isin(docnames, list(allowed))
+                else:
+                    mask &= np.array([m.get(key) in allowed for m in metadata], dtype=bool)
+            scores = np.where(mask, scores, -np.inf)
+            top_k = min(top_k, int(mask.sum()))
+
+        top_k = min(top_k, count)
+        if top_k <= 0:
+            return {"matches": [], "namespace": namespace}
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+
+        matches = []
+        for i in top:
+            match = {"id": ids[i], "score": float(scores[i])}
+            if include_metadata:
+                match["metadata"] = metadata[i]
+            matches.append(match)
+        return {"matches": matches, "namespace": namespace}
+
+    def items(self) -> List[tuple]:
+        """
+        :return: (id, metadata) for every stored vector.
+        """
+        self.refresh()
+        with self._lock:
+            return list(zip(self._ids[:self._count], self._metadata[:self._count]))
+
+    def __len__(self):
+        return self._count
+
+
+_default_lock = threading.Lock()
+_default_stores: Dict[str, NumpyVectorStore] = {}
+
+
+def get_default_vector_store(path: str = ".cache/vector_index") -> NumpyVectorStore:
+    """
+    Process-wide local vector store for a directory, shared by the agents, the upload page and folder sync,
+    so an upload is visible to the next question without reopening the index.
+    """
+    path = os.path.abspath(path)
+    with _default_lock:
+        if path not in _default_stores:
+            _default_stores[path] = NumpyVectorStore(path)
+        return _default_stores[path]
+
+
+def open_vector_store(backend: str = "pinecone", pinecone_api_key: str = None, index_name: str = None,
+                      local_path: str = None):
+    """
+    Open the configured vector store.
+
+    :param backend: "pinecone" for the hosted index or "local" for the process-wide NumpyVectorStore.
+    :param pinecone_api_key: Pinecone API key (pinecone backend only).
+    :param index_name: Pinecone index name (pinecone backend only).
+    :param local_path: Directory of the local index (local backend only).
+    :return: An object implementing the VectorStore methods.
+    """
+    if backend == "local":
+        return get_default_vector_store(local_path or ".cache/vector_index")
+    if backend == "pinecone":
+        # Importing the SDK and resolving the index host are deferred to the first query or upsert
+        def pinecone_index():
+            from pinecone import Pinecone
+            return Pinecone(api_key=pinecone_api_key).Index(index_name)
+        return LazyClient(pinecone_index, f"Pinecone index {index_name}")
+    raise ValueError(f"Unknown vector backend: {backend}")
@@ -1,8 +1,12 @@
 # streamlit_app.py
 import os
-import random
+import uuid
 import streamlit as st
-from src.graph import salesCompAgent
+from src.answer_cache import get_default_answer_cache
+from src.client import RemoteAgent
+from src.runtime import get_agent, get_runtime
+from src.streaming import get_ttft_recorder
+from src.utils import run_config
 
 
 import warnings
@@ -14,21 +18,32 @@ os.environ["LANGSMITH_API_KEY"]=st.secrets['LANGCHAIN_API_KEY']
 
 DEBUGGING=0
 
+# With AGENT_SERVER_URL set, the page is a thin client of the headless API server (src/server.py)
+# instead of running the agent graph in the Streamlit process
+def agent():
+    if st.secrets.get("AGENT_SERVER_URL"):
+        return RemoteAgent(st.secrets["AGENT_SERVER_URL"], api_token=st.secrets.get("AGENT_SERVER_TOKEN"))
+    return get_agent()
+
 # This function sets up the chat interface and handles user interactions
 def start_chat():
     warnings.filterwarnings("ignore", category=UserWarning)
     st.title('Sales Comp Agent')
     avatars={"system":"💻🧠","user":"🧑‍💼","assistant":"🎓"}
     
+    # Ensuring a unique thread-id is maintained for every conversation. It is kept in the URL so
+    # a reload (or a restarted server) resumes the conversation stored by the checkpointer.
+    if "thread_id" not in st.session_state:
+        st.session_state.thread_id = st.query_params.get("thread") or uuid.uuid4().hex
+        st.query_params["thread"] = st.session_state.thread_id
+    thread_id = st.session_state.thread_id
+    # The signed-in user's id goes along too, so repeated reports merge into one ticket across chats
+    thread=run_config(thread_id)
+
     # Keeping context of conversations, checks if there is anything in messages array
-    # If not, it creates an empty list where all messages will be saved
+    # If not, it loads the stored conversation for this thread (empty for a new one)
     if "messages" not in st.session_state:
-        st.session_state.messages = []
-
-    # Ensuring a unique thread-id is maintained for every conversation
-    if "thread-id" not in st.session_state:
-        st.session_state.thread_id = random.randint(1000, 9999)
-    thread_id = st.session_state.thread_id
+        st.session_state.messages = agent().conversation(thread)
 
     # Display previous messages in the chat history by keeping track of the messages array
     # in the session state. 
@@ -47,26 +62,36 @@ def start_chat():
         with st.chat_message("user", avatar=avatars["user"]):
             st.markdown(prompt)
         
-        msgs=st.session_state.messages
-        #print(f"STREAMLITAPP  msgs is {msgs}")
-
-        app = salesCompAgent(st.secrets['OPENAI_API_KEY'])
-        thread={"configurable":{"thread_id":thread_id}}
+        # The agent (clients, sub-agents and compiled graph) is built once per process
+        app = agent()
+        if DEBUGGING and not isinstance(app, RemoteAgent):
+            print(f"RUNTIME: {get_runtime().stats()}")
+            print(f"ANSWER CACHE: {get_default_answer_cache().stats()}")
+        # Stream tokens from the agent into the chat as they are generated
+        final = {}
+        def tokens():
+            # Only the new message is sent when the conversation is stored by the checkpointer
+            for kind, payload in app.stream_tokens(app.turn_input(prompt, st.session_state.messages), thread):
+                if kind == "token":
+                    yield payload
+                else:
+                    final.update(payload)
 
-        # Stream responses from the agent
-        for s in app.graph.stream({'initialMessage': prompt, 
-        'sessionHistory': st.session_state.messages}, thread):
-            #st.sidebar.write(abot.graph.get_state(thread))
-            if DEBUGGING:
-                print(f"GRAPH RUN: {s}")
-                st.write(s)
-            for k,v in s.items():
-                if DEBUGGING:
-                    print(f"Key: {k}, Value: {v}")
-            if resp := v.get("responseToUser"):
-                with st.chat_message("assistant", avatar=avatars["assistant"]):
-                    st.markdown(resp)
-                st.session_state.messages.append({"role": "assistant", "content": resp})
+        with st.chat_message("assistant", avatar=avatars["assistant"]):
+            streamed = st.write_stream(tokens())
+            # Nodes that produced no tokens still return their answer in the final state
+            resp = final.get("responseToUser") or streamed
+            if resp and not streamed:
+                st.markdown(resp)
+        if DEBUGGING:
+            print(f"GRAPH RUN: {final}")
+        if DEBUGGING and not isinstance(app, RemoteAgent):
+            print(f"TTFT: {get_ttft_recorder().stats()}")
+            print(f"METRICS: {app.metrics.snapshot()['totals']}")
+            if app.speculative_retriever is not None:
+                print(f"SPECULATIVE RETRIEVAL: {app.speculative_retriever.stats()}")
+        if resp:
+            st.session_state.messages.append({"role": "assistant", "content": resp})
 
 if __name__ == '__main__':
     start_chat()
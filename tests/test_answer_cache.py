@@ -0,0 +1,63 @@
+# tests/test_answer_cache.py
+
+from src.answer_cache import DocumentGenerations, SemanticAnswerCache
+
+QUESTION = "What is the MCG policy?"
+EMBEDDING = [1.0, 0.0, 0.0]
+
+
+def test_similar_and_same_text_questions_hit():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store(QUESTION, EMBEDDING, "MCG answer", ["policy.pdf"], 1.0)
+    assert cache.lookup([0.99, 0.05, 0.0]).answer == "MCG answer"
+    assert cache.lookup(None, question="what is the mcg  policy").answer == "MCG answer"
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+
+
+def test_answers_without_an_embedding_match_on_text():
+    cache = SemanticAnswerCache()
+    cache.store(QUESTION, None, "MCG answer", ["policy.pdf"], 1.0)
+    assert cache.lookup(EMBEDDING, question=QUESTION).answer == "MCG answer"
+    assert cache.lookup(EMBEDDING) is None
+
+
+def test_invalidation_in_another_process_is_seen_on_lookup(tmp_path):
+    path = str(tmp_path / "generations.sqlite")
+    cache = SemanticAnswerCache(generations=DocumentGenerations(path))
+    cache.store(QUESTION, EMBEDDING, "MCG answer", ["policy.pdf"], 1.0)
+    cache.store("How are splits paid?", [0.0, 1.0, 0.0], "Split answer", ["splits.pdf"], 1.0)
+
+    # Another process (its own connection) re-ingests policy.pdf
+    DocumentGenerations(path).bump(["policy.pdf"])
+    assert cache.lookup(EMBEDDING, question=QUESTION) is None
+    assert cache.lookup([0.0, 1.0, 0.0]).answer == "Split answer"
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_answer_written_during_a_reingestion_is_stale(tmp_path):
+    generations = DocumentGenerations(str(tmp_path / "generations.sqlite"))
+    cache = SemanticAnswerCache(generations=generations)
+    started = cache.generation()
+    generations.bump(["policy.pdf"])
+    cache.store(QUESTION, EMBEDDING, "Answer from the old text", ["policy.pdf"], 1.0, documents_generation=started)
+    assert cache.lookup(EMBEDDING) is None
+
+
+def test_ingestion_bumps_only_the_generations_it_is_given(tmp_path):
+    from src.ingestion import IngestionPipeline
+    from src.local_backends import LocalEmbeddingClient
+    from src.vector_store import NumpyVectorStore
+
+    generations = DocumentGenerations(str(tmp_path / "generations.sqlite"))
+    cache = SemanticAnswerCache(generations=generations)
+    cache.store(QUESTION, EMBEDDING, "MCG answer", ["policy.pdf"], 1.0, documents_generation=cache.generation())
+
+    # Without a generations store (benchmarks, tests) only this process's caches are invalidated
+    IngestionPipeline(LocalEmbeddingClient(dimension=8), NumpyVectorStore()).ingest_text("MCG text", "policy.pdf")
+    assert generations.current() == 0
+    assert cache.lookup(EMBEDDING) is None
+
+    cache.store(QUESTION, EMBEDDING, "MCG answer", ["policy.pdf"], 1.0, documents_generation=cache.generation())
+    IngestionPipeline(LocalEmbeddingClient(dimension=8), NumpyVectorStore(),
+                      answer_generations=generations).ingest_text("MCG text v2", "policy.pdf")
+    assert generations.latest(["policy.pdf"]) == 1
@@ -0,0 +1,61 @@
+# tests/test_api_clients.py
+
+import asyncio
+
+import httpx
+import pytest
+
+from src.api_clients import CircuitBreaker, CircuitOpenError, RequestGuard
+
+
+def open_breaker() -> CircuitBreaker:
+    # Opens on the first failure and allows a probe straight away
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    return breaker
+
+
+def request() -> httpx.Request:
+    return httpx.Request("POST", "https://api.openai.com/v1/embeddings", content=b"{}")
+
+
+def test_cancelled_probe_frees_the_probe_slot():
+    guard = RequestGuard(breaker=open_breaker(), max_retries=0)
+    started = asyncio.Event()
+
+    async def hang(request):
+        started.set()
+        await asyncio.sleep(60)
+
+    async def cancel_probe():
+        probe = asyncio.create_task(guard.asend(request(), hang))
+        await started.wait()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(cancel_probe())
+    assert guard.breaker.allow()
+
+
+def test_probe_failing_outside_the_transport_frees_the_probe_slot():
+    guard = RequestGuard(breaker=open_breaker(), max_retries=0)
+
+    def broken(request):
+        raise ValueError("bug in the transport")
+
+    with pytest.raises(ValueError):
+        guard.send(request(), broken)
+    response = guard.send(request(), lambda request: httpx.Response(200, json={}))
+    assert response.status_code == 200
+    assert guard.breaker.state == "closed"
+
+
+def test_only_one_probe_at_a_time():
+    breaker = open_breaker()
+    assert breaker.allow()
+    assert not breaker.allow()
+    guard = RequestGuard(breaker=breaker, max_retries=0)
+    with pytest.raises(CircuitOpenError):
+        guard.send(request(), lambda request: httpx.Response(200))
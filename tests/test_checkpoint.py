@@ -0,0 +1,70 @@
+# tests/test_checkpoint.py
+
+import operator
+import time
+from typing import Annotated, TypedDict
+
+from langgraph.graph import END, START, StateGraph
+
+from src.checkpoint import DurableSqliteSaver
+
+
+class State(TypedDict):
+    turns: Annotated[list, operator.add]
+
+
+def build_graph(saver):
+    graph = StateGraph(State)
+    graph.add_node("reply", lambda state: {"turns": [f"reply {len(state['turns'])}"]})
+    graph.add_edge(START, "reply")
+    graph.add_edge("reply", END)
+    return graph.compile(checkpointer=saver)
+
+
+def run_turns(graph, thread_id: str, turns: int):
+    config = {"configurable": {"thread_id": thread_id}}
+    for i in range(turns):
+        graph.invoke({"turns": [f"question {i}"]}, config)
+    return config
+
+
+def test_compaction_keeps_the_latest_state(tmp_path):
+    saver = DurableSqliteSaver(str(tmp_path / "checkpoints.sqlite"), maintenance_every=10_000)
+    graph = build_graph(saver)
+    config = run_turns(graph, "a", 3)
+    run_turns(graph, "b", 2)
+    before = graph.get_state(config).values
+    assert saver.stats()["checkpoints"] > 2
+
+    assert saver.compact() > 0
+    assert saver.stats()["checkpoints"] == 2
+    assert graph.get_state(config).values == before
+    # The conversation continues from the compacted checkpoint
+    graph.invoke({"turns": ["question 3"]}, config)
+    assert graph.get_state(config).values["turns"][:len(before["turns"])] == before["turns"]
+
+
+def test_state_survives_reopening_the_file(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    config = run_turns(build_graph(DurableSqliteSaver(path)), "a", 2)
+    assert len(build_graph(DurableSqliteSaver(path)).get_state(config).values["turns"]) == 4
+
+
+def test_idle_threads_expire(tmp_path):
+    saver = DurableSqliteSaver(str(tmp_path / "checkpoints.sqlite"), retention_days=1, maintenance_every=10_000)
+    graph = build_graph(saver)
+    run_turns(graph, "old", 1)
+    run_turns(graph, "new", 1)
+    saver.conn.execute("UPDATE thread_activity SET updated_at = ? WHERE thread_id = 'old'", (time.time() - 2 * 86400,))
+    saver.conn.commit()
+    assert saver.expire() == 1
+    assert graph.get_state({"configurable": {"thread_id": "old"}}).values == {}
+    assert graph.get_state({"configurable": {"thread_id": "new"}}).values["turns"]
+    assert saver.stats()["threads"] == 1
+
+
+def test_maintenance_runs_every_n_checkpoints(tmp_path):
+    saver = DurableSqliteSaver(str(tmp_path / "checkpoints.sqlite"), maintenance_every=4)
+    run_turns(build_graph(saver), "a", 5)
+    # Each turn writes several checkpoints; compaction runs periodically, so few are left
+    assert saver.stats()["checkpoints"] <= 4
@@ -0,0 +1,104 @@
+# tests/test_clarify_agent.py
+
+import asyncio
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks.fakes import FakeAsyncOpenAIClient, FakeChatModel, FakeOpenAIClient, structured_defaults
+from src.clarify_agent import ClarifyAgent, ClarifyResponse
+from src.graph import salesCompAgent
+from src.history import HistoryManager
+from src.vector_store import NumpyVectorStore
+
+QUESTION = "Hmm, what about the thing from last week?"
+
+
+def clarify_router(schema, messages):
+    if schema is ClarifyResponse:
+        return ClarifyResponse(category="commission",
+                               clarifying_question="Are you asking about a commission payout?", suggest_ticket=True, ticket_summary="User reports a payout that looks wrong.")
+    return structured_defaults(schema)
+
+
+def make_agent():
+    model = FakeChatModel(structured=clarify_router)
+    return ClarifyAgent(model, history_manager=HistoryManager(model)), model
+
+
+def test_sync_turn_makes_one_model_call():
+    agent, model = make_agent()
+    result = agent.clarify_agent({"initialMessage": QUESTION,
+                                  "sessionHistory": [{"role": "user", "content": QUESTION}]})
+    assert model.calls == 1
+    assert result["category"] == "clarify"
+    assert result["lnode"] == "clarify_agent"
+    assert result["responseToUser"].startswith("Are you asking about a commission payout?")
+    assert result["clarifyGuess"] == "commission"
+    assert result["clarifyRequest"] == QUESTION
+
+
+def test_async_turn_makes_one_model_call():
+    agent, model = make_agent()
+    result = asyncio.run(agent.aclarify_agent({"initialMessage": QUESTION,
+                                               "sessionHistory": [{"role": "user", "content": QUESTION}]}))
+    assert model.calls == 1
+    assert result["category"] == "clarify"
+    assert result["clarifyGuess"] == "commission"
+
+
+def test_turn_without_history_makes_one_model_call():
+    agent, model = make_agent()
+    result = agent.clarify_agent({"initialMessage": QUESTION})
+    assert model.calls == 1
+    assert result["responseToUser"]
+
+
+def test_ticket_suggestion_includes_the_summary():
+    agent, _ = make_agent()
+    result = agent.format_response(ClarifyResponse(category="ticket", clarifying_question="Which deal? ", suggest_ticket=True,
+                                                   ticket_summary="Payout on D-17 is missing."))
+    assert result["responseToUser"] == ("Which deal?\n\nIf you'd rather have sales operations look into it, "
+                                        "reply \"open a ticket\" and I'll file: Payout on D-17 is missing.")
+
+
+def test_no_ticket_suggestion_by_default():
+    agent, _ = make_agent()
+    result = agent.format_response(ClarifyResponse(category="commission", clarifying_question="Which deal?"))
+    assert result["responseToUser"] == "Which deal?"
+
+
+def test_confirmation_needs_a_guess_and_a_short_yes():
+    state = {"clarifyGuess": "commission", "initialMessage": "Yes, that's it"}
+    assert ClarifyAgent.confirmed_route(state) == "commission"
+    assert ClarifyAgent.confirmed_route({**state, "initialMessage": "No, the contest"}) is None
+    assert ClarifyAgent.confirmed_route({**state, "initialMessage": "yes but what about the contest rules"}) is None
+    assert ClarifyAgent.confirmed_route({**state, "clarifyGuess": ""}) is None
+
+
+def test_yes_routes_the_original_request_to_the_guess():
+    schemas = []
+
+    def router(schema, messages):
+        schemas.append(schema.__name__)
+        if schema is ClarifyResponse:
+            return clarify_router(schema, messages)
+        if "category" in schema.model_fields:
+            return schema(category="clarify")
+        return structured_defaults(schema)
+
+    client = FakeOpenAIClient()
+    agent = salesCompAgent("offline", model=FakeChatModel(structured=router), client=client, index=NumpyVectorStore(),
+                           async_client=FakeAsyncOpenAIClient(client), fast_classifier_threshold=None,
+                           checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": "clarify"}}
+    first = agent.graph.invoke(agent.turn_input(QUESTION, []), config)
+    assert first["category"] == "clarify"
+    assert first["clarifyGuess"] == "commission"
+
+    schemas.clear()
+    second = agent.graph.invoke(agent.turn_input("Yes", []), config)
+    assert second["category"] == "commission"
+    assert second["initialMessage"] == QUESTION
+    assert second["clarifyGuess"] == ""
+    # The confirmation is routed without asking the classifier again
+    assert "Category" not in schemas
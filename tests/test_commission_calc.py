@@ -0,0 +1,82 @@
+# tests/test_commission_calc.py
+
+import asyncio
+import math
+
+import pandas as pd
+import pytest
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fakes import FakeChatModel
+from src.commission_agent import CommissionAgent
+from src.commission_calc import (CommissionInputs, calculate_commission, calculate_commissions,
+                                 format_commission_response, format_missing_inputs_response)
+
+
+def test_commission_is_bcr_times_deal_value():
+    result = calculate_commission(deal_value=500_000, oti=100_000, quota=1_000_000)
+    assert result.bcr == pytest.approx(0.1)
+    assert result.commission == pytest.approx(50_000)
+
+
+def test_non_positive_quota_is_rejected():
+    with pytest.raises(ValueError):
+        calculate_commission(deal_value=500_000, oti=100_000, quota=0)
+
+
+def test_batch_matches_single_calculation_and_flags_bad_quotas():
+    deals = pd.DataFrame({"deal_value": [500_000, 250_000, 100_000, 100_000],
+                          "oti": [100_000, 80_000, 50_000, 50_000],
+                          "quota": [1_000_000, 400_000, 0, None]})
+    result = calculate_commissions(deals)
+    assert list(deals.columns) == ["deal_value", "oti", "quota"]
+    for row in result.head(2).itertuples():
+        assert row.commission == pytest.approx(calculate_commission(row.deal_value, row.oti, row.quota).commission)
+    assert math.isnan(result["commission"][2]) and math.isnan(result["commission"][3])
+
+
+def test_response_shows_the_calculation():
+    text = format_commission_response(calculate_commission(500_000, 100_000, 1_000_000))
+    assert "\\$50,000.00" in text
+    assert "0.1000 (10.00%)" in text
+
+
+def test_missing_inputs_are_named():
+    inputs = CommissionInputs(deal_value=500_000)
+    assert inputs.missing() == ["on-target incentive (OTI)", "annual quota"]
+    assert format_missing_inputs_response(inputs.missing()).endswith(
+        "Please provide your on-target incentive (OTI), annual quota.")
+
+
+def test_agent_computes_without_a_phrasing_call():
+    model = FakeChatModel()
+    agent = CommissionAgent(model, index=None)
+    response, needs_phrasing = agent.computed_response(CommissionInputs(deal_value=500_000, oti=100_000,
+                                                                        quota=1_000_000))
+    assert not needs_phrasing
+    assert "\\$50,000.00" in response
+    assert model.calls == 0
+
+
+def extracted(**values):
+    # Structured-output stand-in returning the given CommissionInputs
+    return lambda schema, messages: CommissionInputs(**values)
+
+
+def test_general_question_is_answered_by_the_model():
+    model = FakeChatModel(response="Renewals pay half the base commission rate.",
+                          structured=extracted(general_question=True))
+    agent = CommissionAgent(model, index=None)
+    response = agent.generate_commission_response("What is the new commission rate?",
+                                                  [HumanMessage(content="What is the new commission rate?")])
+    assert response.strip() == "Renewals pay half the base commission rate."
+    assert model.calls == 2
+
+
+def test_calculation_with_missing_figures_asks_for_them():
+    model = FakeChatModel(structured=extracted(deal_value=500_000))
+    agent = CommissionAgent(model, index=None)
+    response = asyncio.run(agent.agenerate_commission_response(
+        "What will I earn on a $500,000 deal?", [HumanMessage(content="What will I earn on a $500,000 deal?")]))
+    assert response == format_missing_inputs_response(["on-target incentive (OTI)", "annual quota"])
+    assert model.calls == 1
@@ -0,0 +1,94 @@
+# tests/test_contest_rules.py
+
+import os
+
+import pandas as pd
+
+from src.contest_agent import parse_payout_question
+from src.contest_agent import ContestAgent
+from src.contest_rules import (DEFAULT_RULES_PATH, ContestRuleBook, check_payout, check_payouts,
+                               format_check_response, format_percent, parse_contest_rules)
+
+RULES = """Following are the rules of the contest:
+1. Payout will be quarterly
+2. Only one payout per deal
+3. Payout cannot be more than 5% of OTI
+4. Contest URL is: http://cnn.com
+"""
+
+
+def test_rules_are_parsed():
+    rules = parse_contest_rules(RULES)
+    assert rules.payout_cadence == "quarterly"
+    assert rules.one_payout_per_deal
+    assert rules.max_payout_fraction_of_oti == 0.05
+    assert rules.form_url == "http://cnn.com"
+    assert len(rules.rules) == 4
+
+
+def test_payout_checks():
+    rules = parse_contest_rules(RULES)
+    assert check_payout(rules, 4_000, oti=100_000, deal_id="D-1", period="2024-Q3").allowed
+    over_cap = check_payout(rules, 6_000, oti=100_000)
+    assert not over_cap.allowed and "cap of 5% of OTI" in over_cap.violations[0]
+    assert not check_payout(rules, 1_000, oti=100_000, deal_id="D-1", paid_deals={"D-1"}).allowed
+    assert not check_payout(rules, 1_000, oti=100_000, period="2024-07").allowed
+
+
+def test_batch_check_matches_the_rules():
+    rules = parse_contest_rules(RULES)
+    payouts = pd.DataFrame({"payout": [4_000, 6_000, 1_000, 1_000],
+                            "oti": [100_000, 100_000, 100_000, 100_000],
+                            "deal_id": ["D-1", "D-2", "D-1", "D-3"],
+                            "period": ["2024-Q3", "2024-Q3", "2024-Q4", "2024-07"]})
+    result = check_payouts(rules, payouts)
+    assert result["allowed"].tolist() == [True, False, False, False]
+    assert result["within_cap"].tolist() == [True, False, True, True]
+    assert result["duplicate_deal"].tolist() == [False, False, True, False]
+    assert result["period_ok"].tolist() == [True, True, True, False]
+
+
+def test_rule_book_reloads_only_when_the_file_changes(tmp_path):
+    path = tmp_path / "contestrules.txt"
+    path.write_text(RULES)
+    book = ContestRuleBook(str(path))
+    assert book.rules().max_payout_fraction_of_oti == 0.05
+    book.rules()
+    assert book.loads == 1
+    path.write_text(RULES.replace("5%", "7%") + "\n")
+    assert book.rules().max_payout_fraction_of_oti == 0.07
+    assert book.loads == 2
+
+
+def test_missing_rules_file_gives_empty_rules(tmp_path):
+    assert ContestRuleBook(os.path.join(tmp_path, "missing.txt")).rules().rules == []
+
+
+def test_payout_question_is_parsed_either_way_round():
+    question = parse_payout_question("Can a rep with $100k OTI get a $6,000 contest payout on deal D-17?")
+    assert (question["payout"], question["oti"], question["deal_id"]) == (6_000, 100_000, "D-17")
+    question = parse_payout_question("Can I pay $4,000 to a rep whose OTI is $100,000?")
+    assert (question["payout"], question["oti"]) == (4_000, 100_000)
+    assert parse_payout_question("Can I pay 6% of OTI as a contest payout?")["fraction_of_oti"] == 0.06
+    assert parse_payout_question("How do I enter the Q3 sales contest?") is None
+
+
+def test_check_response():
+    rules = parse_contest_rules(RULES)
+    assert format_check_response(check_payout(rules, 4_000, oti=100_000), rules).startswith("Yes.")
+    assert format_check_response(check_payout(rules, 6_000, oti=100_000), rules).startswith("No.")
+
+
+def test_fractional_caps_are_not_rounded():
+    rules = parse_contest_rules(RULES.replace("5%", "7.5%"))
+    assert rules.max_payout_fraction_of_oti == 0.075
+    assert format_percent(0.075) == "7.5%" and format_percent(0.05) == "5%"
+    assert "cap of 7.5% of OTI" in format_check_response(check_payout(rules, 8_000, oti=100_000), rules)
+    agent = ContestAgent(model=None)
+    assert agent.deterministic_response("Can I pay 6% of OTI as a contest payout?", rules) == \
+        "Yes. 6% of OTI is within the cap of 7.5% of OTI."
+
+
+def test_default_rules_load_from_any_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert ContestRuleBook(DEFAULT_RULES_PATH).rules().form_url == "http://cnn.com"
@@ -0,0 +1,51 @@
+# tests/test_fast_classifier.py
+
+from src.fast_classifier import (DEFAULT_THRESHOLD, FastClassifier, FastPrediction, calibrate_threshold,
+                                 read_comparisons)
+from src.graph import CLASSIFIER_PROMPT
+
+
+def record(confidence, agreed):
+    return {"confidence": confidence, "agreed": agreed}
+
+
+def test_calibration_picks_the_smallest_margin_meeting_the_target():
+    records = [record(0.5, True)] * 10 + [record(0.31, False)] + [record(0.3, True)] * 5
+    assert calibrate_threshold(records, target_agreement=1.0, min_samples=5) == 0.5
+    # One disagreement in 16 is within 0.9, so every comparison counts
+    assert calibrate_threshold(records, target_agreement=0.9, min_samples=5) == 0.3
+
+
+def test_calibration_needs_enough_samples():
+    records = [record(0.5, True)] * 3
+    assert calibrate_threshold(records, target_agreement=0.98, min_samples=5) is None
+    assert calibrate_threshold([], min_samples=1) is None
+
+
+def test_tied_margins_are_counted_together():
+    records = [record(0.4, True)] * 5 + [record(0.3, True), record(0.3, False)]
+    assert calibrate_threshold(records, target_agreement=1.0, min_samples=1) == 0.4
+
+
+def test_commission_sounding_policy_question_is_left_to_the_llm():
+    classifier = FastClassifier.from_prompt(CLASSIFIER_PROMPT)
+    prediction = classifier.predict("Is there a cap on commission for large deals?")
+    assert prediction.category == "commission"
+    assert not classifier.is_confident(prediction)
+    assert classifier.is_confident(classifier.predict("How do I enter the Q3 sales contest?"))
+    assert classifier.threshold == DEFAULT_THRESHOLD
+
+
+def test_llm_comparisons_are_logged(tmp_path):
+    path = str(tmp_path / "logs" / "fast_classifier.jsonl")
+    classifier = FastClassifier.from_prompt(CLASSIFIER_PROMPT, log_path=path)
+    classifier.record_llm_result(FastPrediction("commission", 0.26, {}), "policy")
+    classifier.record_llm_result(FastPrediction("contest", 0.6, {}), "contest", shadow=True)
+    classifier.record_llm_result(None, "clarify")
+    with open(path, "a") as file:
+        file.write('{"confidence": 0.')
+    records = read_comparisons(path)
+    assert [(r["local"], r["llm"], r["agreed"], r["shadow"]) for r in records] == [
+        ("commission", "policy", False, False), ("contest", "contest", True, True)]
+    assert classifier.stats()["compared"] == 2
+    assert classifier.stats()["llm_fallbacks"] == 2
@@ -0,0 +1,66 @@
+# tests/test_history.py
+
+from benchmarks.fakes import FakeChatModel
+from src.history import BOOKKEEPING_PREFIX, HistoryManager, message_tokens
+
+LONG = "The quarterly payout for the enterprise deal depends on the accelerator tiers. " * 8
+
+
+def conversation(turns: int, first: int = 0) -> list:
+    history = []
+    for i in range(first, first + turns):
+        history.append({"role": "user", "content": f"Question {i}: {LONG}"})
+        history.append({"role": "assistant", "content": f"Answer {i}: {LONG}"})
+    return history
+
+
+def test_short_history_is_sent_verbatim_without_bookkeeping():
+    manager = HistoryManager(FakeChatModel(), token_budget=10_000)
+    history = conversation(2) + [{"role": "assistant", "content": BOOKKEEPING_PREFIX + " category=policy"}]
+    messages = manager.prepare(history)
+    assert [m.content for m in messages] == [m["content"] for m in conversation(2)]
+    assert manager.summary_calls == 0
+
+
+def test_older_turns_are_folded_into_a_summary_within_budget():
+    model = FakeChatModel(response="Summary of the earlier turns.")
+    manager = HistoryManager(model, token_budget=600, fold_block=4)
+    history = conversation(10)
+    messages = manager.prepare(history)
+    assert messages[0].content.startswith("(Summary of the earlier conversation: Summary of the earlier turns.")
+    assert messages[-1].content == history[-1]["content"]
+    assert sum(message_tokens(m) for m in messages[1:]) <= 600
+    assert manager.summary_calls == 1
+
+
+class RecordingModel(FakeChatModel):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.prompts = []
+
+    def invoke(self, messages, *args, **kwargs):
+        self.prompts.append(messages[0].content)
+        return super().invoke(messages, *args, **kwargs)
+
+
+def test_summary_is_cached_and_extended_across_turns():
+    model = RecordingModel(response="Summary.")
+    manager = HistoryManager(model, token_budget=600, fold_block=4)
+    history = conversation(10)
+    manager.prepare(history)
+    manager.prepare(history)
+    assert model.calls == 1
+    # Later turns fold more messages: the cached summary is extended with only the newly folded ones
+    manager.prepare(history + conversation(4, first=10))
+    assert model.calls == 2
+    assert "Summary so far:\n        Summary." in model.prompts[-1]
+    assert "Question 0:" not in model.prompts[-1]
+
+
+def test_without_a_model_older_turns_are_dropped():
+    manager = HistoryManager(None, token_budget=600, fold_block=4)
+    history = conversation(10)
+    messages = manager.prepare(history)
+    assert messages[-1].content == history[-1]["content"]
+    assert not messages[0].content.startswith("(Summary")
+    assert sum(message_tokens(m) for m in messages) <= 600
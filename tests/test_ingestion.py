@@ -0,0 +1,55 @@
+# tests/test_ingestion.py
+
+from src.chunk_manifest import ChunkManifest
+from src.embedding_cache import text_hash
+from src.ingestion import IngestionPipeline
+from src.lexical_index import BM25Index
+from src.local_backends import LocalEmbeddingClient
+from src.vector_store import NumpyVectorStore
+
+OLD = ["Windfall deals above $5M are reviewed by the comp committee.", "The MCG lasts two quarters."]
+NEW = ["Windfall deals above $10M are reviewed by the comp committee.", "The MCG lasts two quarters."]
+
+
+def pipeline(index, lexical, manifest=None):
+    return IngestionPipeline(LocalEmbeddingClient(dimension=16), index, lexical_index=lexical,
+                             chunk_manifest=manifest)
+
+
+def ids(index) -> set:
+    return {id for id, _ in index.items()}
+
+
+def test_reingesting_a_document_deletes_its_superseded_chunks():
+    index, lexical = NumpyVectorStore(), BM25Index(":memory:")
+    ingest = pipeline(index, lexical)
+    ingest.ingest_chunks(OLD, "policy.pdf")
+    result = ingest.ingest_chunks(NEW, "policy.pdf")
+
+    assert result.superseded_chunks == 1
+    assert ids(index) == {text_hash(t) for t in NEW}
+    assert len(lexical) == 2
+    assert "$5M" not in lexical.search("windfall deals reviewed", top_k=2).matches[0]["metadata"]["text"]
+
+
+def test_chunks_shared_with_another_document_are_kept():
+    index, lexical = NumpyVectorStore(), BM25Index(":memory:")
+    ingest = pipeline(index, lexical)
+    ingest.ingest_chunks(OLD, "policy.pdf")
+    ingest.ingest_chunks([OLD[0]], "windfall.pdf")
+    result = ingest.ingest_chunks(NEW, "policy.pdf")
+
+    assert result.superseded_chunks == 0
+    assert text_hash(OLD[0]) in ids(index)
+
+
+def test_the_manifest_is_shared_by_pipelines_on_the_same_file(tmp_path):
+    path = str(tmp_path / "chunks.sqlite")
+    index, lexical = NumpyVectorStore(), BM25Index(":memory:")
+    pipeline(index, lexical, ChunkManifest(path)).ingest_chunks(OLD, "policy.pdf")
+    # A later upload, for example after the app restarted
+    result = pipeline(index, lexical, ChunkManifest(path)).ingest_chunks(NEW, "policy.pdf")
+
+    assert result.superseded_chunks == 1
+    assert ids(index) == {text_hash(t) for t in NEW}
+    assert ChunkManifest(path).forget("policy.pdf") == sorted(text_hash(t) for t in NEW)
@@ -0,0 +1,103 @@
+# tests/test_server.py
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.client import RemoteAgent
+from src.server import AgentServer
+
+
+class FailingAgent:
+    """
+    Agent whose turn streams one token and then raises, like a graph node failing mid-answer.
+    """
+
+    def __init__(self, fail_before_first_token: bool = False):
+        self.fail_before_first_token = fail_before_first_token
+
+    def turn_input(self, message, history):
+        return {"initialMessage": message, "sessionHistory": history}
+
+    def stream_tokens(self, inputs, config):
+        if not self.fail_before_first_token:
+            yield "token", "Partial "
+        raise RuntimeError("node failed")
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(agent):
+        server = AgentServer(agent, port=0)
+        threading.Thread(target=server.httpd.serve_forever, daemon=True).start()
+        servers.append(server)
+        host, port = server.address[:2]
+        return server, f"http://{host}:{port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def post(url, body):
+    request = urllib.request.Request(url + "/chat", data=json.dumps(body).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    return urllib.request.urlopen(request, timeout=10)
+
+
+def test_failure_mid_stream_ends_the_stream_with_an_error_line(serve):
+    server, url = serve(FailingAgent())
+    with post(url, {"message": "Hi", "thread_id": "t1", "stream": True}) as response:
+        assert response.status == 200
+        lines = [json.loads(line) for line in response.read().splitlines() if line.strip()]
+    assert lines == [{"token": "Partial "}, {"error": "internal error", "thread_id": "t1"}]
+    assert server.stats()["failed"] == 1
+
+
+def test_remote_agent_raises_on_a_failed_stream(serve):
+    _, url = serve(FailingAgent())
+    agent = RemoteAgent(url, timeout_seconds=10)
+    received = []
+    with pytest.raises(RuntimeError, match="internal error"):
+        for kind, payload in agent.stream_tokens({"initialMessage": "Hi"}, {"configurable": {"thread_id": "t2"}}):
+            received.append((kind, payload))
+    assert received == [("token", "Partial ")]
+
+
+def test_failure_before_streaming_is_a_500(serve):
+    _, url = serve(FailingAgent(fail_before_first_token=True))
+    with pytest.raises(urllib.error.HTTPError) as error:
+        post(url, {"message": "Hi", "thread_id": "t3"})
+    assert error.value.code == 500
+    assert json.loads(error.value.read()) == {"error": "internal error", "thread_id": "t3"}
+
+
+class RecordingAgent(FailingAgent):
+    """
+    Agent that answers at once and keeps the config of every turn.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.configs = []
+
+    def stream_tokens(self, inputs, config):
+        self.configs.append(config)
+        yield "final", {"responseToUser": "Done", "category": "ticket"}
+
+
+def test_user_id_reaches_the_graph_config(serve):
+    agent = RecordingAgent()
+    _, url = serve(agent)
+    remote = RemoteAgent(url, timeout_seconds=10)
+    list(remote.stream_tokens({"initialMessage": "My payout is wrong"},
+                              {"configurable": {"thread_id": "t4", "user_id": "rep@example.com"}}))
+    assert agent.configs == [{"configurable": {"thread_id": "t4", "user_id": "rep@example.com"}}]
+    with pytest.raises(urllib.error.HTTPError) as error:
+        post(url, {"message": "Hi", "user_id": "rep <rep@example.com>"})
+    assert error.value.code == 400
@@ -0,0 +1,53 @@
+# tests/test_ticket_queue.py
+
+import time
+
+from src.ticket_queue import TicketQueue, similarity
+
+PAYOUT_ERROR = {"summary": "Q3 commission payout missing", "description": "My Q3 commission payout for deal "
+                "D-17 never arrived", "issue_type": "payout_error", "priority": "normal", "deal_id": "D-17"}
+FOLLOW_UP = {"summary": "Still missing my Q3 commission payout", "description": "The Q3 commission payout for "
+             "deal D-17 never arrived, it is now two weeks late", "priority": "high", "deal_id": "D-17"}
+ACCESS = {"summary": "Cannot open the commission report", "description": "The dashboard says access denied",
+          "issue_type": "access", "priority": "normal"}
+
+
+def test_follow_up_merges_into_the_open_ticket():
+    queue = TicketQueue(":memory:")
+    first, merged = queue.enqueue("rep-1", PAYOUT_ERROR)
+    assert not merged
+    second, merged = queue.enqueue("rep-1", FOLLOW_UP)
+    assert merged and second.id == first.id
+    assert second.reports == 2
+    assert second.fields["priority"] == "high"
+    assert "Follow-up: " + FOLLOW_UP["description"] in second.fields["description"]
+    assert queue.stats()["tickets"] == 1
+
+
+def test_different_issues_reporters_and_deals_stay_separate():
+    queue = TicketQueue(":memory:")
+    first, _ = queue.enqueue("rep-1", PAYOUT_ERROR)
+    assert queue.enqueue("rep-1", ACCESS)[0].id != first.id
+    assert queue.enqueue("rep-2", PAYOUT_ERROR)[0].id != first.id
+    other_deal = dict(PAYOUT_ERROR, deal_id="D-18")
+    assert similarity(PAYOUT_ERROR, other_deal) == 0.0
+    assert queue.enqueue("rep-1", other_deal)[0].id != first.id
+    assert queue.stats()["tickets"] == 4
+
+
+def test_old_tickets_are_not_merge_candidates():
+    queue = TicketQueue(":memory:", duplicate_window_days=1)
+    first, _ = queue.enqueue("rep-1", PAYOUT_ERROR)
+    queue._conn.execute("UPDATE tickets SET updated_at = ? WHERE id = ?", (time.time() - 2 * 86400, first.id))
+    second, merged = queue.enqueue("rep-1", FOLLOW_UP)
+    assert not merged and second.id != first.id
+
+
+def test_follow_up_to_a_submitted_ticket_is_sent_again():
+    queue = TicketQueue(":memory:")
+    ticket, _ = queue.enqueue("rep-1", PAYOUT_ERROR)
+    assert [t.id for t in queue.claim(10)] == [ticket.id]
+    queue.mark_submitted({ticket.id: "EXT-1"}, sent_at=time.time())
+    assert queue.get(ticket.id).status == "submitted"
+    ticket, merged = queue.enqueue("rep-1", FOLLOW_UP)
+    assert merged and ticket.status == "queued" and ticket.external_id == "EXT-1"